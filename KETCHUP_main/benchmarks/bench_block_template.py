@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#
+# KETCHUP static block construction benchmark
+#
+# Times the construction of the static experiment blocks of the k-ecoli74 example (wild type and
+# seven mutants) with and without the shared block template (option 'flag_block_template'). For
+# reference, it also times cloning a built block with Pyomo, which is the other way of reusing the
+# structure of a block. Garbage is collected before each build and the median of the repeats is shown.
+#
+# Run from this directory:
+#   python bench_block_template.py
+#   python bench_block_template.py -n 8 32 -m michaelis-menten
+
+
+def build_blocks(ketchup_inputs: dict, mechanism_type: str, flag_block_template: bool) -> float:
+    """ Builds the experiment blocks of a new initial model and returns the time taken """
+    import gc
+    from timeit import default_timer as timer
+    from pyomo.environ import Block, Set
+    from ktools.core import create_initial_model, create_sMB, create_static_block_template
+
+    ketchup_model = create_initial_model(ketchup_inputs['m_model'], ketchup_inputs['mech_df'],
+                                         ketchup_inputs['data_dict'], seedvalue=0, mech_type=mechanism_type)
+    ketchup_model.EXPERIMENTS = Set(initialize=list(ketchup_inputs['data_dict'].keys()))
+    gc.collect()
+    time_start = timer()
+    if flag_block_template:
+        ketchup_model.static_block_template = create_static_block_template(ketchup_model)
+    ketchup_model.experiment = Block(ketchup_model.EXPERIMENTS, rule=create_sMB)
+    return timer() - time_start
+
+
+def clone_blocks(ketchup_inputs: dict, mechanism_type: str) -> float:
+    """ Clones one built block once per experiment and returns the time taken """
+    import gc
+    from timeit import default_timer as timer
+    from ktools.core import create_initial_model, create_sKM
+
+    ketchup_model = create_initial_model(ketchup_inputs['m_model'], ketchup_inputs['mech_df'],
+                                         ketchup_inputs['data_dict'], seedvalue=0, mech_type=mechanism_type)
+    block = create_sKM(ketchup_model.rxn_enz_sum, ketchup_model.m_model, ketchup_model.mech_df, mechanism_type,
+                       s_matrix=ketchup_model.s_matrix)
+    # the stoichiometric matrix cannot be copied by clone and would be shared with the clones
+    block.s_matrix = None
+    gc.collect()
+    time_start = timer()
+    for _ in ketchup_inputs['data_dict']:
+        block.clone()
+    return timer() - time_start
+
+
+def main() -> None:
+    """
+    Main function to time static block construction with and without the block template.
+    """
+    import os
+    import sys
+    import io
+    import argparse
+    import tempfile
+    import contextlib
+    import statistics
+
+    # add path to ktools if not installed
+    dir_benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(dir_benchmarks, "..", "src"))
+
+    from ktools.ketchup.ketchup import ketchup_model_options, ketchup_read_inputs
+    from bench_model_build import write_scaled_data
+
+    parser = argparse.ArgumentParser(description="KETCHUP static block construction benchmark")
+    parser.add_argument("-n", "--experiments", nargs='*', type=int, default=[],
+                        help="Numbers of experiments of scaled data sets (knockouts of the WT data) in "
+                             "addition to the k-ecoli74 data")
+    parser.add_argument("-m", "--mechanism-type", default='elemental',
+                        help="Mechanism type (elemental or michaelis-menten)")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="Number of timed repeats")
+    args = parser.parse_args()
+
+    dir_data = os.path.join(dir_benchmarks, "..", "example", "data")
+    options = {'directory_model': dir_data,
+               'filename_model': 'k-ecoli74_model.xlsx',
+               'filename_mechanism': 'k-ecoli74_mechanism.xlsx',
+               'directory_data': dir_data,
+               'filename_data': 'k-ecoli74_data.xlsx',
+               'mechanism_type': args.mechanism_type,
+               'flag_cache_inputs': False}
+
+    print(f"{'experiments':>12} {'rule (s)':>9} {'template (s)':>13} {'speedup':>8} {'clone (s)':>10}")
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        for n in [None] + args.experiments:
+            with contextlib.redirect_stdout(io.StringIO()):
+                ketchup_options = ketchup_model_options(options)
+                if n is not None:
+                    m_model = ketchup_read_inputs(ketchup_options)['m_model']
+                    write_scaled_data(os.path.join(dir_data, 'k-ecoli74_data.xlsx'),
+                                      os.path.join(dir_tmp, 'data.xlsx'), m_model, n)
+                    ketchup_options['directory_data'] = dir_tmp
+                    ketchup_options['filename_data'] = 'data.xlsx'
+                ketchup_inputs = ketchup_read_inputs(ketchup_options)
+                time_rule = statistics.median(build_blocks(ketchup_inputs, args.mechanism_type, False)
+                                              for _ in range(args.repeats))
+                time_template = statistics.median(build_blocks(ketchup_inputs, args.mechanism_type, True)
+                                                  for _ in range(args.repeats))
+                time_clone = statistics.median(clone_blocks(ketchup_inputs, args.mechanism_type)
+                                               for _ in range(args.repeats))
+            print(f"{len(ketchup_inputs['data_dict']):>12} {time_rule:>9.3f} {time_template:>13.3f} "
+                  f"{time_rule / time_template:>8.2f} {time_clone:>10.3f}")
+
+    return
+    # end of main
+
+
+if __name__ == '__main__':
+    main()
+
+# end of benchmark
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+#
+# KETCHUP elemental formulation benchmark
+#
+# Builds the static k-ecoli74 example (elemental mechanisms) with the full formulation, where the
+# elemental step rates are variables defined by constraints, and the reduced formulation, where they
+# are expressions substituted into the balances (option 'elemental_formulation'), and reports the
+# numbers of variables, constraints and Jacobian nonzeros, the build time and the peak memory of the
+# build (from tracemalloc). If IPOPT is available, both formulations are also solved from the same
+# initial point and the solve time and termination condition are shown.
+#
+# Run from this directory:
+#   python bench_elemental_formulation.py
+#   python bench_elemental_formulation.py -n 32 --solve
+
+
+def problem_size(ketchup_model) -> tuple:
+    """ Numbers of active variables, active constraints and Jacobian nonzeros of a model """
+    from pyomo.environ import Constraint
+    from pyomo.core.expr.visitor import identify_variables
+
+    variables = set()
+    n_constraints = 0
+    n_nonzeros = 0
+    for constraint in ketchup_model.component_data_objects(Constraint, active=True):
+        constraint_vars = {id(v): v for v in identify_variables(constraint.body, include_fixed=False)}
+        variables.update(constraint_vars)
+        n_constraints += 1
+        n_nonzeros += len(constraint_vars)
+    return len(variables), n_constraints, n_nonzeros
+
+
+def build_model(ketchup_options: dict) -> tuple:
+    """ Builds a model and returns it with the build time and the peak memory of the build in MiB """
+    import gc
+    import tracemalloc
+    from timeit import default_timer as timer
+    from ktools.ketchup.ketchup import ketchup_generate_model
+
+    gc.collect()
+    tracemalloc.start()
+    time_start = timer()
+    ketchup_model = ketchup_generate_model(ketchup_options)
+    time_build = timer() - time_start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return ketchup_model, time_build, peak
+
+
+def solve_model(ketchup_model, filename_solver_opt: str) -> tuple:
+    """ Solves a model with IPOPT and returns the solve time and the termination condition """
+    from timeit import default_timer as timer
+    import pyomo.opt
+
+    solver = pyomo.opt.SolverFactory('ipopt')
+    solver.options.option_file_name = filename_solver_opt
+    time_start = timer()
+    results = solver.solve(ketchup_model, tee=False)
+    return timer() - time_start, str(results.Solver[0]['Termination condition'])
+
+
+def main() -> None:
+    """
+    Main function to compare the full and reduced elemental formulations.
+    """
+    import os
+    import sys
+    import io
+    import argparse
+    import tempfile
+    import contextlib
+
+    # add path to ktools if not installed
+    dir_benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(dir_benchmarks, "..", "src"))
+
+    import pyomo.opt
+    from ktools.ketchup.ketchup import ketchup_model_options, ketchup_read_inputs
+    from bench_model_build import write_scaled_data
+
+    parser = argparse.ArgumentParser(description="KETCHUP elemental formulation benchmark")
+    parser.add_argument("-n", "--experiments", nargs='*', type=int, default=[],
+                        help="Numbers of experiments of scaled data sets (knockouts of the WT data) in "
+                             "addition to the k-ecoli74 data")
+    parser.add_argument("--solve", action='store_true', help="Also solve each model with IPOPT")
+    args = parser.parse_args()
+
+    dir_example = os.path.join(dir_benchmarks, "..", "example")
+    dir_data = os.path.join(dir_example, "data")
+    options = {'directory_model': dir_data,
+               'filename_model': 'k-ecoli74_model.xlsx',
+               'filename_mechanism': 'k-ecoli74_mechanism.xlsx',
+               'directory_data': dir_data,
+               'filename_data': 'k-ecoli74_data.xlsx',
+               'filename_solver_opt': os.path.join(dir_example, 'ipopt.opt'),
+               'mechanism_type': 'elemental',
+               'flag_cache_inputs': False}
+
+    flag_solve = args.solve and pyomo.opt.SolverFactory('ipopt').available(exception_flag=False)
+    if args.solve and not flag_solve:
+        print("IPOPT is not available, the models are not solved.")
+
+    print(f"{'experiments':>12} {'formulation':>12} {'variables':>10} {'constraints':>12} {'nonzeros':>10} "
+          f"{'build (s)':>10} {'peak (MiB)':>11}" + (f" {'solve (s)':>10} {'termination':>12}" if flag_solve else ''))
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        for n in [None] + args.experiments:
+            for formulation in ('full', 'reduced'):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    ketchup_options = ketchup_model_options(dict(options, elemental_formulation=formulation))
+                    if n is not None:
+                        if not os.path.exists(os.path.join(dir_tmp, 'data.xlsx')):
+                            m_model = ketchup_read_inputs(ketchup_options)['m_model']
+                            write_scaled_data(os.path.join(dir_data, 'k-ecoli74_data.xlsx'),
+                                              os.path.join(dir_tmp, 'data.xlsx'), m_model, n)
+                        ketchup_options['directory_data'] = dir_tmp
+                        ketchup_options['filename_data'] = 'data.xlsx'
+                    ketchup_model, time_build, peak = build_model(ketchup_options)
+                    if flag_solve:
+                        time_solve, termination = solve_model(ketchup_model, ketchup_options['filename_solver_opt'])
+                n_variables, n_constraints, n_nonzeros = problem_size(ketchup_model)
+                print(f"{len(ketchup_model.EXPERIMENTS):>12} {formulation:>12} {n_variables:>10} {n_constraints:>12} "
+                      f"{n_nonzeros:>10} {time_build:>10.3f} {peak:>11.1f}"
+                      + (f" {time_solve:>10.2f} {termination:>12}" if flag_solve else ''))
+            if n is not None:
+                os.remove(os.path.join(dir_tmp, 'data.xlsx'))
+
+    return
+    # end of main
+
+
+if __name__ == '__main__':
+    main()
+
+# end of benchmark
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# KETCHUP mechanism expansion benchmark
+#
+# Writes synthetic K-FIT mechanism files with an increasing number of reactions and times their
+# expansion by parse_kfit_mech_df into elemental steps or Michaelis-Menten terms. Each reaction has
+# one or two substrates and products and, for some reactions, competitive or noncompetitive
+# inhibitors, as in the K-FIT example networks. The expansion should grow linearly with the number
+# of reactions, i.e. the time per reaction should stay constant.
+#
+# Run from this directory:
+#   python bench_mech_expansion.py
+#   python bench_mech_expansion.py -n 1000 2000 4000 -m michaelis-menten
+
+
+def write_synthetic_mechanism(filename_mechanism: str, n_reactions: int, seed: int = 0) -> None:
+    """ Writes a K-FIT mechanism file of n_reactions sequential reactions among random metabolites """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    mets = [f"M{i}" for i in range(max(n_reactions, 4))]
+
+    def pick(low, high):
+        return ";".join(rng.choice(mets, size=rng.integers(low, high + 1), replace=False))
+
+    rows = []
+    for i in range(n_reactions):
+        rows.append({'ID': f"R{i}", 'mechanism': 'seq', 'SBO': pick(1, 2), 'PRO': pick(1, 2),
+                     'CI': pick(1, 1) if rng.random() < 0.1 else None, 'UCI': None,
+                     'NCI': pick(1, 2) if rng.random() < 0.1 else None, 'act': None, 'exch': 0, 'sub': 0})
+    pd.DataFrame(rows).to_excel(filename_mechanism, index=False)
+
+
+def main() -> None:
+    """
+    Main function to time the mechanism expansion for an increasing number of reactions.
+    """
+    import os
+    import sys
+    import argparse
+    import tempfile
+    from timeit import default_timer as timer
+
+    # add path to ktools if not installed
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+    from ktools.io import parse_kfit_mech_df, read_xlsx_sheets
+
+    parser = argparse.ArgumentParser(description="KETCHUP mechanism expansion benchmark")
+    parser.add_argument("-n", "--reactions", nargs='+', type=int, default=[125, 250, 500, 1000],
+                        help="Numbers of reactions")
+    parser.add_argument("-m", "--mechanism-type", default='elemental',
+                        help="Mechanism type (elemental or michaelis-menten)")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="Number of timed repeats (best is shown)")
+    args = parser.parse_args()
+
+    print(f"{'reactions':>10} {'rows':>6} {'expansion (s)':>14} {'per reaction (ms)':>18}")
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        for n in args.reactions:
+            fn = os.path.join(dir_tmp, 'mechanism.xlsx')
+            write_synthetic_mechanism(fn, n)
+            df_mechanism = next(iter(read_xlsx_sheets(fn).values()))
+            times = []
+            for _ in range(args.repeats):
+                time_start = timer()
+                mech_df = parse_kfit_mech_df(df_mechanism, mech_type=args.mechanism_type)
+                times.append(timer() - time_start)
+            print(f"{n:>10} {len(mech_df):>6} {min(times):>14.4f} {1000 * min(times) / n:>18.4f}")
+
+    return
+    # end of main
+
+
+if __name__ == '__main__':
+    main()
+
+# end of benchmark
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+#
+# KETCHUP model build benchmark
+#
+# Times ketchup_generate_model for the static k-ecoli74 example while increasing the number of
+# mutant experiments. Each added experiment is a knockout of the next reaction in the model that
+# reuses the wild-type fluxes as its data, so only the model size (not the fit) is meaningful.
+# Build time should grow linearly with the number of experiment blocks.
+#
+# Run from this directory:
+#   python bench_model_build.py
+#   python bench_model_build.py -n 1 8 16 32 -m elemental
+
+
+def write_scaled_data(filename_data: str, filename_out: str, m_model, n_experiments: int) -> None:
+    """ Writes a K-FIT data file with the WT data and (n_experiments - 1) knockout experiments. """
+    import pandas as pd
+
+    df = pd.read_excel(filename_data, engine='openpyxl')
+    df_wt = df[df['Mutant'] == 'WT']
+    frames = [df_wt]
+    for rxn in [r.id for r in m_model.reactions][:n_experiments - 1]:
+        df_ko = df_wt.copy()
+        df_ko['Mutant'] = rxn
+        frames.append(df_ko)
+    pd.concat(frames, ignore_index=True).to_excel(filename_out, index=False)
+
+
+def main() -> None:
+    """
+    Main function to set up and time model generation for an increasing number of experiments.
+    """
+    import os
+    import sys
+    import io
+    import argparse
+    import tempfile
+    import contextlib
+    from timeit import default_timer as timer
+
+    # add path to ktools if not installed
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+    from ktools.ketchup.ketchup import ketchup_model_options, ketchup_generate_model
+    from ktools.io import read_kfit_model_xlsx
+
+    parser = argparse.ArgumentParser(description="KETCHUP model build benchmark")
+    parser.add_argument("-n", "--experiments", nargs='+', type=int, default=[1, 2, 4, 8, 16, 32],
+                        help="Numbers of experiments to build")
+    parser.add_argument("-m", "--mechanism-type", default='elemental',
+                        help="Mechanism type (elemental or michaelis-menten)")
+    args = parser.parse_args()
+
+    dir_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "example", "data")
+    m_model, _ = read_kfit_model_xlsx(os.path.join(dir_data, 'k-ecoli74_model.xlsx'),
+                                      os.path.join(dir_data, 'k-ecoli74_mechanism.xlsx'),
+                                      mech_type=args.mechanism_type)
+
+    print(f"{'experiments':>12} {'build (s)':>10} {'per experiment (s)':>19}")
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        for n in args.experiments:
+            write_scaled_data(os.path.join(dir_data, 'k-ecoli74_data.xlsx'),
+                              os.path.join(dir_tmp, 'data.xlsx'), m_model, n)
+            ketchup_options = ketchup_model_options({'directory_model': dir_data,
+                                                     'filename_model': 'k-ecoli74_model.xlsx',
+                                                     'filename_mechanism': 'k-ecoli74_mechanism.xlsx',
+                                                     'directory_data': dir_tmp,
+                                                     'filename_data': 'data.xlsx',
+                                                     'mechanism_type': args.mechanism_type})
+            time_start = timer()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ketchup_generate_model(ketchup_options)
+            time_end = timer()
+            print(f"{n:>12} {time_end - time_start:>10.3f} {(time_end - time_start) / n:>19.4f}")
+
+    return
+    # end of main
+
+
+if __name__ == '__main__':
+    main()
+
+# end of benchmark
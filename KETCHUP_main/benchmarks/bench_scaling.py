@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+#
+# KETCHUP scaling benchmark
+#
+# Generates synthetic K-FIT networks of increasing size (see synthetic_kfit.py) and measures, for the
+# static elemental, static Michaelis-Menten and dynamic custom rate law paths, the time to parse the
+# input files (ketchup_read_inputs), the time to build the model (ketchup_generate_model), the peak
+# memory of both (from tracemalloc, in a separate untimed pass) and the model size. With --solve, each
+# model is also solved with IPOPT, and the solver time, number of iterations and time per iteration are
+# taken from the IPOPT log. The results are written to a JSON file, which can be compared with the
+# results of an earlier run (e.g., before a change) with --compare.
+#
+# Run from this directory:
+#   python bench_scaling.py
+#   python bench_scaling.py -n 50 100 200 400 -e 8 --solve -o scaling.json
+#   python bench_scaling.py -o scaling_new.json --compare scaling.json
+
+PATHS = {'static-elemental': ('static', 'elemental'),
+         'static-mm': ('static', 'michaelis-menten'),
+         'dynamic-custom': ('dynamic', 'custom')}
+
+# measurements compared with --compare, where larger is worse
+METRICS = ('parse_time', 'build_time', 'peak_memory_mib', 'time_per_iteration')
+
+
+def run_case(files: dict, mechanism_type: str, filename_solver_opt: str = None, repeats: int = 1) -> dict:
+    """
+    Parses, builds and (if filename_solver_opt is given) solves the model of a set of input files, and
+    returns the measurements of one case. The parse and build times are the best of repeats runs.
+    """
+    import gc
+    import io
+    import contextlib
+    import tracemalloc
+    from ktools.ketchup.ketchup import (ketchup_model_options, ketchup_read_inputs, ketchup_generate_model,
+                                       solve_ketchup_model)
+    from ktools.util import PhaseTimer, model_size
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ketchup_options = ketchup_model_options(dict(files, mechanism_type=mechanism_type, flag_cache_inputs=False,
+                                                     filename_solver_opt=filename_solver_opt))
+
+    # timed passes, the last one with the solve
+    times_parse, times_build = [], []
+    for repeat in range(max(repeats, 1)):
+        gc.collect()
+        with PhaseTimer() as timer, contextlib.redirect_stdout(io.StringIO()):
+            ketchup_inputs = ketchup_read_inputs(ketchup_options)
+            ketchup_model = ketchup_generate_model(ketchup_options, ketchup_inputs)
+            if filename_solver_opt and repeat == max(repeats, 1) - 1:
+                results = solve_ketchup_model(ketchup_model, ketchup_options)
+        times_parse.append(timer.phases['read_inputs']['time'])
+        times_build.append(timer.phases['generate_model']['time'])
+    case = {'parse_time': min(times_parse),
+            'build_time': min(times_build),
+            'metabolites': len(ketchup_model.m_model.metabolites),
+            'experiments': len(ketchup_model.EXPERIMENTS),
+            **model_size(ketchup_model)}
+    if filename_solver_opt:
+        counters = timer.counters
+        case.update(solve_time=timer.phases['solve']['time'],
+                    ipopt_time=counters.get('ipopt_time'),
+                    ipopt_iterations=counters.get('ipopt_iterations'),
+                    time_per_iteration=(counters.get('ipopt_time', timer.phases['solve']['time'])
+                                        / counters['ipopt_iterations']) if counters.get('ipopt_iterations') else None,
+                    termination=str(results.solver.termination_condition))
+    del ketchup_model, ketchup_inputs
+
+    # memory pass, untimed since tracemalloc slows down the allocations
+    gc.collect()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ketchup_generate_model(ketchup_options, ketchup_read_inputs(ketchup_options))
+    case['peak_memory_mib'] = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return case
+
+
+def compare_results(results: list, previous: list, tolerance: float) -> int:
+    """
+    Prints the ratios of the measurements of the cases of results to those of the same cases in previous,
+    and returns the number of measurements that are larger by more than the fraction tolerance.
+    """
+    def key(case):
+        return tuple(case.get(k) for k in ('path', 'reactions', 'metabolites', 'experiments', 'time_points'))
+
+    previous = {key(case): case for case in previous}
+    n_regressions = 0
+    print(f"\n{'path':>16} {'reactions':>10} " + " ".join(f"{metric:>19}" for metric in METRICS))
+    for case in results:
+        old = previous.get(key(case))
+        if old is None:
+            continue
+        ratios = []
+        for metric in METRICS:
+            if case.get(metric) is None or not old.get(metric):
+                ratios.append(f"{'-':>19}")
+                continue
+            ratio = case[metric] / old[metric]
+            flag = ratio > 1 + tolerance
+            n_regressions += flag
+            ratios.append(f"{ratio:>17.2f}{' *' if flag else '  '}")
+        print(f"{case['path']:>16} {case['reactions']:>10} " + " ".join(ratios))
+    print(f"{n_regressions} measurements increased by more than {tolerance:.0%} (marked *).")
+    return n_regressions
+
+
+def main() -> None:
+    """
+    Main function to measure the parse, build and solve times and the memory of synthetic networks.
+    """
+    import os
+    import sys
+    import json
+    import argparse
+    import platform
+    import tempfile
+    from datetime import datetime
+
+    # add path to ktools if not installed
+    dir_benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(dir_benchmarks, "..", "src"))
+
+    import pyomo.environ
+    import pyomo.opt
+    from synthetic_kfit import write_static_network, write_dynamic_network
+
+    parser = argparse.ArgumentParser(description="KETCHUP scaling benchmark")
+    parser.add_argument("-p", "--paths", nargs='+', choices=list(PATHS), default=list(PATHS),
+                        help="Model paths to measure")
+    parser.add_argument("-n", "--reactions", nargs='+', type=int, default=[25, 50, 100, 200],
+                        help="Numbers of reactions")
+    parser.add_argument("-m", "--metabolites", nargs='+', type=int, default=None,
+                        help="Numbers of metabolites, one per number of reactions (default from the reactions)")
+    parser.add_argument("-e", "--experiments", type=int, default=4, help="Number of experiments")
+    parser.add_argument("-t", "--time-points", type=int, default=10,
+                        help="Number of time points per experiment (dynamic path)")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the synthetic networks")
+    parser.add_argument("-r", "--repeats", type=int, default=3,
+                        help="Number of timed parses and builds (best is kept)")
+    parser.add_argument("--solve", action='store_true', help="Also solve each model with IPOPT")
+    parser.add_argument("--solver-options", default=os.path.join(dir_benchmarks, "..", "example", "ipopt.opt"),
+                        help="IPOPT options file used with --solve")
+    parser.add_argument("-o", "--output", default='bench_scaling.json', help="JSON file of the results")
+    parser.add_argument("-c", "--compare", default=None, help="JSON file of earlier results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative increase of a measurement reported as a regression by --compare")
+    args = parser.parse_args()
+
+    if args.metabolites is not None and len(args.metabolites) != len(args.reactions):
+        parser.error("give one number of metabolites per number of reactions")
+    metabolites = args.metabolites or [None] * len(args.reactions)
+
+    flag_solve = args.solve and pyomo.opt.SolverFactory('ipopt').available(exception_flag=False)
+    if args.solve and not flag_solve:
+        print("IPOPT is not available, the models are not solved.")
+    filename_solver_opt = os.path.abspath(args.solver_options) if flag_solve else None
+
+    results = []
+    print(f"{'path':>16} {'reactions':>10} {'metabolites':>12} {'variables':>10} {'nonzeros':>10} {'parse (s)':>10} "
+          f"{'build (s)':>10} {'peak (MiB)':>11}" + (f" {'iterations':>11} {'per iteration (s)':>18}"
+                                                       if flag_solve else ''))
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        for path in args.paths:
+            data_type, mechanism_type = PATHS[path]
+            for n_reactions, n_metabolites in zip(args.reactions, metabolites):
+                if data_type == 'static':
+                    files = write_static_network(dir_tmp, n_reactions, n_metabolites, args.experiments,
+                                                 seed=args.seed)
+                else:
+                    files = write_dynamic_network(dir_tmp, n_reactions, n_metabolites, args.experiments,
+                                                  args.time_points, seed=args.seed)
+                case = {'path': path, 'reactions': n_reactions,
+                        'time_points': args.time_points if data_type == 'dynamic' else None,
+                        **run_case(files, mechanism_type, filename_solver_opt, args.repeats)}
+                results.append(case)
+                print(f"{path:>16} {n_reactions:>10} {case['metabolites']:>12} {case['variables']:>10} "
+                      f"{case['nonzeros']:>10} {case['parse_time']:>10.3f} {case['build_time']:>10.3f} "
+                      f"{case['peak_memory_mib']:>11.1f}"
+                      + (f" {str(case['ipopt_iterations']):>11} {case['time_per_iteration'] or float('nan'):>18.4f}"
+                         if flag_solve else ''))
+
+    with open(args.output, 'w') as json_file:
+        json.dump({'date': datetime.now().isoformat(timespec='seconds'),
+                   'python': platform.python_version(), 'pyomo': pyomo.version.version,
+                   'platform': platform.platform(), 'seed': args.seed, 'repeats': args.repeats, 'results': results}, json_file, indent='\t')
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as json_file:
+            previous = json.load(json_file)['results']
+        if compare_results(results, previous, args.tolerance):
+            sys.exit(1)
+
+    return
+    # end of main
+
+
+if __name__ == '__main__':
+    main()
+
+# end of benchmark
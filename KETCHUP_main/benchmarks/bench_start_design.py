@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+# KETCHUP start design benchmark
+#
+# Solves the static k-ecoli74 example, or a synthetic static network (see synthetic_kfit.py), from the
+# same number of starts with each start design (random, Latin hypercube and Sobol) and reports, for each design, the best SSR found, the number of starts
+# and the cumulative solve time until a start first reached the best SSR of all designs (within a
+# relative tolerance), and the mean centered discrepancy of the design projected onto each parameter.
+# Requires IPOPT.
+#
+# Run from this directory:
+#   python bench_start_design.py
+#   python bench_start_design.py -n 32 -np 8 -d random lhs sobol
+#   python bench_start_design.py -n 16 -r 10 -e 2
+
+
+def time_to_best(records: list[dict], best: float, rtol: float) -> tuple:
+    """ Number of starts and cumulative solve time, in order of seeds, until an objective within rtol of best """
+    time_total = 0.0
+    for i, record in enumerate(records):
+        time_total += record['time_solve'] or 0.0
+        if record['objective'] is not None and record['objective'] <= best * (1 + rtol):
+            return i + 1, time_total
+    return None, time_total
+
+
+def main() -> None:
+    """
+    Main function to solve the example with each start design and compare the results.
+    """
+    import os
+    import sys
+    import io
+    import argparse
+    import tempfile
+    import contextlib
+
+    # add path to ktools if not installed
+    dir_benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(dir_benchmarks, "..", "src"))
+
+    import numpy as np
+    from scipy.stats import qmc
+    from ktools.core import create_start_design, count_kinetic_parameters
+    from ktools.ketchup import ketchup_read_inputs, ketchup_multistart
+    from ktools.ketchup.ketchup import ketchup_model_options
+    from synthetic_kfit import write_static_network
+
+    parser = argparse.ArgumentParser(description="KETCHUP start design benchmark")
+    parser.add_argument("-n", "--starts", type=int, default=16, help="Number of starts per design")
+    parser.add_argument("-np", "--processes", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("-d", "--designs", nargs='+', default=['random', 'lhs', 'sobol'], help="Start designs")
+    parser.add_argument("-m", "--mechanism-type", default='elemental',
+                        help="Mechanism type (elemental or michaelis-menten)")
+    parser.add_argument("--rtol", type=float, default=0.01, help="Relative tolerance on the best SSR")
+    parser.add_argument("-r", "--reactions", type=int, default=None,
+                        help="Number of reactions of a synthetic network to solve instead of the example")
+    parser.add_argument("-e", "--experiments", type=int, default=4,
+                        help="Number of experiments of the synthetic network")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the synthetic network")
+    args = parser.parse_args()
+
+    dir_example = os.path.join(dir_benchmarks, "..", "example")
+    dir_data = os.path.join(dir_example, "data")
+    user_options = {'directory_model': dir_data,
+                    'filename_model': 'k-ecoli74_model.xlsx',
+                    'filename_mechanism': 'k-ecoli74_mechanism.xlsx',
+                    'directory_data': dir_data,
+                    'filename_data': 'k-ecoli74_data.xlsx',
+                    'model_name': 'k-ecoli74',
+                    'mechanism_type': args.mechanism_type,
+                    'filename_solver_opt': os.path.join(dir_example, 'ipopt.opt'),
+                    'multistart': args.starts,
+                    'processes': args.processes}
+
+    results = {}
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        if args.reactions:
+            dir_network = os.path.join(dir_tmp, 'network')
+            os.makedirs(dir_network)
+            user_options.update(write_static_network(dir_network, args.reactions, n_experiments=args.experiments,
+                                                     seed=args.seed), model_name='synthetic')
+        with contextlib.redirect_stdout(io.StringIO()):
+            ketchup_options = ketchup_model_options(user_options)
+            ketchup_inputs = ketchup_read_inputs(ketchup_options)
+        dimension = count_kinetic_parameters(ketchup_inputs['m_model'], ketchup_inputs['mech_df'],
+                                             ketchup_options['mechanism_type'])
+
+        for design in args.designs:
+            ketchup_options = ketchup_model_options(dict(user_options, start_design=design,
+                                                         directory_output=os.path.join(dir_tmp, design)))
+            os.makedirs(ketchup_options['directory_output'])
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[design] = ketchup_multistart(ketchup_options, ketchup_inputs=ketchup_inputs)
+
+    objectives = [r['objective'] for records in results.values() for r in records if r['objective'] is not None]
+    if not objectives:
+        print("No start was solved. Check that IPOPT is available.")
+        return
+    best = min(objectives)
+
+    print(f"{args.starts} starts, {dimension} kinetic parameters, best SSR {best:.6g}")
+    print(f"{'design':>8} {'best SSR':>12} {'starts to best':>15} {'time to best (s)':>17} {'discrepancy':>12}")
+    for design, records in results.items():
+        design_best = min((r['objective'] for r in records if r['objective'] is not None), default=float('nan'))
+        n_best, time_best = time_to_best(records, best, args.rtol)
+        sample = create_start_design(design, args.starts, dimension, records[0]['seed'])
+        discrepancy = np.mean([qmc.discrepancy(sample[:, [j]]) for j in range(dimension)])
+        print(f"{design:>8} {design_best:>12.6g} {str(n_best or '-'):>15} {time_best:>17.2f} {discrepancy:>12.4g}")
+
+    return
+    # end of main
+
+
+if __name__ == '__main__':
+    main()
+
+# end of benchmark
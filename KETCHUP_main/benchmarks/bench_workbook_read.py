@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+#
+# KETCHUP workbook read benchmark
+#
+# Times reading every sheet of the multi-sheet FDH and BDH dataset series, as read_strainer_data_xlsx
+# does, and records the peak memory allocated while reading (tracemalloc). The previous approach, which
+# opened the workbook in full mode once to list the sheets and once more for every sheet, is compared to
+# the shared reader of ktools.io, which opens the workbook once in read-only mode.
+#
+# Run from this directory:
+#   python bench_workbook_read.py
+#   python bench_workbook_read.py path/to/workbook.xlsx
+
+
+def read_sheets_per_open(filename_workbook: str) -> dict:
+    """ Previous approach: one full-mode opening to list the sheets and one more for every sheet """
+    import openpyxl
+    import pandas as pd
+
+    sheets = {}
+    for sheet_name in openpyxl.load_workbook(filename=filename_workbook, data_only=True).sheetnames:
+        sheet = openpyxl.load_workbook(filename=filename_workbook, data_only=True)[sheet_name]
+        data = sheet.values
+        cols = next(data)[:]
+        sheets[sheet_name] = pd.DataFrame(list(data), columns=cols)
+    return sheets
+
+
+def measure(function, *args) -> tuple:
+    """ Runs function and returns its result, run time (s) and peak traced memory (MiB) """
+    import tracemalloc
+    from timeit import default_timer as timer
+
+    tracemalloc.start()
+    time_start = timer()
+    result = function(*args)
+    time_end = timer()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, time_end - time_start, peak / 2**20
+
+
+def main() -> None:
+    """
+    Main function to compare workbook readers on the dataset series.
+    """
+    import os
+    import sys
+    import argparse
+
+    # add path to ktools if not installed
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+    from ktools.io import read_xlsx_sheets
+
+    dir_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                            "Manuscript Supplementary Materials", "Publication_2", "data")
+    parser = argparse.ArgumentParser(description="KETCHUP workbook read benchmark")
+    parser.add_argument("workbooks", nargs='*',
+                        default=[os.path.join(dir_data, fn) for fn in ('FDH_dataset_series_A1.xlsx',
+                                                                       'FDH_dataset_series_B1.xlsx',
+                                                                       'FDH_dataset_series_B2.xlsx',
+                                                                       'BDH_dataset_series_Z1.xlsx')],
+                        help="Workbooks to read")
+    args = parser.parse_args()
+
+    print(f"{'workbook':>28} {'sheets':>6} {'per-sheet open (s)':>19} {'peak (MiB)':>10} "
+          f"{'single open (s)':>16} {'peak (MiB)':>10}")
+    for fn in args.workbooks:
+        sheets_old, time_old, peak_old = measure(read_sheets_per_open, fn)
+        sheets_new, time_new, peak_new = measure(read_xlsx_sheets, fn)
+        if list(sheets_old) != list(sheets_new) or \
+                any(not sheets_old[k].equals(sheets_new[k]) for k in sheets_old):
+            print(f"Warning: readers differ for {fn}")
+        print(f"{os.path.basename(fn):>28} {len(sheets_new):>6} {time_old:>19.3f} {peak_old:>10.1f} "
+              f"{time_new:>16.3f} {peak_new:>10.1f}")
+
+    return
+    # end of main
+
+
+if __name__ == '__main__':
+    main()
+
+# end of benchmark
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+#
+# Synthetic K-FIT networks
+#
+# Writes K-FIT style model, mechanism and data files of a random reaction network of a given size,
+# for benchmarks that need inputs larger (or smaller) than the k-ecoli74 and FDH examples.
+#
+# Static networks have reversible reactions with one or two substrates and products, some of them
+# inhibited, among metabolites that are connected by a chain of reactions, and exchange reactions for
+# part of the metabolites. Their flux data are steady-state fluxes drawn from the null space of the
+# stoichiometric matrix, for the wild type and for knockouts of the first reactions, so they are
+# consistent with the network but not with any kinetic parameters.
+#
+# Dynamic networks have irreversible Michaelis-Menten reactions with custom rate laws and first
+# order decay of the last metabolites. Their time courses are simulated from random kinetic
+# parameters, initial concentrations and enzyme levels, so they can be fitted exactly.
+#
+# Run from this directory to write the files of one network:
+#   python synthetic_kfit.py -n 50 -e 4 -o synthetic
+#   python synthetic_kfit.py -n 20 -e 3 -t 12 -d dynamic -o synthetic_dynamic
+
+
+def _formula(reactants: list, products: list) -> str:
+    """ Reaction formula of the K-FIT model file, e.g. '(1) M0 + (1) M3 <=> (1) M1' """
+    return " <=> ".join(" + ".join(f"(1) {met}" for met in side) for side in (reactants, products)).rstrip()
+
+
+def _network(n_reactions: int, n_metabolites: int, n_exchanges: int, rng) -> tuple[list, list, list]:
+    """
+    Random network of n_reactions internal reactions among n_metabolites metabolites, in which reaction i
+    converts metabolite i into metabolite i+1 (modulo n_metabolites) with at most one more substrate and
+    product, and n_exchanges metabolites, evenly spread, have an exchange reaction.
+    """
+    mets = [f"M{i}" for i in range(n_metabolites)]
+    reactions = []
+    for i in range(n_reactions):
+        substrate, product = mets[i % n_metabolites], mets[(i + 1) % n_metabolites]
+        others = [met for met in mets if met not in (substrate, product)]
+        reactants, products = [substrate], [product]
+        if others and rng.random() < 0.3:
+            reactants.append(others.pop(rng.integers(len(others))))
+        if others and rng.random() < 0.3:
+            products.append(others.pop(rng.integers(len(others))))
+        reactions.append((f"R{i}", reactants, products))
+    step = n_metabolites / n_exchanges
+    exchanges = [mets[int(k * step)] for k in range(n_exchanges)]
+    return mets, reactions, exchanges
+
+
+def _write_model(filename_model: str, mets: list, rows: list) -> None:
+    """ Writes the Reactions and Metabolites sheets of a K-FIT model file """
+    import pandas as pd
+
+    with pd.ExcelWriter(filename_model, engine='openpyxl') as writer:
+        pd.DataFrame(rows).to_excel(writer, sheet_name='Reactions', index=False)
+        pd.DataFrame({'ID': mets, 'Name': mets, 'Formula': None}).to_excel(writer, sheet_name='Metabolites',
+                                                                          index=False)
+
+
+def steady_state_fluxes(S, knockout: int = None, rng=None, scale: float = 100.0):
+    """
+    Random steady-state fluxes v (S v = 0) of a stoichiometric matrix, with the flux of reaction knockout
+    set to zero, scaled to a largest absolute flux of scale. Returns zero fluxes if the network cannot carry
+    flux.
+    """
+    import numpy as np
+    import scipy.linalg
+
+    rng = np.random.default_rng() if rng is None else rng
+    columns = [j for j in range(S.shape[1]) if j != knockout]
+    v = np.zeros(S.shape[1])
+    basis = scipy.linalg.null_space(S[:, columns])
+    if basis.shape[1] > 0:
+        v[columns] = basis @ rng.normal(size=basis.shape[1])
+        v *= scale / max(np.abs(v).max(), 1e-12)
+    return v
+
+
+def write_static_network(directory: str, n_reactions: int, n_metabolites: int = None, n_experiments: int = 1,
+                         n_exchanges: int = None, seed: int = 0) -> dict:
+    """
+    Writes the model, mechanism and flux data files of a random static network into directory.
+
+    Parameters
+    ----------
+    directory : str
+        Output directory, which must exist.
+    n_reactions : int
+        Number of internal reactions.
+    n_metabolites : int, optional
+        Number of metabolites. Defaults to three quarters of the internal reactions (at least 2).
+    n_experiments : int, optional
+        Number of experiments: the wild type and knockouts of the first (n_experiments - 1) internal
+        reactions. Defaults to 1.
+    n_exchanges : int, optional
+        Number of exchange reactions. Defaults to one fifth of the metabolites (at least 2).
+    seed : int, optional
+        Seed of the random network and data. Defaults to 0.
+
+    Returns
+    -------
+    dict
+        KETCHUP options of the files ('directory_model', 'filename_model', 'filename_mechanism',
+        'directory_data', 'filename_data', 'data_type' and 'data_format').
+    """
+    import os
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    n_metabolites = n_metabolites or max(3 * n_reactions // 4, 2)
+    n_exchanges = min(n_exchanges or max(n_metabolites // 5, 2), n_metabolites)
+    if n_experiments > n_reactions + 1:
+        raise ValueError(f"A network of {n_reactions} reactions has at most {n_reactions + 1} experiments.")
+    mets, reactions, exchanges = _network(n_reactions, n_metabolites, n_exchanges, rng)
+    reactions += [(f"EX_{met}", [met], []) for met in exchanges]
+
+    _write_model(os.path.join(directory, 'synthetic_model.xlsx'), mets,
+                 [{'Rxn ID': rxn, 'Rxn name': rxn, 'Rxn Formula': _formula(reactants, products),
+                   'Lower bound': -1000, 'Upper bound': 1000, 'Reversible': 1, 'macro/bm': 0, 'subsystem': 'S1'}
+                  for rxn, reactants, products in reactions])
+
+    # inhibitors are metabolites that do not take part in the reaction, as in the k-ecoli74 mechanisms
+    rows = []
+    for rxn, reactants, products in reactions:
+        others = [met for met in mets if met not in reactants + products]
+        exchange = rxn.startswith('EX_')
+        rows.append({'ID': rxn, 'mechanism': 'seq', 'SBO': ";".join(reactants), 'PRO': ";".join(products) or None,
+                     'CI': rng.choice(others) if others and not exchange and rng.random() < 0.1 else None,
+                     'UCI': None,
+                     'NCI': rng.choice(others) if others and not exchange and rng.random() < 0.1 else None,
+                     'act': None, 'exch': int(exchange), 'sub': 0})
+    pd.DataFrame(rows).to_excel(os.path.join(directory, 'synthetic_mechanism.xlsx'), index=False)
+
+    # steady-state fluxes of the wild type and the knockouts, with 10% standard deviations
+    index = {met: i for i, met in enumerate(mets)}
+    S = np.zeros((len(mets), len(reactions)))
+    for j, (_, reactants, products) in enumerate(reactions):
+        for met in reactants:
+            S[index[met], j] -= 1
+        for met in products:
+            S[index[met], j] += 1
+    rows = []
+    for k, mutant in enumerate(['WT'] + [rxn for rxn, _, _ in reactions[:n_experiments - 1]]):
+        v = steady_state_fluxes(S, knockout=k - 1 if k else None, rng=rng)
+        rows += [{'ID': rxn, 'Mutant': mutant, 'flx': v[j], 'SD': max(0.1 * abs(v[j]), 1.0), 'type': 'flx',
+                  'rxns': rxn} for j, (rxn, _, _) in enumerate(reactions)]
+    pd.DataFrame(rows).to_excel(os.path.join(directory, 'synthetic_data.xlsx'), index=False)
+
+    return {'directory_model': directory, 'filename_model': 'synthetic_model.xlsx',
+            'filename_mechanism': 'synthetic_mechanism.xlsx', 'directory_data': directory,
+            'filename_data': 'synthetic_data.xlsx', 'data_type': 'static', 'data_format': 'kfit'}
+
+
+def _rate_law(reactants: list) -> str:
+    """ Irreversible Michaelis-Menten rate law of the substrates, in the custom rate law grammar """
+    numerator = " * ".join(["KCAT[f]", "[E]"] + [f"[{met}]" for met in reactants])
+    denominator = " * ".join(f"(KM[{met}] + [{met}])" for met in reactants)
+    return f"{numerator} / {denominator}" if len(reactants) == 1 else f"{numerator} / ({denominator})"
+
+
+def write_dynamic_network(directory: str, n_reactions: int, n_metabolites: int = None, n_experiments: int = 1,
+                          n_time_points: int = 10, n_exchanges: int = None, t_end: float = 10.0,
+                          seed: int = 0) -> dict:
+    """
+    Writes the model, mechanism (custom rate laws) and flat time course data files of a random dynamic
+    network into directory. The concentration of the last metabolite is observed in every experiment.
+
+    Parameters
+    ----------
+    directory : str
+        Output directory, which must exist.
+    n_reactions : int
+        Number of enzymatic reactions.
+    n_metabolites : int, optional
+        Number of metabolites. Defaults to the number of reactions plus one (at least 2).
+    n_experiments : int, optional
+        Number of experiments, each with random initial concentrations of the first metabolites and enzyme
+        levels. Defaults to 1.
+    n_time_points : int, optional
+        Number of time points of each experiment after time zero. Defaults to 10.
+    n_exchanges : int, optional
+        Number of metabolites, counted from the last one, that decay in a first order reaction. Defaults to 1.
+    t_end : float, optional
+        Time of the last data point. Defaults to 10.
+    seed : int, optional
+        Seed of the random network, parameters and data. Defaults to 0.
+
+    Returns
+    -------
+    dict
+        KETCHUP options of the files ('directory_model', 'filename_model', 'filename_mechanism',
+        'directory_data', 'filename_data', 'data_type' and 'data_format').
+    """
+    import os
+    import numpy as np
+    import pandas as pd
+    from ktools.io import read_kfit_model_xlsx
+    from ktools.core import compile_custom_rate_laws, create_stoichiometric_matrix, RateLawSimulator
+
+    rng = np.random.default_rng(seed)
+    n_metabolites = n_metabolites or max(n_reactions + 1, 2)
+    n_exchanges = min(n_exchanges or 1, n_metabolites)
+    mets, reactions, _ = _network(n_reactions, n_metabolites, 1, rng)
+    decays = [(f"{met}_decay", [met], []) for met in mets[::-1][:n_exchanges]]
+
+    filename_model = os.path.join(directory, 'synthetic_dynamic_model.xlsx')
+    filename_mechanism = os.path.join(directory, 'synthetic_dynamic_mechanism.xlsx')
+    _write_model(filename_model, mets,
+                 [{'Rxn ID': rxn, 'Rxn name': rxn, 'Rxn Formula': _formula(reactants, products),
+                   'Lower bound': 0, 'Upper bound': 1000, 'Reversible': 1, 'macro/bm': 0,
+                   'subsystem': 'decomposition' if not products else 'enzyme',
+                   'Enzyme ID': f"enz_{rxn}" if products else None}
+                  for rxn, reactants, products in reactions + decays])
+    pd.DataFrame([{'ID': rxn, 'mechanism': 'seq', 'SBO': ";".join(reactants), 'PRO': ";".join(products) or None,
+                   'CI': None, 'UCI': None, 'NCI': None, 'act': None, 'exch': 0, 'sub': 0,
+                   'rate law': _rate_law(reactants) if products else f"KCONS[{reactants[0]}]*[{reactants[0]}]"}
+                  for rxn, reactants, products in reactions + decays]).to_excel(filename_mechanism, index=False)
+
+    # simulate the experiments from random parameters, within the default bounds of the model variables
+    m_model, mech_df = read_kfit_model_xlsx(filename_model, filename_mechanism, mech_type='custom')
+    simulator = RateLawSimulator(compile_custom_rate_laws(mech_df, m_model), create_stoichiometric_matrix(m_model))
+    ranges = {'KCAT': (0.5, 5.0), 'KM': (0.1, 10.0), 'KI': (0.1, 10.0), 'KCONS': (0.01, 0.1)}
+    p = np.array([np.exp(rng.uniform(*np.log(ranges[kind]))) for kind, _ in simulator.parameter_ids])
+    observed = mets[-1]
+    enzymes = [f"enz_{rxn}" for rxn, _, _ in reactions]
+    times = np.linspace(0, t_end, n_time_points + 1)
+    sources = mets[:max(n_metabolites // 4, 1)]
+
+    columns = ['experiment ID', 'Time', f"Values[{observed}]"] + \
+              [f"Values[{enz}]_0" for enz in enzymes] + [f"Values[{met}]_0" for met in mets]
+    rows = [columns,
+            ['id', 't', 'c'] + ['e'] * len(enzymes) + ['c'] * len(mets),
+            ['meta', 'time', 'dependent'] + ['independent'] * (len(enzymes) + len(mets))]
+    for k in range(n_experiments):
+        c0 = {met: rng.uniform(1.0, 10.0) for met in sources}
+        e0 = {enz: rng.uniform(0.5, 2.0) for enz in enzymes}
+        sol = simulator.simulate(simulator.concentration_vector(c0), p, times,
+                                 simulator.enzyme_vector(e0, m_model), method='BDF', rtol=1e-8, atol=1e-10)
+        if not sol.success:
+            raise ValueError(f"The simulation of experiment {k} failed: {sol.message}")
+        y = sol.y[simulator.s_matrix.species_index[observed]]
+        rows.append([f"X{k}", 0.0, max(y[0], 0.0)] + [e0[enz] for enz in enzymes] +
+                    [c0.get(met, 0.0) for met in mets])
+        rows += [[f"X{k}", t, max(c, 0.0)] + [""] * (len(enzymes) + len(mets)) for t, c in zip(times[1:], y[1:])]
+    filename_data = 'synthetic_dynamic_data.tsv'
+    with open(os.path.join(directory, filename_data), 'w') as data_file:
+        data_file.write("".join("\t".join(str(item) for item in row) + "\n" for row in rows))
+
+    return {'directory_model': directory, 'filename_model': os.path.basename(filename_model),
+            'filename_mechanism': os.path.basename(filename_mechanism), 'directory_data': directory,
+            'filename_data': filename_data, 'data_type': 'dynamic', 'data_format': 'flat'}
+
+
+def main() -> None:
+    """
+    Main function to write the files of a synthetic network.
+    """
+    import os
+    import sys
+    import argparse
+
+    # add path to ktools if not installed
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+    parser = argparse.ArgumentParser(description="Synthetic K-FIT network generator")
+    parser.add_argument("-n", "--reactions", type=int, default=50, help="Number of reactions")
+    parser.add_argument("-m", "--metabolites", type=int, default=None, help="Number of metabolites")
+    parser.add_argument("-e", "--experiments", type=int, default=1, help="Number of experiments")
+    parser.add_argument("-t", "--time-points", type=int, default=10,
+                        help="Number of time points per experiment (dynamic data)")
+    parser.add_argument("-d", "--data-type", default='static', choices=['static', 'dynamic'], help="Data type")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("-o", "--output", default='synthetic', help="Output directory")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    if args.data_type == 'static':
+        files = write_static_network(args.output, args.reactions, args.metabolites, args.experiments, seed=args.seed)
+    else:
+        files = write_dynamic_network(args.output, args.reactions, args.metabolites, args.experiments,
+                                      args.time_points, seed=args.seed)
+    for key, value in files.items():
+        print(f"{key}: {value}")
+
+    return
+    # end of main
+
+
+if __name__ == '__main__':
+    main()
+
+# end of generator
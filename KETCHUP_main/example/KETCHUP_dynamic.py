@@ -76,7 +76,8 @@ def main() -> None:
 
     import ktools
     from ktools.ketchup import (ketchup_generate_model, solve_ketchup_model, ketchup_output_write,
-                                ketchup_argument_parser)
+                                ketchup_argument_parser, ketchup_multistart, solve_ketchup_model_adaptive,
+                                ketchup_phase_timer)
     from ktools.io import result_dump, create_sbml_kinetic_model
     from ktools.ketchup.analysis import evaluate_stability, infeasible_constraints
     from timeit import default_timer as timer
@@ -90,16 +91,29 @@ def main() -> None:
 
     ketchup_options = ketchup_user_options(args)
 
-    # create the model
-    ketchup_model = ketchup_generate_model(ketchup_options)
-
-    # solve the ketchup model
-    time_start = timer();
-    results = solve_ketchup_model(ketchup_model, ketchup_options)
-    time_end = timer()
-
-    # output results
-    ketchup_output_write(results, ketchup_model, ketchup_options, time_start, time_end)
+    # alternatively, solve many starts (seeds) in parallel when requested through the
+    #    multistart (-ms) and processes (-np) command line options or program options
+    if ketchup_options['multistart'] > 1:
+        ketchup_multistart(ketchup_options)
+        return
+
+    # with the timing (-t) or profile (-pr) options, the phases of the run are timed and written
+    #    with the results
+    with ketchup_phase_timer(ketchup_options):
+        # create the model
+        ketchup_model = ketchup_generate_model(ketchup_options)
+
+        # solve the ketchup model. With adaptive discretization, the model is refined and solved again
+        #    until the estimated discretization error is within tolerance
+        time_start = timer();
+        if ketchup_options['discretization_adaptive']:
+            results, ketchup_model = solve_ketchup_model_adaptive(ketchup_model, ketchup_options)
+        else:
+            results = solve_ketchup_model(ketchup_model, ketchup_options)
+        time_end = timer()
+
+        # output results
+        ketchup_output_write(results, ketchup_model, ketchup_options, time_start, time_end)
 
     return
     # end of main
@@ -67,7 +67,7 @@ def main() -> None:
 
     import ktools
     from ktools.ketchup import (ketchup_generate_model, solve_ketchup_model, ketchup_output_write,
-                                ketchup_argument_parser)
+                                ketchup_argument_parser, ketchup_multistart, ketchup_phase_timer)
     from ktools.ketchup.analysis import evaluate_stability
     from timeit import default_timer as timer
 
@@ -84,16 +84,25 @@ def main() -> None:
     #    uncomment the following line
     # ketchup_options = ktools.ketchup.ketchup_model_options(args)
 
-    # create the model
-    ketchup_model = ketchup_generate_model(ketchup_options)
-
-    # solve the ketchup model
-    time_start = timer();
-    results = solve_ketchup_model(ketchup_model, ketchup_options)
-    time_end = timer()
-
-    # output results
-    ketchup_output_write(results, ketchup_model, ketchup_options, time_start, time_end)
+    # alternatively, solve many starts (seeds) in parallel when requested through the
+    #    multistart (-ms) and processes (-np) command line options or program options
+    if ketchup_options['multistart'] > 1:
+        ketchup_multistart(ketchup_options)
+        return
+
+    # with the timing (-t) or profile (-pr) options, the phases of the run are timed and written
+    #    with the results
+    with ketchup_phase_timer(ketchup_options):
+        # create the model
+        ketchup_model = ketchup_generate_model(ketchup_options)
+
+        # solve the ketchup model
+        time_start = timer();
+        results = solve_ketchup_model(ketchup_model, ketchup_options)
+        time_end = timer()
+
+        # output results
+        ketchup_output_write(results, ketchup_model, ketchup_options, time_start, time_end)
 
     return
     # end of main
@@ -18,7 +18,7 @@ def main() -> None:
     import ktools
     from ktools.ketchup import (ketchup_generate_model, solve_ketchup_model,
                                 ketchup_output_write,
-                                ketchup_argument_parser)
+                                ketchup_argument_parser, ketchup_multistart, ketchup_phase_timer)
     from ktools.ketchup.ketchup import ketchup_model_options
     from ktools.ketchup.analysis import evaluate_stability
     from timeit import default_timer as timer
@@ -29,16 +29,25 @@ def main() -> None:
     # only use program options yaml file passed through command line arguments by using empty user_option dictionary
     ketchup_options = ketchup_model_options({}, args)
 
-    # create the model
-    ketchup_model = ketchup_generate_model(ketchup_options)
-
-    # solve the ketchup model
-    time_start = timer();
-    results = solve_ketchup_model(ketchup_model, ketchup_options)
-    time_end = timer()
-
-    # output results
-    ketchup_output_write(results, ketchup_model, ketchup_options, time_start, time_end)
+    # alternatively, solve many starts (seeds) in parallel when requested through the
+    #    multistart (-ms) and processes (-np) command line options or program options
+    if ketchup_options['multistart'] > 1:
+        ketchup_multistart(ketchup_options)
+        return
+
+    # with the timing (-t) or profile (-pr) options, the phases of the run are timed and written
+    #    with the results
+    with ketchup_phase_timer(ketchup_options):
+        # create the model
+        ketchup_model = ketchup_generate_model(ketchup_options)
+
+        # solve the ketchup model
+        time_start = timer();
+        results = solve_ketchup_model(ketchup_model, ketchup_options)
+        time_end = timer()
+
+        # output results
+        ketchup_output_write(results, ketchup_model, ketchup_options, time_start, time_end)
 
     return
     # end of main
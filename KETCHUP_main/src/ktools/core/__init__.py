@@ -1,13 +1,23 @@
 """Provide functions for creating kinetic models for use within Pyomo."""
 
 from .fork import create_data_dict
-from .fork import create_initial_model
+from .fork import create_initial_model, create_start_design, scale_initial_values, initialize_kinetic_parameters
+from .fork import count_kinetic_parameters
+from .fork import create_step_index, ElementalStep
+from .fork import create_stoichiometric_matrix, StoichiometricMatrix
 from .fork import create_dynamic_data_dict
 from .fork import parse_time_delay
+from .fork import parse_data_selector, select_experiments
 from .fork import create_sMB, create_sKM
+from .fork import create_static_block_template, StaticBlockTemplate
 from .fork import create_dMB, create_dKM
+from .fork import TimeDiscretization, time_set, estimate_discretization_error, refine_time_points
 from .fork import enz_sum, stoichiometry, elemental_vf, elemental_vr
-from .fork import net_reaction_rate, es_net_balance
+from .fork import elemental_vf_expression, elemental_vr_expression
+from .fork import net_reaction_rate, d_net_reaction_rate, es_net_balance
+from .fork import compile_mm_rate_laws, MichaelisMentenRateLaw
 from .fork import custom_rate
+from .rate_law import parse_rate_law, evaluate_rate_law, compile_custom_rate_laws, CustomRateLaw
+from .simulation import RateLawSimulator
 
 
@@ -3,7 +3,8 @@ FORmulate Kinetic model
 
 Formulates the kinetic models for the solver
 """
-from typing import Any
+from typing import Any, NamedTuple
+from types import MappingProxyType
 
 from pyomo.environ import *
 from pyomo.dae import *
@@ -11,8 +12,203 @@ import numpy as np
 import pandas as pd
 import re
 import cobra.core.model
+import scipy.sparse
 
-def create_data_dict(experiments_df: pd.DataFrame, data_selector: dict = None) -> dict:
+from .rate_law import compile_custom_rate_laws, PARAMETER_KINDS
+
+
+class ElementalStep(NamedTuple):
+    """ Participants of a single elemental step, looked up by the constraint rules """
+    rxn_id: str
+    step_id: str
+    reactant_enzyme: str
+    reactant_metabolite: str | None
+    product_enzyme: str
+    product_metabolite: str | None
+    type: str
+
+
+def create_step_index(mech_df: pd.DataFrame) -> MappingProxyType:
+    """
+    Create an immutable index of the elemental steps in the mechanism DataFrame, so that constraint
+    rules do not need to scan the DataFrame or split the step names.
+
+    Parameters
+    ----------
+    mech_df : pd.DataFrame
+        DataFrame containing elemental mechanism information.
+
+    Returns
+    -------
+    MappingProxyType
+        Read-only mapping of elemental step name ('<rxn ID>_<step ID>') to ElementalStep, in the
+        order of the mechanism DataFrame.
+    """
+    step_index = {}
+    for rxn, step, reactant, product, step_type in zip(mech_df['rxn ID'], mech_df['step ID'],
+                                                         mech_df['reactant'], mech_df['product'],
+                                                         mech_df['type']):
+        step_index[f"{rxn}_{step}"] = ElementalStep(rxn, step,
+                                                    reactant[0], reactant[1] if len(reactant) > 1 else None,
+                                                    product[0], product[1] if len(product) > 1 else None,
+                                                    step_type)
+    return MappingProxyType(step_index)
+
+
+class StoichiometricMatrix(NamedTuple):
+    """ Compiled stoichiometry of a COBRApy model, with species as rows and reactions as columns """
+    S: scipy.sparse.csr_matrix
+    species: tuple
+    reactions: tuple
+    species_index: MappingProxyType
+    reaction_index: MappingProxyType
+
+
+def create_stoichiometric_matrix(m_model: cobra.core.model.Model) -> StoichiometricMatrix:
+    """
+    Compile the COBRApy model into a sparse (CSR) stoichiometric matrix with ID to index maps, so that
+    the mass balance constraints of every experiment block can be written without walking the
+    COBRApy object graph.
+
+    Parameters
+    ----------
+    m_model : cobra.core.model.Model
+        The COBRApy model corresponding to the metabolic network.
+
+    Returns
+    -------
+    StoichiometricMatrix
+        Stoichiometric matrix with species and reactions in the order of the COBRApy model.
+    """
+    species = tuple(m.id for m in m_model.metabolites)
+    reactions = tuple(r.id for r in m_model.reactions)
+    species_index = {s: i for i, s in enumerate(species)}
+    rows, cols, coeffs = [], [], []
+    for j, rxn in enumerate(m_model.reactions):
+        for met, coeff in rxn.metabolites.items():
+            rows.append(species_index[met.id])
+            cols.append(j)
+            coeffs.append(coeff)
+    S = scipy.sparse.csr_matrix((coeffs, (rows, cols)), shape=(len(species), len(reactions)))
+    return StoichiometricMatrix(S, species, reactions, MappingProxyType(species_index),
+                                MappingProxyType({r: j for j, r in enumerate(reactions)}))
+
+
+def _product(terms):
+    """ Left-to-right product of a non-empty sequence of terms """
+    out = terms[0]
+    for term in terms[1:]:
+        out = out * term
+    return out
+
+
+def _sum(terms):
+    """ Left-to-right sum of a non-empty sequence of terms """
+    out = terms[0]
+    for term in terms[1:]:
+        out = out + term
+    return out
+
+
+class MichaelisMentenRateLaw(NamedTuple):
+    """
+    Michaelis-Menten rate law of a single reaction, compiled from the mechanism DataFrame and the
+    COBRApy model. Produces Pyomo expressions for any experiment block (and time point) by index lookups.
+    """
+    rxn_id: str
+    substrates: tuple  # substrate ids from the mechanism, used for the numerator
+    products: tuple  # product ids from the mechanism, used for the numerator
+    reactants: tuple  # (id, |stoichiometric coefficient|) of the COBRApy reactants
+    products_model: tuple  # (id, |stoichiometric coefficient|) of the COBRApy products
+    inhibitors_ci: tuple  # competitive and noncompetitive inhibitor ids
+    inhibitors_uci: tuple  # uncompetitive and noncompetitive inhibitor ids
+    reverse_sign: bool  # True for reversible boundary reactions without products
+
+    def static_rate(self, m, c, e):
+        """ Steady-state rate expression using parameters of m and concentrations c[met] and enzyme e """
+        r = self.rxn_id
+        num = m.Kcat_f[r] * _product([c[x] for x in self.substrates]) / \
+              (_product([m.KM_reactants[f"{r}+{x}"] for x, _ in self.reactants]))
+        den = _sum([coeff*c[x]/m.KM_reactants[f"{r}+{x}"] for x, coeff in self.reactants])
+        #uncompetitive inhibition
+        if self.inhibitors_uci:
+            den = (den) * (1 + _sum([c[x]/m.KM_inhibitors[f"{r}+{x}_uci"] for x in self.inhibitors_uci]))
+        #competitive inhibition
+        if self.inhibitors_ci:
+            den += _sum([c[x]/m.KM_inhibitors[f"{r}+{x}_ci"] for x in self.inhibitors_ci])
+        if self.products:
+            num -= m.Kcat_r[r] * _product([c[x] for x in self.products]) / \
+                   (_product([m.KM_products[f"{r}+{x}"] for x, _ in self.products_model]))
+            den += _sum([coeff*c[x]/m.KM_products[f"{r}+{x}"] for x, coeff in self.products_model])
+        elif self.reverse_sign:
+            num *= -1
+        return num * e/den
+
+    def dynamic_rate(self, m, c, e, t):
+        """ Dynamic rate expression at time t using parameters of m, concentrations c[t,met] and enzyme e """
+        r = self.rxn_id
+        num = m.Kcat_f[r] * _product([c[t,x] for x in self.substrates]) / \
+              (_product([m.KM_reactants[f"{r}+{x}"] for x, _ in self.reactants]))
+        den = _product([(1 + coeff*c[t,x]/m.KM_reactants[f"{r}+{x}"]) for x, coeff in self.reactants])
+        #uncompetitive inhibition
+        if self.inhibitors_uci:
+            den = (den) * (1 + _sum([c[t,x]/m.KM_inhibitors[f"{r}+{x}_uci"] for x in self.inhibitors_uci]))
+        #competitive inhibition
+        if self.inhibitors_ci:
+            den += _sum([c[t,x]/m.KM_inhibitors[f"{r}+{x}_ci"] for x in self.inhibitors_ci])
+        if self.products:
+            num -= m.Kcat_r[r] * _product([c[t,x] for x in self.products]) / \
+                   (_product([m.KM_products[f"{r}+{x}"] for x, _ in self.products_model]))
+            den += _product([(1 + coeff*c[t,x]/m.KM_products[f"{r}+{x}"]) for x, coeff in self.products_model])
+        elif self.reverse_sign:
+            num *= -1
+        return num * e/(den - 1)
+
+
+def compile_mm_rate_laws(m_model: cobra.core.model.Model, mech_df: pd.DataFrame) -> MappingProxyType:
+    """
+    Compile the Michaelis-Menten definition (substrates, products and ci/uci/nci inhibitors) of every
+    reaction in the mechanism DataFrame into a reusable rate law builder.
+
+    Parameters
+    ----------
+    m_model : cobra.core.model.Model
+        The COBRApy model corresponding to the metabolic network.
+    mech_df : pd.DataFrame
+        DataFrame containing Michaelis-Menten mechanism information.
+
+    Returns
+    -------
+    MappingProxyType
+        Read-only mapping of reaction ID to MichaelisMentenRateLaw.
+    """
+    reversible_boundary = {rxn.id for rxn in m_model.boundary if rxn.lower_bound < 0}
+    mech = {}
+    for rxn, reactant, product, step_type in zip(mech_df['rxn ID'], mech_df['reactant'],
+                                                 mech_df['product'], mech_df['type']):
+        items = mech.setdefault(rxn, {'reactant': [], 'product': [], 'competitive': [],
+                                      'uncompetitive': [], 'noncompetitive': []})
+        if step_type == 'product':
+            items['product'].append(product[0])
+        elif step_type in items:
+            items[step_type].append(reactant[0])
+
+    rate_laws = {}
+    for rxn, items in mech.items():
+        cobra_rxn = m_model.reactions.get_by_id(rxn)
+        rate_laws[rxn] = MichaelisMentenRateLaw(
+            rxn,
+            tuple(items['reactant']),
+            tuple(items['product']),
+            tuple((x.id, abs(cobra_rxn.metabolites[x])) for x in cobra_rxn.reactants),
+            tuple((x.id, abs(cobra_rxn.metabolites[x])) for x in cobra_rxn.products),
+            tuple(items['competitive'] + items['noncompetitive']),
+            tuple(items['uncompetitive'] + items['noncompetitive']),
+            rxn in reversible_boundary)
+    return MappingProxyType(rate_laws)
+
+
+def create_data_dict(experiments_df: pd.DataFrame, data_selector: list | dict = None) -> dict:
     """
     Create data dictionary from the experiments in a form used in Pyomo.DAE computations
     For use with data for with stead state solutions.
@@ -21,45 +217,52 @@ def create_data_dict(experiments_df: pd.DataFrame, data_selector: dict = None) -
     ----------
     experiments_df : pd.DataFrame
         DataFrame containing experimental data.
-    data_selector: dict
-        Dictionary by experiment ID that selects which subset of the data to use in the analysis.
-        Currently, this feature is not yet implemented.
+    data_selector: list or dict, optional
+        Selection of the experiments and reactions to use in the analysis (see parse_data_selector).
+        Defaults to None (all data).
 
     Returns
     -------
     dict
         Nested dictionary of experimental data arranged by blocks.
+
+    Raises
+    ------
+    ValueError
+        If data_selector selects a time window, which static data do not have.
     """
     experiment_keys = experiments_df['experiment ID'].unique().tolist()
-    data = {}
-    rev_data = {}
-
-    for item in experiment_keys:#range(len(experiment_keys)):
-
-        # set up the flux data (flx) as a dictionary
-        _tmp = experiments_df[(experiments_df['experiment ID'] == item) & (experiments_df['type'] == 'flx')]
-
-        t = {}
+    selection = parse_data_selector(data_selector, experiment_keys)
+    if any(s['time'] is not None for s in selection.values()):
+        raise ValueError(f"'data_selection' time windows are only supported for dynamic data")
 
-        for idx, row in _tmp.iterrows():
-            t[row['rxn ID']] = (row['flx'], row['SD'])
-        data[item] = t
-
-        # set up rev items as second dictionary
-        _tmp = experiments_df[(experiments_df['experiment ID'] == item) & (experiments_df['type'] == 'rev')]
-
-        if not _tmp.empty:
-            t = {}
+    data = {item: {} for item in selection}
+    rev_data = {}
 
-            for idx, row in _tmp.iterrows():
-                t[row['rxn ID']] = (row['flx'], row['SD'])
-            rev_data[item+'_rev'] = t
+    # a single pass over the experiments; the (flx, SD) pairs of each group are taken by row position
+    rxn_ids = experiments_df['rxn ID'].to_numpy()
+    flx = experiments_df['flx'].to_numpy()
+    sd = experiments_df['SD'].to_numpy()
+    for (item, data_type), idx in experiments_df.groupby(['experiment ID', 'type'], sort=False).indices.items():
+        if item not in selection:
+            continue
+        t = dict(zip(rxn_ids[idx].tolist(), zip(flx[idx].tolist(), sd[idx].tolist())))
+        if data_type == 'flx':
+            # set up the flux data (flx) as a dictionary
+            observations = selection[item]['observations']
+            if observations is not None:
+                _check_observations(item, observations, t)
+                t = {rxn: v for rxn, v in t.items() if rxn in observations}
+            data[item] = t
+        elif data_type == 'rev':
+            # set up rev items as second dictionary
+            rev_data[item + '_rev'] = t
 
     # For now, only return the 'flx' components. The 'rev' are not yet used.
     return data
 
 
-def create_dynamic_data_dict(experiments_df: pd.DataFrame, data_selector: dict = None):
+def create_dynamic_data_dict(experiments_df: pd.DataFrame, data_selector: list | dict = None):
     """
     Create data dictionary from the experiments in a form used in Pyomo.DAE computations.
     For use with dynamic data that depend on time.
@@ -68,14 +271,19 @@ def create_dynamic_data_dict(experiments_df: pd.DataFrame, data_selector: dict =
     ----------
     experiments_df : pd.DataFrame
         DataFrame containing experimental data.
-    data_selector: dict
-        Dictionary by experiment ID that selects which subset of the data to use in the analysis.
-        Currently, this feature is not yet implemented.
+    data_selector: list or dict, optional
+        Selection of the experiments, observed species and time windows to use in the analysis (see
+        parse_data_selector). Initial values are kept for every selected experiment. Defaults to None (all data).
 
     Returns
     -------
     dict
         Nested dictionary of experimental data arranged by blocks.
+
+    Raises
+    ------
+    ValueError
+        If the time window of an experiment contains no data.
     """
 
     # As with static_data_dict, data blocks are indicated by experiment id
@@ -84,67 +292,202 @@ def create_dynamic_data_dict(experiments_df: pd.DataFrame, data_selector: dict =
     from ktools.util import extract_from_brackets
 
     experiment_keys = experiments_df.loc[2:, 'experiment ID'].unique().tolist()
-
-    # print (experiment_keys)
+    selection = parse_data_selector(data_selector, experiment_keys)
 
     data_dict = {}
 
     col_t0 = [col for col in experiments_df.columns if col.endswith("]_0")]
 
-    col_e = [col for col in experiments_df.columns if experiments_df.loc[0, col] in (["e"])]  # dfr.iloc[0].isin(["e"])
-    col_c = [col for col in experiments_df.columns if experiments_df.loc[0, col] in (["c"])]
-
     col_dependent = [col for col in experiments_df.columns if experiments_df.loc[1, col] in ["dependent"]]
-    col_independent = [col for col in experiments_df.columns if experiments_df.loc[1, col] in ["independent"]]
     col_ignore = [col for col in experiments_df.columns if
                   experiments_df.loc[1, col] not in ["time", "independent", "dependent"]]
     col_time = [col for col in experiments_df.columns if experiments_df.loc[1, col] in ["time", "dependent"]]
 
     # TODO: reindex columns to ensure that Time will always come first
 
-    # print (f"{col_dependent = }\n{col_ignore = }\n{col_e =}" )
+    # columns flagged to be ignored are not used, so their initial values are skipped
+    t0_keys = {}
+    for item in col_t0:
+        if item not in col_ignore:
+            t0_keys[item] = extract_from_brackets(item)
+    dep_keys = {'Time': col_time[0]}
+    for item in col_dependent:
+        dep_keys[extract_from_brackets(item)] = item
 
-    for k in experiment_keys:
-        # set up the data as a dictionary of just the one experiment
-        _df_tmp = experiments_df[(experiments_df['experiment ID'] == k)].reset_index(drop=True)
-        # note: each slice now starts at row 0
+    # row positions of each experiment from a single grouping, and the used columns as arrays
+    rows = experiments_df.groupby('experiment ID', sort=False).indices
+    values = {col: experiments_df[col].to_numpy() for col in set(t0_keys) | set(dep_keys.values())}
+    no_rows = np.array([], dtype=np.intp)
 
-        # filter all columns that are flagged to be ignored
-        # TODO: add method to enable data selection at the individual experiment level.
-        #       for now, the data_selector dictionary is not used
-        _df_tmp = _df_tmp.drop(columns=col_ignore)
+    for k, selected in selection.items():
+        idx = rows.get(k, no_rows)
 
-        # print (_df_tmp)
         _dict_t0_tmp = {}
-        for item in col_t0:
-            # print (extract_from_brackets(item))
-            try:
-                # print(extract_from_brackets(item), _tmp.loc[2,item])
-                _dict_t0_tmp[extract_from_brackets(item)] = _df_tmp.loc[0, item]
-            except Exception as e:
-                #print(f"{e}")
-                pass
-            # print (_dict_t0_tmp)
-
-        _dict_dep_tmp = {}
-        # exract out the single time data column
-        _dict_dep_tmp['Time'] = _df_tmp.loc[:, col_time[0]].values.tolist()
-        #print (f"{col_dependent = }")
-        for item in col_dependent:
-            try:
-                _dict_dep_tmp[extract_from_brackets(item)] = _df_tmp.loc[:, item].values.tolist()
-            except Exception as e:
-                print (f"{e}")
-                pass
-            #print (_dict_dep_tmp)
+        if len(idx):
+            for item, key in t0_keys.items():
+                _dict_t0_tmp[key] = values[item][idx[0]]
+
+        # select the rows within the time window and the observed species
+        if selected['time'] is not None:
+            start, end = selected['time']
+            t = values[dep_keys['Time']][idx].astype(float)
+            idx = idx[(t >= start) & (t <= end)]
+            if not len(idx):
+                raise ValueError(f"'data_selection' time window {selected['time']} of experiment {k} contains no data")
+        _dep_keys = dep_keys
+        if selected['observations'] is not None:
+            _check_observations(k, selected['observations'], dep_keys)
+            _dep_keys = {key: item for key, item in dep_keys.items()
+                         if key == 'Time' or key in selected['observations']}
+
+        _dict_dep_tmp = {key: values[item][idx].tolist() for key, item in _dep_keys.items()}
 
         data_dict.update({k: {"t0": _dict_t0_tmp, "time": _dict_dep_tmp}})
 
-        # print (_tmp[col_dependent])
-
     return data_dict
 
 
+def _check_observations(key, observations, available) -> None:
+    """ Warns about selected observations of an experiment that are not in its data """
+    missing = [o for o in observations if o not in available]
+    if missing:
+        import warnings
+        warnings.warn(f"Warning: 'data_selection' observations {missing} not found in the data of experiment {key}")
+
+
+def parse_data_selector(data_selector: list | dict | None, keys: list) -> dict:
+    """Parses and validates a data selection and converts it into a standardized dictionary.
+
+    Parameters
+    ----------
+    data_selector : list, dict or None
+        Data selection. None selects all data, and a list selects experiments by ID. A dictionary by
+        experiment ID selects each experiment with True or False, its observations (reaction IDs of
+        static data or observed species of dynamic data) with a list, or observations and a time window
+        with a dictionary of the items 'observations' and 'time' ([start, end], inclusive, where None is
+        unbounded). Experiments that are not in the dictionary are selected.
+    keys : list
+        List of experiment IDs.
+
+    Returns
+    -------
+    dict
+        Dictionary by selected experiment ID, in the order of keys, with the selected 'observations'
+        and 'time' window of each experiment (None for all).
+
+    Raises
+    ------
+    ValueError
+        If an item of 'data_selector' is not of a supported data type, or no experiment is selected.
+    KeyError
+        If 'data_selector' contains experiment IDs that are not in keys.
+    """
+
+    if data_selector is None:
+        data_selector = {}
+    elif isinstance(data_selector, (list, tuple, set)):
+        missing = [k for k in data_selector if k not in keys]
+        if missing:
+            raise KeyError(f"'data_selection' experiment IDs {missing} not found in the data")
+        data_selector = {k: k in data_selector for k in keys}
+    elif not isinstance(data_selector, dict):
+        raise ValueError(f"'data_selection' option is not of a correct data type: currently {type(data_selector)}")
+
+    missing = [k for k in data_selector if k not in keys]
+    if missing:
+        raise KeyError(f"'data_selection' experiment IDs {missing} not found in the data")
+
+    selection = {}
+    for k in keys:
+        item = data_selector.get(k, True)
+        observations = None
+        window = None
+        if isinstance(item, (bool, np.bool_)):
+            if not item:
+                continue
+        elif isinstance(item, (list, tuple)):
+            observations = list(item)
+        elif isinstance(item, dict):
+            if set(item) - {'observations', 'time'}:
+                raise ValueError(f"'data_selection' of experiment {k} has unknown items {set(item) - {'observations', 'time'}}")
+            if item.get('observations') is not None:
+                observations = list(item['observations'])
+            if item.get('time') is not None:
+                if not isinstance(item['time'], (list, tuple)) or len(item['time']) != 2:
+                    raise ValueError(f"'data_selection' time window of experiment {k} must be [start, end]")
+                start, end = item['time']
+                window = (-np.inf if start is None else float(start), np.inf if end is None else float(end))
+        else:
+            raise ValueError(f"'data_selection' of experiment {k} is not of a correct data type: currently {type(item)}")
+        selection[k] = {'observations': observations, 'time': window}
+
+    if not selection:
+        raise ValueError(f"'data_selection' option does not select any experiment")
+    return selection
+
+
+def select_experiments(ketchup_model: pyomo.core.ConcreteModel, data_selector: list | dict) -> list:
+    """
+    Activates the experiment blocks of a KETCHUP model selected by a data selection and deactivates the
+    others, together with the top-level constraints indexed by them and, with the reference block, the
+    basis concentration constraints, and sets the objective to the sum of the errors of the selected
+    experiments. Subsets of the experiments (e.g., for leave-one-out fits) can
+    thus be solved without reading the data or rebuilding the model again.
+
+    Parameters
+    ----------
+    ketchup_model : pyomo.core.ConcreteModel
+        A KETCHUP Pyomo model.
+    data_selector : list or dict
+        Selection of experiments (see parse_data_selector). Observation and time window selections only
+        apply when the data dictionary is created and are ignored here.
+
+    Returns
+    -------
+    list
+        The IDs of the selected experiments.
+    """
+    keys = list(ketchup_model.EXPERIMENTS)
+    selection = parse_data_selector(data_selector, keys)
+    if any(s['observations'] is not None or s['time'] is not None for s in selection.values()):
+        import warnings
+        warnings.warn(f"Warning: 'data_selection' observations and time windows are ignored for model blocks")
+
+    active = []
+    for key, block in ketchup_model.experiment.items():
+        if key in selection:
+            if not block.active:
+                block.activate()
+            active.append(block)
+        elif block.active:
+            block.deactivate()
+
+    # top-level constraints that link each experiment block to the kinetic parameters
+    for constraint in ketchup_model.component_objects(Constraint, descend_into=False):
+        if not constraint.is_indexed() or \
+                not any(s is ketchup_model.EXPERIMENTS for s in constraint.index_set().subsets()):
+            continue
+        for index, constraint_data in constraint.items():
+            key = index[0] if isinstance(index, tuple) else index
+            if key in selection:
+                constraint_data.activate()
+            else:
+                constraint_data.deactivate()
+
+    # the basis concentrations are constrained only while the reference block is selected
+    ref_conc_constraint = ketchup_model.component('ref_conc_constraint')
+    if ref_conc_constraint is not None:
+        reference_id = getattr(ketchup_model, 'reference_id', ketchup_model.EXPERIMENTS.first())
+        if reference_id in selection:
+            ref_conc_constraint.activate()
+        else:
+            ref_conc_constraint.deactivate()
+
+    ketchup_model.obj.expr = sum(b.error for b in active)
+
+    return [key for key in keys if key in selection]
+
+
 def parse_time_delay(tde: int | float | list | dict, keys: list) -> dict:
     """Parses and validates the time delay input and converts it into a standardized dictionary.
 
@@ -207,82 +550,276 @@ def enz_sum(m,r):
 def stoichiometry(m,s):
     """ steady-state definition """
     rhs = 0
-    met = m.m_model.metabolites.get_by_id(s)
-    for r in met.reactions:
-        coeff = r.metabolites[met]
-        rhs += m.rate[r.id]*coeff
+    S = m.s_matrix.S
+    i = m.s_matrix.species_index[s]
+    for j, coeff in zip(S.indices[S.indptr[i]:S.indptr[i+1]], S.data[S.indptr[i]:S.indptr[i+1]]):
+        rhs += m.rate[m.s_matrix.reactions[j]]*coeff
     return rhs == 0.0
 
 
 #elemental forward rate 
-def elemental_vf(m,b,es):
+def elemental_vf(m,k,es):
     """ elemental forward rate """
-    s = es.split('_')[-1]
-    step = es[:-(len(s)+1)]
-    df = b.mech_df.loc[(b.mech_df['rxn ID']==step)&(b.mech_df['step ID']==s)]
-    rhs = m.kf[es]*b.e[df['reactant'].tolist()[0][0]]
-    if len(df['reactant'].tolist()[0]) > 1:  rhs *= b.c[df['reactant'].tolist()[0][1]]
-    return b.vf[es] == rhs
+    b = m.experiment[k]
+    return b.vf[es] == _elemental_vf_rhs(m, b, es)
 
 
 #elemental reverse rate
-def elemental_vr(m,b,es):
+def elemental_vr(m,k,es):
     """ elemental reverse rate """
-    s = es.split('_')[-1]
-    step = es[:-(len(s)+1)]
-    df = b.mech_df.loc[(b.mech_df['rxn ID']==step)&(b.mech_df['step ID']==s)]
-    rhs = m.kr[es]*b.e[df['product'].tolist()[0][0]]
-    if len(df['product'].tolist()[0]) > 1:  rhs *= b.c[df['product'].tolist()[0][1]]
-    return b.vr[es] == rhs
+    b = m.experiment[k]
+    return b.vr[es] == _elemental_vr_rhs(m, b, es)
+
+
+#elemental forward and reverse rates as expressions (reduced formulation)
+def elemental_vf_expression(b,es):
+    """ elemental forward rate expression of a block """
+    return _elemental_vf_rhs(b.model(), b, es)
+
+
+def elemental_vr_expression(b,es):
+    """ elemental reverse rate expression of a block """
+    return _elemental_vr_rhs(b.model(), b, es)
+
+
+def _elemental_vf_rhs(m, b, es):
+    """ mass action rate of the forward elemental step es in block b """
+    step = m.step_index[es]
+    rhs = m.kf[es]*b.e[step.reactant_enzyme]
+    if step.reactant_metabolite is not None:  rhs *= b.c[step.reactant_metabolite]
+    return rhs
+
+
+def _elemental_vr_rhs(m, b, es):
+    """ mass action rate of the reverse elemental step es in block b """
+    step = m.step_index[es]
+    rhs = m.kr[es]*b.e[step.product_enzyme]
+    if step.product_metabolite is not None:  rhs *= b.c[step.product_metabolite]
+    return rhs
 
 
 #net reaction in elemental or MM
-def net_reaction_rate(m,b,r):
+def net_reaction_rate(m,k,r):
     """ net reaction in elemental or MM """
     if m.mech_type == 'elemental':
         return Constraint.Skip
     elif m.mech_type == 'michaelis-menten':
-        substrates = b.mech_df['reactant'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'reactant'].tolist()
-        products   = b.mech_df['product'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'product'].tolist()
-        inh_ci  = b.mech_df['reactant'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'competitive'].tolist()
-        inh_uci = b.mech_df['reactant'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'uncompetitive'].tolist()
-        inh_nci = b.mech_df['reactant'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'noncompetitive'].tolist()
-        
-        num = m.Kcat_f[r] * eval('*'.join([f"b.c[\'{c[0]}\']" for c in substrates])) / (eval('*'.join([f"m.KM_reactants[\'{r}+{c}\']" for c in [x.id for x in b.m_model.reactions.get_by_id(r).reactants]])))
-        den = eval('+'.join( f"{abs(b.m_model.reactions.get_by_id(r).metabolites[b.m_model.metabolites.get_by_id(c)])}*b.c[\'{c}\']/m.KM_reactants[\'{r}+{c}\']" for c in [x.id for x in b.m_model.reactions.get_by_id(r).reactants]  ))
-        #uncompetitive inhibition
-        if inh_uci != [] or inh_nci != []:
-            den = (den) * (1 + eval('+'.join(f"b.c[\'{c[0]}\']/m.KM_inhibitors[\'{r}+{c[0]}_uci\']" for c in inh_uci+inh_nci))  )  
-
-        #competitive inhibition
-        if inh_ci != [] or inh_nci != []:
-            den += eval( '+'.join( [f"b.c[\'{c[0]}\']/m.KM_inhibitors[\'{r}+{c[0]}_ci\']" for c in inh_ci+inh_nci] ) )
-                   
-        if products != []:
-            num -= m.Kcat_r[r] * eval('*'.join([f"b.c[\'{c[0]}\']" for c in products])) / (eval('*'.join([f"m.KM_products[\'{r}+{c}\']" for c in [x.id for x in b.m_model.reactions.get_by_id(r).products]])))
-            den += eval('+'.join( f"{abs(b.m_model.reactions.get_by_id(r).metabolites[b.m_model.metabolites.get_by_id(c)])}*b.c[\'{c}\']/m.KM_products[\'{r}+{c}\']" for c in [x.id for x in b.m_model.reactions.get_by_id(r).products]  ))
-        else:
-            if r in [rxn.id for rxn in b.m_model.boundary if rxn.lower_bound < 0]: num *= -1    
-        rhs = num * b.e[f"{r}_ENZ"]/den  
+        b = m.experiment[k]
+        rhs = m.mm_rate_laws[r].static_rate(m, b.c, b.e[f"{r}_ENZ"])
         
     return b.rate[r] == rhs
 
 
 #elemental forward and reverse balance
-def es_net_balance(m,b,es):
+def es_net_balance(m,k,es):
     """ elemental forward and reverse balance """
-    check = es.split("_")[-1]
-    if 'i' in check: return 0 == b.vf[es] - b.vr[es]
-    rid = es[:-(len(check)+1)]
-    return b.rate[rid] == b.vf[es] - b.vr[es]
+    b = m.experiment[k]
+    step = m.step_index[es]
+    if 'i' in step.step_id: return 0 == b.vf[es] - b.vr[es]
+    return b.rate[step.rxn_id] == b.vf[es] - b.vr[es]
 
 
 ### END CONSTRAINT DEFINITIONS ###
 
+def create_start_design(start_design: str, n_starts: int, dimension: int, seed: int = None) -> np.ndarray:
+    """
+    Generates the unit-cube samples of a multistart campaign in bulk. Space-filling designs cover the
+    parameter space more evenly than independent draws, so fewer starts are needed to sample each region.
+
+    Parameters
+    ----------
+    start_design : str
+        'random' for independent uniform draws, 'lhs' for a Latin hypercube or 'sobol' for a scrambled
+        Sobol sequence. Sobol designs are balanced when n_starts is a power of 2.
+    n_starts : int
+        Number of starts (samples).
+    dimension : int
+        Number of kinetic parameters.
+    seed : int, optional
+        Seed of the design. Defaults to None.
+
+    Returns
+    -------
+    np.ndarray
+        Samples in [0, 1) with shape (n_starts, dimension).
+
+    Raises
+    ------
+    ValueError
+        If the start design is unknown.
+    """
+    from scipy.stats import qmc
+
+    if start_design == 'random':
+        return np.random.default_rng(seed).random((n_starts, dimension))
+    if start_design == 'lhs':
+        return qmc.LatinHypercube(d=dimension, seed=seed).random(n_starts)
+    if start_design == 'sobol':
+        # the first n_starts points of the smallest balanced set
+        m = max(int(np.ceil(np.log2(n_starts))), 0)
+        return qmc.Sobol(d=dimension, scramble=True, seed=seed).random_base2(m)[:n_starts]
+    raise ValueError(f"Unknown start design '{start_design}'. Use 'random', 'lhs' or 'sobol'.")
+
+
+def scale_initial_values(u: np.ndarray, e_scale: float, distribution: str = 'uniform') -> np.ndarray:
+    """
+    Maps unit samples to initial values of kinetic parameters.
+
+    Parameters
+    ----------
+    u : np.ndarray
+        Samples in [0, 1).
+    e_scale : float
+        Upper value of the distribution.
+    distribution : str, optional
+        'uniform' for values uniform in [0, e_scale) or 'log' for values log-uniform in [1, e_scale).
+        Defaults to 'uniform'.
+
+    Returns
+    -------
+    np.ndarray
+        Initial values.
+    """
+    val = np.array(u, dtype=float)
+    if distribution == 'uniform' : val *= e_scale
+    if distribution == 'log'     : val = 10**(val*np.log10(e_scale))
+    return val
+
+
+def _mm_parameter_ids(mech_df: pd.DataFrame) -> tuple[list, list, list]:
+    """
+    Lists the IDs of the Michaelis constants of the reactants, products and inhibitors of a Michaelis-Menten
+    mechanism, as 'rxn+metabolite' (with the suffix '_ci' or '_uci' for inhibitors). A noncompetitive inhibitor
+    has both a competitive and an uncompetitive constant.
+
+    Parameters
+    ----------
+    mech_df : pandas.DataFrame
+        DataFrame containing mechanism information.
+
+    Returns
+    -------
+    tuple[list, list, list]
+        IDs of the constants of the reactants, products and inhibitors.
+    """
+    KMr = []; KMp = []; Ki = []
+    inhib_dict = {"noncompetitive":"nci", "competitive":"ci", "uncompetitive":"uci"}
+    for i,r in enumerate(mech_df['rxn ID'].tolist()):
+        if mech_df.iloc[i]['type'] == 'reactant': KMr.append(f'{r}+{mech_df.iloc[i]["reactant"][0]}')
+        if mech_df.iloc[i]['type'] == 'product': KMp.append(f'{r}+{mech_df.iloc[i]["product"][0]}')
+        if mech_df.iloc[i]['type'] in inhib_dict.keys(): Ki.append(f'{r}+{mech_df.iloc[i]["reactant"][0]}_{inhib_dict.get(mech_df.iloc[i]["type"])}')
+    KMi = [f"{i.split('_nci')[0]}_ci" for i in Ki if i.split('_')[-1] == 'nci']\
+          +  [f"{i.split('_nci')[0]}_uci" for i in Ki if i.split('_')[-1] == 'nci']\
+          +  [i for i in Ki if i.split('_')[-1] != 'nci']
+    return KMr, KMp, KMi
+
+
+def count_kinetic_parameters(m_model: cobra.core.model.Model, mech_df: pd.DataFrame,
+                             mech_type: str = 'elemental') -> int:
+    """
+    Counts the kinetic parameters that create_initial_model initializes, i.e., the dimension of a start design,
+    from the expanded mechanism without creating the model.
+
+    Parameters
+    ----------
+    m_model : cobra.core.model.Model
+        The COBRApy model corresponding to the metabolic network.
+    mech_df : pandas.DataFrame
+        DataFrame containing mechanism information.
+    mech_type : str, optional
+        Mechanism type to follow for rate laws. Defaults to 'elemental'.
+
+    Returns
+    -------
+    int
+        Number of kinetic parameters: kf and kr of each elemental step, the Michaelis constants of the
+        Michaelis-Menten rate laws, or the constants of the custom rate laws.
+
+    Raises
+    ------
+    ValueError
+        If the mechanism type is unknown.
+    """
+    if mech_type == 'elemental':
+        return 2 * len(create_step_index(mech_df))
+    if mech_type == 'michaelis-menten':
+        return sum(len(ids) for ids in _mm_parameter_ids(mech_df))
+    if mech_type == 'custom':
+        return sum(len(rate_law.parameters[kind]) for rate_law in compile_custom_rate_laws(mech_df, m_model).values()
+                   for kind in PARAMETER_KINDS)
+    raise ValueError(f"Unknown mechanism type '{mech_type}'.")
+
+
+def initialize_kinetic_parameters(ketchup_model: pyomo.core.ConcreteModel, seedvalue: int = None,
+                                  distribution: str = 'uniform', rng: np.random.Generator = None,
+                                  start_design: str = 'random', n_starts: int = 1, start_index: int = 0,
+                                  design_seed: int = None, start_sample=None) -> None:
+    """
+    Draws the initial values of the kinetic parameters of a model created by create_initial_model, all at
+    once, and sets them in the model. A model can thus be initialized for another start without being
+    created again.
+
+    Parameters
+    ----------
+    ketchup_model : pyomo.core.ConcreteModel
+        A KETCHUP Pyomo model.
+    seedvalue : int, optional
+        Seed of the random initial values. Defaults to None.
+    distribution : str, optional
+        Distribution of the initial values (see scale_initial_values). Defaults to 'uniform'.
+    rng : np.random.Generator, optional
+        Random number generator of the 'random' design. Defaults to a new generator seeded with seedvalue.
+    start_design : str, optional
+        Design of the starts (see create_initial_model). Defaults to 'random'.
+    n_starts : int, optional
+        Number of starts of the design. Defaults to 1.
+    start_index : int, optional
+        Index of this start in the design. Defaults to 0.
+    design_seed : int, optional
+        Seed of the design, shared by all of its starts. Defaults to seedvalue.
+    start_sample : array_like, optional
+        Unit sample of this start, used instead of drawing from rng or generating the design. Defaults to None.
+
+    Raises
+    ------
+    ValueError
+        If start_sample does not have one value per kinetic parameter.
+    """
+    parameter_sets = ketchup_model.kinetic_parameter_sets
+    n_values = sum(len(mylist) for mylist, _, _ in parameter_sets)
+    if start_sample is not None:
+        u = np.asarray(start_sample, dtype=float)
+        if u.shape != (n_values,):
+            raise ValueError(f"The start sample has {u.size} values for {n_values} kinetic parameters.")
+    elif start_design == 'random':
+        if rng is None:
+            rng = np.random.default_rng(seedvalue)
+        u = rng.random(n_values)
+    else:
+        u = create_start_design(start_design, n_starts, n_values,
+                                seedvalue if design_seed is None else design_seed)[start_index]
+
+    plot_distribution = False
+    dist_list = []
+    offset = 0
+    for mylist, mymodelvar, scale in parameter_sets:
+        vals = scale_initial_values(u[offset:offset + len(mylist)], scale, distribution)
+        mymodelvar.set_values(dict(zip(mylist, vals.tolist())))
+        dist_list.extend(vals)
+        offset += len(mylist)
+    if plot_distribution:
+        import matplotlib.pyplot as plt
+        plt.hist(dist_list,density=False,bins=30)
+        plt.savefig('hist.png')
+
+
 def create_initial_model(m_model: cobra.core.model.Model, mech_df : pd.DataFrame,
                          data: dict, seedvalue: int = None, time: float = None,
                          tde=0, k_thres: float = 10**5,
-                         distribution: str = 'uniform', mech_type: str = 'elemental') -> pyomo.core.ConcreteModel:
+                         distribution: str = 'uniform', mech_type: str = 'elemental',
+                         rng: np.random.Generator = None, e_scale: float = None,
+                         start_design: str = 'random', n_starts: int = 1, start_index: int = 0,
+                         design_seed: int = None, start_sample=None) -> pyomo.core.ConcreteModel:
     """
     Creates an initial Pyomo model for the problem to be solved.
 
@@ -306,6 +843,23 @@ def create_initial_model(m_model: cobra.core.model.Model, mech_df : pd.DataFrame
         Distribution type for initial random rate constants. Defaults to 'uniform'.
     mech_type : str, optional
         Mechanism type to follow for rate laws. Defaults to 'elemental'.
+    rng : np.random.Generator, optional
+        Random number generator for the initial rate constants. Defaults to a new generator seeded with seedvalue.
+    e_scale : float, optional
+        Upper value of the initial rate constants. Defaults to 5000, or k_thres for michaelis-menten.
+    start_design : str, optional
+        Design of the starts: 'random' draws the initial rate constants from rng, 'lhs' and 'sobol' take
+        sample start_index of a space-filling design of n_starts starts (see create_start_design).
+        Defaults to 'random'.
+    n_starts : int, optional
+        Number of starts of the design. Defaults to 1.
+    start_index : int, optional
+        Index of this start in the design. Defaults to 0.
+    design_seed : int, optional
+        Seed of the design, shared by all of its starts. Defaults to seedvalue.
+    start_sample : array_like, optional
+        Unit sample of this start, e.g., a row of a design generated once for all starts. If given, it is
+        used instead of drawing from rng or generating the design. Defaults to None.
 
     Returns
     -------
@@ -321,34 +875,29 @@ def create_initial_model(m_model: cobra.core.model.Model, mech_df : pd.DataFrame
         # check validity of seed and assign value
         seedvalue = seedvalue % (2 ** 32 - 1)  # seed must be between 0 and 2**32 - 1
         print(f"Seed of {seedvalue} used.")
-    np.random.seed(seedvalue)
-    #generate random K values
+    #per-run generator, so that concurrent model generation does not share the global NumPy state
+    if rng is None:
+        rng = np.random.default_rng(seedvalue)
+    #kinetic parameter sets to initialize, drawn together once all are defined
+    parameter_sets = []
     def randomize_Ks( mylist, mymodelvar, e_scale, distribution):
-        plot_distribution = False
-        dist_list = []
-        for m in mylist:
-            val = np.random.rand()
-            if distribution == 'uniform' : val *= e_scale
-            if distribution == 'log'     : val = 10**(val*np.log10(e_scale))
-            mymodelvar[m] = val
-            dist_list.append(val)
-        if plot_distribution:
-            import matplotlib.pyplot as plt
-            plt.hist(dist_list,density=False,bins=30)
-            plt.savefig('hist.png')
+        parameter_sets.append((list(mylist), mymodelvar, e_scale))
     model = ConcreteModel()
     model.mech_df = mech_df
     model.m_model = m_model
+    model.s_matrix = create_stoichiometric_matrix(m_model)
     model.data = data
     model.mech_type = mech_type
 
-    e_scale = 5000
+    user_e_scale = e_scale
+    e_scale = 5000 if user_e_scale is None else user_e_scale
     ##INITIAL ELEMENTAL MODEL
     if mech_type == 'elemental':
         model.rxn_enz_sum = {rxn:[[item for sublist in mech_df['product'].loc[mech_df['rxn ID'] == rxn].tolist() for item in sublist if 'ENZ' in item],1] 
                    for rxn in [r.id for r in m_model.reactions]}
-        #elemental steps
-        elemental_steps = [f"{r}_{mech_df['step ID'].values[i]}" for i,r in enumerate(mech_df['rxn ID'].tolist())]
+        #elemental steps, indexed once for use by all constraint rules
+        model.step_index = create_step_index(mech_df)
+        elemental_steps = list(model.step_index)
         model.ELEMENTALSTEP_F = Set( initialize = elemental_steps )
         model.ELEMENTALSTEP_R = Set( initialize = elemental_steps )
         model.kf = Var( model.ELEMENTALSTEP_F, bounds=(0,k_thres) )
@@ -363,16 +912,10 @@ def create_initial_model(m_model: cobra.core.model.Model, mech_df : pd.DataFrame
         
     elif mech_type == 'michaelis-menten':
         model.rxn_enz_sum = {rxn:[[f"{rxn}_ENZ"],1] for rxn in [r.id for r in m_model.reactions]}
+        #rate laws, compiled once for use by all constraint rules
+        model.mm_rate_laws = compile_mm_rate_laws(m_model, mech_df)
         #MM formualation
-        KMr = []; KMp = []; Ki = []
-        inhib_dict = {"noncompetitive":"nci", "competitive":"ci", "uncompetitive":"uci"}
-        for i,r in enumerate(mech_df['rxn ID'].tolist()):
-            if mech_df.iloc[i]['type'] == 'reactant': KMr.append(f'{r}+{mech_df.iloc[i]["reactant"][0]}')
-            if mech_df.iloc[i]['type'] == 'product': KMp.append(f'{r}+{mech_df.iloc[i]["product"][0]}')
-            if mech_df.iloc[i]['type'] in inhib_dict.keys(): Ki.append(f'{r}+{mech_df.iloc[i]["reactant"][0]}_{inhib_dict.get(mech_df.iloc[i]["type"])}')
-        KMi = [f"{i.split('_nci')[0]}_ci" for i in Ki if i.split('_')[-1] == 'nci']\
-              +  [f"{i.split('_nci')[0]}_uci" for i in Ki if i.split('_')[-1] == 'nci']\
-              +  [i for i in Ki if i.split('_')[-1] != 'nci']
+        KMr, KMp, KMi = _mm_parameter_ids(mech_df)
 
         #Kinetic Parameter sets (reactants, products, inhibitors)
         model.KPr = Set( initialize = KMr )
@@ -387,30 +930,20 @@ def create_initial_model(m_model: cobra.core.model.Model, mech_df : pd.DataFrame
         model.Kcat_r        = Var( model.REACTIONS, bounds = (0,k_thres) )
         model.SPECIES = Set( initialize = [m.id for m in m_model.metabolites] )
         model.c = Var(model.SPECIES, bounds=(0,10**3), initialize=1 )        
-        e_scale = k_thres
+        e_scale = k_thres if user_e_scale is None else user_e_scale
 
         #randomize KM
         randomize_Ks( KMr, model.KM_reactants , e_scale, distribution )
         randomize_Ks( KMp, model.KM_products  , e_scale, distribution )
         randomize_Ks( KMi, model.KM_inhibitors, e_scale, distribution )
     elif mech_type == 'custom':
-        #iterate through mechanism file to find all rate laws and unique constants
-        unique_consts = {'KCAT':[],'KM':[],'KI':[], 'KCONS':[],'rxns':{}}; tmp = []
-        for i in mech_df.index:
-            mech_info = mech_df.loc[i]['type']; rxn_name = mech_df.loc[i]['rxn ID']
-            if mech_info not in ['reactant','product']:
-                raw_rate_law = mech_info ; unique_consts['rxns'].update({rxn_name:raw_rate_law})
-                for x in raw_rate_law.replace(' ', '').replace('*', '+').replace('/', '+').replace('(', '').replace(')','').replace('-', '+').split('+'):
-                    if x not in tmp and not x.isdigit():
-                #for x in raw_rate_law.replace(' ','').replace('*','+').replace('/','+').replace('(','').replace(')','').split('+'):
-                #    if x not in tmp:
-                        search_str = re.search(r'(?<=\[).+?(?=\])',x).group()
-                        tmp.append(x); rxn_id = f"{rxn_name}+{search_str}"
-                        if search_str == '[E]' : continue #ignore enzyme concentration
-                        if 'KI' in x  : unique_consts['KI'].append(rxn_id)
-                        if 'KCAT' in x: unique_consts['KCAT'].append(rxn_id)
-                        if 'KM' in x  : unique_consts['KM'].append(rxn_id)    
-                        if 'KCONS' in x  : unique_consts['KCONS'].append(rxn_id) 
+        #parse all rate laws of the mechanism file once and collect the unique constants
+        model.custom_rate_laws = compile_custom_rate_laws(mech_df, m_model)
+        unique_consts = {'KCAT':[],'KM':[],'KI':[], 'KCONS':[],'rxns':{}}
+        for rxn_name, rate_law in model.custom_rate_laws.items():
+            unique_consts['rxns'].update({rxn_name:rate_law.text})
+            for kind in PARAMETER_KINDS:
+                unique_consts[kind] += [rate_law.parameter_id(name) for name in rate_law.parameters[kind]]
 
         model.KCAT = Var(unique_consts['KCAT'],bounds=(0,k_thres))
         model.KM = Var(unique_consts['KM'],bounds=(0,k_thres))
@@ -423,7 +956,13 @@ def create_initial_model(m_model: cobra.core.model.Model, mech_df : pd.DataFrame
         randomize_Ks(unique_consts['KCONS'], model.KCONS, e_scale, distribution)
         model.unique_consts = unique_consts
         model.rxn_enz_sum = {rxn:[[f"{rxn}_ENZ"],1] for rxn in [r.id for r in m_model.reactions]}
-        
+
+    #draw the initial values of all kinetic parameters at once
+    model.kinetic_parameter_sets = parameter_sets
+    initialize_kinetic_parameters(model, seedvalue=seedvalue, distribution=distribution, rng=rng,
+                                  start_design=start_design, n_starts=n_starts, start_index=start_index,
+                                  design_seed=design_seed, start_sample=start_sample)
+
     if time:
         try:
             maxTime = max(time)
@@ -441,20 +980,57 @@ def create_initial_model(m_model: cobra.core.model.Model, mech_df : pd.DataFrame
 ## STATIC ##
 
 
+class StaticBlockTemplate(NamedTuple):
+    """ Index sets shared by all static experiment blocks, computed once per model """
+    species: tuple
+    enzymes: tuple
+    reactions: tuple
+    elemental_steps: tuple | None
+
+
+def create_static_block_template(ketchup_model: pyomo.core.ConcreteModel) -> StaticBlockTemplate:
+    """
+    Create the template of the static experiment blocks of a model. All static blocks have the same sets,
+    variables and constraints and differ only in the enzyme sum of the knocked-out reaction and in the
+    data of the error, so the sets are computed once and each block is populated directly from them.
+
+    Parameters
+    ----------
+    ketchup_model : pyomo.core.ConcreteModel
+        The initial model from create_initial_model.
+
+    Returns
+    -------
+    StaticBlockTemplate
+        Index sets of the static experiment blocks.
+    """
+    elemental_steps = None
+    if ketchup_model.mech_type == 'elemental':
+        elemental_steps = tuple(ketchup_model.step_index)
+    return StaticBlockTemplate(ketchup_model.s_matrix.species,
+                               tuple(x for xs in ketchup_model.rxn_enz_sum.values() for x in xs[0]),
+                               ketchup_model.s_matrix.reactions,
+                               elemental_steps)
+
+
 #create static model block
-def create_sMB(b):
-    """ create static model block """
+def create_sMB(b, key):
+    """ create static model block of the experiment key """
     data = b.model().data
-    key = b.model().key
     mech_type = b.model().mech_type
 
+    # knock out the reaction of the experiment in a copy of the enzyme sums shared by all blocks
+    rxn_enz_sum = b.model().rxn_enz_sum
     if key != 'WT':
-        b.model().rxn_enz_sum[key][1] = 0
-
-    model = create_sKM( b.model().rxn_enz_sum, b.model().m_model, b.model().mech_df, b.model().mech_type )
-    
-    if key != 'WT':
-        b.model().rxn_enz_sum[key][1] = 1     
+        rxn_enz_sum = {**rxn_enz_sum, key: [rxn_enz_sum[key][0], 0]}
+
+    # with a block template, the block is populated directly instead of through a separate model
+    template = getattr(b.model(), 'static_block_template', None)
+    # the reduced elemental formulation has no rate variables (see elemental_vf_expression)
+    rate_vars = getattr(b.model(), 'elemental_formulation', 'full') == 'full'
+    model = create_sKM( rxn_enz_sum, b.model().m_model, b.model().mech_df, b.model().mech_type,
+                        s_matrix=b.model().s_matrix, template=template,
+                        model=b if template is not None else None, elemental_rate_vars=rate_vars )
     
     model.error = Var(bounds=(0,None))  
     model.compute_error = Constraint(
@@ -466,24 +1042,35 @@ def create_sMB(b):
     return model    
 
 
-def create_sKM(rxn_enz_sum, m_model, mech_df, mech_type, k_thres=10**10 ):
-    """ create static kinetic model """
-    model = ConcreteModel()
+def create_sKM(rxn_enz_sum, m_model, mech_df, mech_type, k_thres=10**10, s_matrix=None, template=None, model=None,
+               elemental_rate_vars=True ):
+    """ create static kinetic model, or populate model (e.g., a block) with it, using the sets of template if given """
+    if model is None:
+        model = ConcreteModel()
     model.mech_df = mech_df; model.res = rxn_enz_sum; model.m_model = m_model
-    enz_names = [x for xs in list(rxn_enz_sum.values()) for x in xs[0]]
-    model.SPECIES = Set( initialize = [m.id for m in m_model.metabolites] )
+    # share the stoichiometric matrix of the top-level model when given
+    model.s_matrix = s_matrix if s_matrix is not None else create_stoichiometric_matrix(m_model)
+    if template is None:
+        enz_names = [x for xs in list(rxn_enz_sum.values()) for x in xs[0]]
+    else:
+        enz_names = template.enzymes
+    model.SPECIES = Set( initialize = model.s_matrix.species )
     model.ENZYMES = Set (initialize = enz_names )    
-    model.REACTIONS = Set( initialize = [r.id for r in m_model.reactions] )
+    model.REACTIONS = Set( initialize = model.s_matrix.reactions )
     model.c = Var(model.SPECIES, bounds=(0,10**3), initialize=1 )
     model.e = Var(model.ENZYMES, bounds=(0,1) )
     model.rate = Var(model.REACTIONS)
     
     if mech_type == 'elemental':
-        elemental_steps = [f"{r}_{mech_df['step ID'].values[i]}" for i,r in enumerate(mech_df['rxn ID'].tolist())]
+        if template is None:
+            elemental_steps = [f"{r}_{mech_df['step ID'].values[i]}" for i,r in enumerate(mech_df['rxn ID'].tolist())]
+        else:
+            elemental_steps = template.elemental_steps
         model.ELEMENTALSTEP_F = Set( initialize = elemental_steps )
         model.ELEMENTALSTEP_R = Set( initialize = elemental_steps )
-        model.vf = Var( model.ELEMENTALSTEP_F, bounds=(0,None) )
-        model.vr = Var( model.ELEMENTALSTEP_R, bounds=(0,None) )
+        if elemental_rate_vars:
+            model.vf = Var( model.ELEMENTALSTEP_F, bounds=(0,None) )
+            model.vr = Var( model.ELEMENTALSTEP_R, bounds=(0,None) )
     elif mech_type == 'michaelis-menten':
         pass        
         
@@ -498,10 +1085,9 @@ def create_sKM(rxn_enz_sum, m_model, mech_df, mech_type, k_thres=10**10 ):
 
 
 # create dynamic model block
-def create_dMB(b):
-    """ create dynamic model block """
+def create_dMB(b, key):
+    """ create dynamic model block of the experiment key """
     data = b.model().data
-    key = b.model().key
     #print (f"{key = }")
     mech_type = b.model().mech_type
     tde = b.model().tde[key]
@@ -530,25 +1116,31 @@ def create_dMB(b):
         time.insert(0,0)
         error_data.insert(0,(0,data[key]['t0'][error_key]))
 
-    # setup enzyme sums
+    # setup enzyme sums, in a copy of those shared by all blocks
     # use gene_reaction_rules to associate data with the model. Enzyme ID values must match!
+    rxn_enz_sum = {rxn: [enz, total] for rxn, (enz, total) in b.model().rxn_enz_sum.items()}
     for rxn in b.model().m_model.reactions:
         # right now only accepts singletons
         # TODO: update to allow multiple enzymes per reaction. Will require updates elsewhere
         pr = str(rxn.gene_reaction_rule)
         if pr:
             try:
-                b.model().rxn_enz_sum[rxn.id][1] = data[key]['t0'][pr]
+                rxn_enz_sum[rxn.id][1] = data[key]['t0'][pr]
                 #print (f"{rxn} catalyzed by {pr}, which at t0 = {data[key]['t0'][pr]}")
             except Exception as e:
                 #print (e)
                 print(f"{rxn} catalyzed by {pr} but no matching t0 value given. Check enzyme IDs. Assuming default enzyme concentration of 1")
                 pass
 
-    model = create_dKM(b.model().rxn_enz_sum, b.model().m_model, b.model().mech_df, b.model().mech_type, time,  data[key])
+    discretization = getattr(b.model(), 'time_discretization', None)
+    model = create_dKM(rxn_enz_sum, b.model().m_model, b.model().mech_df, b.model().mech_type, time,  data[key],
+                       s_matrix=b.model().s_matrix, discretization=discretization,
+                       points=discretization.points.get(key) if discretization is not None else None)
     model.data = data
     model.key = key
     model.tde = tde
+    model.error_key = error_key
+    model.error_data = error_data
 
     #reconfigure for time course
     model.error = Var(bounds=(0,None))
@@ -565,20 +1157,32 @@ def create_dMB(b):
 
 
 #create dynamic kinetic model
-def create_dKM(rxn_enz_sum, m_model, mech_df, mech_type, time, data, k_thres=10**10 ):
-    """ create dynamic kinetic model """
+def create_dKM(rxn_enz_sum, m_model, mech_df, mech_type, time, data, k_thres=10**10, s_matrix=None,
+               discretization=None, points=None ):
+    """ create dynamic kinetic model, discretized in time as given by discretization (default backward finite
+    differences with two elements per data point), with additional element boundaries at points, if given """
     model = ConcreteModel()
     model.mech_df = mech_df; model.res = rxn_enz_sum; model.m_model = m_model; model.data = data
+    # share the stoichiometric matrix of the top-level model when given
+    model.s_matrix = s_matrix if s_matrix is not None else create_stoichiometric_matrix(m_model)
     enz_names = [x for xs in list(rxn_enz_sum.values()) for x in xs[0]]
-    model.SPECIES = Set( initialize = [m.id for m in m_model.metabolites] )   
+    model.SPECIES = Set( initialize = model.s_matrix.species )   
     model.ENZYMES = Set (initialize = enz_names ) 
-    model.REACTIONS = Set( initialize = [r.id for r in m_model.reactions] )    
+    model.REACTIONS = Set( initialize = model.s_matrix.reactions )    
 
     #KETCHUP_DYNAMIC additional variables
     maxtime = max(time)
     model.time = Set(initialize = time)
-    model.TIME = ContinuousSet(bounds=(0,maxtime), initialize=time)
-    model.e = Var(model.TIME, model.ENZYMES, bounds=(0,1) )    
+    model.TIME = ContinuousSet(bounds=(0,maxtime), initialize=sorted(set(time).union(points or ())))
+    # an enzyme that is the only species of its enzyme sum (no complexes) equals its total (t0 value) at all
+    # times and is fixed, so it needs neither time points nor enzyme sum constraints
+    time_invariant_enzymes = all(len(enz) == 1 for enz, _ in rxn_enz_sum.values())
+    if time_invariant_enzymes:
+        model.e = Var(model.ENZYMES, bounds=(0,None) )
+        for enz, total in rxn_enz_sum.values():
+            model.e[enz[0]].fix(total)
+    else:
+        model.e = Var(model.TIME, model.ENZYMES, bounds=(0,1) )
     model.rate = Var(model.TIME, model.REACTIONS, bounds=(0,10*4))
     model.c = Var(model.TIME, model.SPECIES, bounds=(0,10**4), initialize=1 ) 
     model.dcdt = DerivativeVar(model.c, wrt=model.TIME)   
@@ -590,31 +1194,119 @@ def create_dKM(rxn_enz_sum, m_model, mech_df, mech_type, time, data, k_thres=10*
         #KETCHUP_DYNAMIC added time variable to vf and vr
         model.vf = Var(model.TIME, model.ELEMENTALSTEP_F, bounds=(0,None) )
         model.vr = Var(model.TIME, model.ELEMENTALSTEP_R, bounds=(0,None) )
-
-        model.enz_sum = Constraint(model.TIME, model.REACTIONS, rule=d_enz_sum)  
     elif mech_type == 'michaelis-menten':
         pass
 
     #CONSTRAINTS
     model.stoichiometry = Constraint(model.TIME, model.SPECIES,  rule=d_stoichiometry)
     
-    model.enz_sum = Constraint(model.TIME, model.REACTIONS, rule=d_enz_sum)  
+    if not time_invariant_enzymes:
+        model.enz_sum = Constraint(model.TIME, model.REACTIONS, rule=d_enz_sum)  
     
-    discretizer = TransformationFactory('dae.finite_difference')
-    discretizer.apply_to(model,wrt=model.TIME,nfe=2*len(time),scheme="BACKWARD")
+    if discretization is None:
+        discretization = TimeDiscretization()
+    nfe = discretization.nfe if discretization.nfe is not None else 2*len(time)
+    # the data points and given points are element boundaries, so there are at least as many elements
+    nfe = max(nfe, len(model.TIME) - 1)
+    if discretization.method == 'collocation':
+        discretizer = TransformationFactory('dae.collocation')
+        discretizer.apply_to(model,wrt=model.TIME,nfe=nfe,ncp=discretization.ncp,
+                             scheme=discretization.scheme or "LAGRANGE-RADAU")
+    else:
+        discretizer = TransformationFactory('dae.finite_difference')
+        discretizer.apply_to(model,wrt=model.TIME,nfe=nfe,scheme=discretization.scheme or "BACKWARD")
     
     return model
 
 
-# TODO: define/move automatic way to transcribe written equation into symbolic form,
-#       which is currently embedded in ketchup dynamic
+class TimeDiscretization(NamedTuple):
+    """ Time discretization of the dynamic experiment blocks """
+    method: str = 'finite_difference'  # finite_difference or collocation
+    scheme: str | None = None  # None uses BACKWARD (finite differences) or LAGRANGE-RADAU (collocation)
+    nfe: int | None = None  # finite elements per experiment. None uses two per data point
+    ncp: int = 3  # collocation points per finite element
+    points: dict = MappingProxyType({})  # element boundaries by experiment in addition to the data points
+
+
+def time_set(b) -> ContinuousSet:
+    """ Discretized time set of a dynamic experiment block """
+    return b.dcdt.get_continuousset_list()[0]
+
+
+def estimate_discretization_error(b) -> list[tuple]:
+    """
+    Estimate the discretization error of each finite element of a solved dynamic experiment block. The change
+    of each concentration over an element is compared to the integral of the polynomial that interpolates its
+    time derivative (the rate balance) at all points of the element, i.e., the trapezoidal rule for finite
+    differences and a rule of one order higher than the collocation for collocation. The difference is taken
+    relative to the largest concentration of the species, but at least a thousandth of the largest
+    concentration of all species.
+
+    Parameters
+    ----------
+    b : pyomo.core.base.block.BlockData
+        Dynamic experiment block with values, e.g., at a solution.
+
+    Returns
+    -------
+    list[tuple]
+        Start time, end time and estimated error (largest over all species) of each finite element.
+
+    Raises
+    ------
+    ValueError
+        If a concentration or derivative has no value.
+    """
+    ds = time_set(b)
+    times = np.array(list(ds), dtype=float)
+    species = list(b.SPECIES)
+    try:
+        c = np.array([[b.c[t,s].value for s in species] for t in ds], dtype=float)
+        dcdt = np.array([[b.dcdt[t,s].value for s in species] for t in ds], dtype=float)
+    except TypeError:
+        raise ValueError(f"Block {b.name} has concentrations or derivatives without values. Solve the model first.") from None
+    scale = np.maximum(np.abs(c).max(axis=0), 1e-3*max(np.abs(c).max(), 1e-8))
+
+    index = {t: i for i, t in enumerate(ds)}
+    errors = []
+    for t_start, t_end in zip(ds.get_finite_elements()[:-1], ds.get_finite_elements()[1:]):
+        i, j = index[t_start], index[t_end]
+        # interpolatory quadrature weights of the points of the element
+        x = (times[i:j+1] - t_start)/(t_end - t_start)
+        weights = np.linalg.solve(np.vander(x, increasing=True).T, 1/np.arange(1, j-i+2))*(t_end - t_start)
+        errors.append((t_start, t_end, float(np.max(np.abs(c[j] - c[i] - weights @ dcdt[i:j+1])/scale))))
+    return errors
+
+
+def refine_time_points(b, tol: float) -> tuple | None:
+    """
+    Refine the finite elements of a solved dynamic experiment block whose estimated discretization error
+    (see estimate_discretization_error) exceeds tol by splitting them at their midpoints.
+
+    Parameters
+    ----------
+    b : pyomo.core.base.block.BlockData
+        Dynamic experiment block with values, e.g., at a solution.
+    tol : float
+        Tolerance of the estimated relative error of each finite element.
+
+    Returns
+    -------
+    tuple | None
+        Element boundaries of the refined discretization, or None if no element exceeds tol.
+    """
+    points = list(time_set(b).get_finite_elements())
+    split = [round(0.5*(t_start + t_end), 6) for t_start, t_end, error in estimate_discretization_error(b)
+             if error > tol]
+    if not split:
+        return None
+    return tuple(sorted(points + split))
+
 
 # CUSTOM RATE LAWS
-def custom_rate(b,t):
-    """ create custom rates """
-    reactions = [r.id for r in b.model().m_model.reactions]
-    mech_df = b.model().mech_df
-    return 0
+def custom_rate(b,t,r):
+    """ create custom rates from the rate laws compiled in the top-level model """
+    return b.rate[t,r] == b.model().custom_rate_laws[r].expression(b.model(), b.c, b.e, t)
 
 
 #dynamic - enz-sum for each time-point
@@ -630,10 +1322,10 @@ def d_enz_sum(m,t,r):
 def d_stoichiometry(m,t,s):
     """ dynamic stoichiometric balance """
     rhs = 0
-    met = m.m_model.metabolites.get_by_id(s)
-    for r in met.reactions:
-        coeff = r.metabolites[met]
-        rhs += m.rate[t,r.id]*coeff
+    S = m.s_matrix.S
+    i = m.s_matrix.species_index[s]
+    for j, coeff in zip(S.indices[S.indptr[i]:S.indptr[i+1]], S.data[S.indptr[i]:S.indptr[i+1]]):
+        rhs += m.rate[t,m.s_matrix.reactions[j]]*coeff
     return  m.dcdt[t,s] ==  rhs
 
 
@@ -641,30 +1333,9 @@ def d_stoichiometry(m,t,s):
 def d_net_reaction_rate(b,t,r):
     """ dynamic - michaelis-menten form """
     if b.model().mech_type == 'michaelis-menten':
-        substrates = b.mech_df['reactant'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'reactant'].tolist()
-        products   = b.mech_df['product'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'product'].tolist()
-        inh_ci  = b.mech_df['reactant'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'competitive'].tolist()
-        inh_uci = b.mech_df['reactant'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'uncompetitive'].tolist()
-        inh_nci = b.mech_df['reactant'].loc[b.mech_df['rxn ID'] == r].loc[b.mech_df['type'] == 'noncompetitive'].tolist()
-        
-        num = b.model().Kcat_f[r] * eval('*'.join([f"b.c[t,\'{c[0]}\']" for c in substrates])) / (eval('*'.join([f"b.model().KM_reactants[\'{r}+{c}\']" for c in [x.id for x in b.m_model.reactions.get_by_id(r).reactants]])))
-        den = eval('*'.join( f"( 1 +{abs(b.m_model.reactions.get_by_id(r).metabolites[b.m_model.metabolites.get_by_id(c)])}*b.c[t,\'{c}\']/b.model().KM_reactants[\'{r}+{c}\'])" for c in [x.id for x in b.m_model.reactions.get_by_id(r).reactants]  ) )
-
-        #uncompetitive inhibition
-        if inh_uci != [] or inh_nci != []:
-            den = (den) * (1 + eval('+'.join(f"b.c[t,\'{c[0]}\']/b.model().KM_inhibitors[\'{r}+{c[0]}_uci\']" for c in inh_uci+inh_nci))  )  
-
-        #competitive inhibition
-        if inh_ci != [] or inh_nci != []:
-            den += eval( '+'.join( [f"b.c[t,\'{c[0]}\']/b.model().KM_inhibitors[\'{r}+{c[0]}_ci\']" for c in inh_ci+inh_nci] ) )
-                   
-        if products != []:
-            num -= b.model().Kcat_r[r] * eval('*'.join([f"b.c[t,\'{c[0]}\']" for c in products])) / (eval('*'.join([f"b.model().KM_products[\'{r}+{c}\']" for c in [x.id for x in b.m_model.reactions.get_by_id(r).products]])))
-            den += eval('*'.join( f"( 1 +{abs(b.m_model.reactions.get_by_id(r).metabolites[b.m_model.metabolites.get_by_id(c)])}*b.c[t,\'{c}\']/b.model().KM_products[\'{r}+{c}\'])" for c in [x.id for x in b.m_model.reactions.get_by_id(r).products]  ))
-        else:
-            if r in [rxn.id for rxn in b.m_model.boundary if rxn.lower_bound < 0]: num *= -1    
-        rhs = num * b.e[t,f"{r}_ENZ"]/(den - 1)
+        enz = f"{r}_ENZ"
+        rhs = b.model().mm_rate_laws[r].dynamic_rate(b.model(), b.c, b.e[t,enz] if b.e.dim() == 2 else b.e[enz], t)
     else:
         return Constraint.Skip
         
-    return b.rate[t,r] == rhs  
+    return b.rate[t,r] == rhs
@@ -0,0 +1,324 @@
+"""
+Custom rate laws
+
+Parses the custom rate law text of the mechanism file once into an abstract syntax tree (AST) that
+is validated against the model and then lowered into expressions without string evaluation.
+
+The grammar follows the mechanism file format:
+    KCAT[<dir>], KM[<met>], KI[<met>], KCONS[<met>] : kinetic parameters of the reaction
+    [E]                                             : enzyme concentration of the reaction
+    [<met>]                                         : metabolite concentration
+together with numbers, parentheses and the operators +, -, *, / and **.
+"""
+from typing import NamedTuple, Callable
+from types import MappingProxyType
+import re
+
+import cobra.core.model
+import pandas as pd
+
+
+# kinds of kinetic parameters, in the order used for model variables and outputs
+PARAMETER_KINDS = ('KCAT', 'KM', 'KI', 'KCONS')
+
+
+class Number(NamedTuple):
+    """ Numeric constant """
+    value: int | float
+
+
+class Parameter(NamedTuple):
+    """ Kinetic parameter, e.g. KM[nad] has kind 'KM' and name 'nad' """
+    kind: str
+    name: str
+
+
+class Concentration(NamedTuple):
+    """ Metabolite concentration, e.g. [nad] """
+    species: str
+
+
+class Enzyme(NamedTuple):
+    """ Enzyme concentration of the reaction, [E] """
+
+
+class UnaryOp(NamedTuple):
+    """ Unary plus or minus """
+    op: str
+    operand: NamedTuple
+
+
+class BinaryOp(NamedTuple):
+    """ Binary arithmetic operation """
+    op: str
+    left: NamedTuple
+    right: NamedTuple
+
+
+_TOKEN_RE = re.compile(r"\s*(?:"
+                       r"(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|"
+                       r"(?P<kind>[A-Za-z_]\w*)\s*\[(?P<name>[^\]]*)\]|"
+                       r"\[(?P<species>[^\]]*)\]|"
+                       r"(?P<op>\*\*|[-+*/()]))")
+
+
+def _tokenize(text: str) -> list:
+    """ Splits rate law text into (type, value, position, raw text) tokens """
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise ValueError(f"Unexpected character '{text[pos:].lstrip()[:1]}' at position {pos} of rate law '{text}'")
+        if match.group('number') is not None:
+            number = match.group('number')
+            value = int(number) if number.isdigit() else float(number)
+            tokens.append(('number', value, match.start('number'), number))
+        elif match.group('kind') is not None:
+            kind = match.group('kind')
+            if kind not in PARAMETER_KINDS:
+                raise ValueError(f"Unknown kinetic parameter '{kind}' at position {match.start('kind')} of rate law "
+                                 f"'{text}'. Use one of {', '.join(PARAMETER_KINDS)}")
+            tokens.append(('parameter', (kind, match.group('name').strip()), match.start('kind'),
+                           match.group(0).strip()))
+        elif match.group('species') is not None:
+            tokens.append(('species', match.group('species').strip(), match.start('species') - 1,
+                           match.group(0).strip()))
+        else:
+            tokens.append(('op', match.group('op'), match.start('op'), match.group('op')))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """ Recursive descent parser with Python operator precedence and left associativity """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def error(self, message: str):
+        if self.pos < len(self.tokens):
+            where = f"position {self.tokens[self.pos][2]}"
+        else:
+            where = "end"
+        raise ValueError(f"{message} at {where} of rate law '{self.text}'")
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None, None, None)
+
+    def accept_op(self, *ops):
+        token_type, value, _, _ = self.peek()
+        if token_type == 'op' and value in ops:
+            self.pos += 1
+            return value
+        return None
+
+    def parse(self):
+        if not self.tokens:
+            self.error("Empty expression")
+        node = self.expression()
+        if self.pos != len(self.tokens):
+            self.error(f"Unexpected '{self.peek()[3]}'")
+        return node
+
+    def expression(self):
+        node = self.term()
+        while op := self.accept_op('+', '-'):
+            node = BinaryOp(op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while op := self.accept_op('*', '/'):
+            node = BinaryOp(op, node, self.unary())
+        return node
+
+    def unary(self):
+        if op := self.accept_op('+', '-'):
+            return UnaryOp(op, self.unary())
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        if self.accept_op('**'):
+            node = BinaryOp('**', node, self.unary())
+        return node
+
+    def atom(self):
+        token_type, value, _, raw = self.peek()
+        if token_type == 'number':
+            self.pos += 1
+            return Number(value)
+        if token_type == 'parameter':
+            self.pos += 1
+            return Parameter(*value)
+        if token_type == 'species':
+            self.pos += 1
+            return Enzyme() if value == 'E' else Concentration(value)
+        if self.accept_op('('):
+            node = self.expression()
+            if not self.accept_op(')'):
+                self.error("Missing ')'")
+            return node
+        if token_type is None:
+            self.error("Unexpected end of expression")
+        self.error(f"Unexpected '{raw}'")
+
+
+def parse_rate_law(text: str) -> NamedTuple:
+    """
+    Parses custom rate law text into an AST.
+
+    Parameters
+    ----------
+    text : str
+        Rate law as written in the mechanism file, e.g. 'KCONS[nadh]*[nadh]'.
+
+    Returns
+    -------
+    NamedTuple
+        Root node of the AST.
+
+    Raises
+    ------
+    ValueError
+        If the text does not follow the rate law grammar.
+    """
+    return _Parser(str(text)).parse()
+
+
+def _walk(node):
+    """ Yields the nodes of the AST in textual order """
+    if isinstance(node, UnaryOp):
+        yield node
+        yield from _walk(node.operand)
+    elif isinstance(node, BinaryOp):
+        yield from _walk(node.left)
+        yield node
+        yield from _walk(node.right)
+    else:
+        yield node
+
+
+def evaluate_rate_law(node: NamedTuple, parameter: Callable, concentration: Callable, enzyme) -> object:
+    """
+    Lowers an AST by applying the Python arithmetic operators to the values returned for its leaves.
+    The same AST can thereby produce Pyomo expressions or numerical (e.g., NumPy) values.
+
+    Parameters
+    ----------
+    node : NamedTuple
+        Root node of the AST.
+    parameter : Callable
+        Function of (kind, name) returning the value of a kinetic parameter.
+    concentration : Callable
+        Function of species id returning the value of a metabolite concentration.
+    enzyme :
+        Value of the enzyme concentration.
+
+    Returns
+    -------
+    object
+        Value of the rate law.
+    """
+    if isinstance(node, BinaryOp):
+        left = evaluate_rate_law(node.left, parameter, concentration, enzyme)
+        right = evaluate_rate_law(node.right, parameter, concentration, enzyme)
+        if node.op == '+':
+            return left + right
+        if node.op == '-':
+            return left - right
+        if node.op == '*':
+            return left * right
+        if node.op == '/':
+            return left / right
+        return left ** right
+    if isinstance(node, UnaryOp):
+        operand = evaluate_rate_law(node.operand, parameter, concentration, enzyme)
+        return -operand if node.op == '-' else +operand
+    if isinstance(node, Parameter):
+        return parameter(node.kind, node.name)
+    if isinstance(node, Concentration):
+        return concentration(node.species)
+    if isinstance(node, Enzyme):
+        return enzyme
+    return node.value
+
+
+class CustomRateLaw(NamedTuple):
+    """ Custom rate law of a single reaction, parsed once and lowered for each block and time point """
+    rxn_id: str
+    text: str
+    ast: NamedTuple
+    parameters: MappingProxyType  # kind -> tuple of parameter names in order of appearance
+    species: tuple  # metabolite ids in order of appearance
+
+    def parameter_id(self, name: str) -> str:
+        """ Index of a parameter of this reaction in the model parameter variables """
+        return f"{self.rxn_id}+{name}"
+
+    def expression(self, m, c, e, t):
+        """
+        Rate expression at time t using parameter variables of m, concentrations c[t,met] and enzymes e[t,enz],
+        or e[enz] for time-invariant enzymes
+        """
+        enz = f"{self.rxn_id}_ENZ"
+        return evaluate_rate_law(self.ast,
+                                 lambda kind, name: getattr(m, kind)[f"{self.rxn_id}+{name}"],
+                                 lambda species: c[t, species],
+                                 e[t, enz] if e.dim() == 2 else e[enz])
+
+
+def compile_custom_rate_laws(mech_df: pd.DataFrame, m_model: cobra.core.model.Model = None) -> MappingProxyType:
+    """
+    Parses and validates the custom rate law of every reaction in the mechanism DataFrame.
+
+    Parameters
+    ----------
+    mech_df : pd.DataFrame
+        DataFrame containing custom mechanism information, where the rate law is stored in the 'type'
+        column of the row that is neither 'reactant' nor 'product'.
+    m_model : cobra.core.model.Model, optional
+        The COBRApy model used to validate reaction and metabolite ids. Defaults to None (no validation).
+
+    Returns
+    -------
+    MappingProxyType
+        Read-only mapping of reaction ID to CustomRateLaw, in the order of the mechanism DataFrame.
+
+    Raises
+    ------
+    ValueError
+        If a rate law cannot be parsed or refers to reactions or metabolites missing from the model.
+    """
+    rate_laws = {}
+    for rxn, rate_law_text in zip(mech_df['rxn ID'], mech_df['type']):
+        if rate_law_text in ('reactant', 'product'):
+            continue
+        try:
+            ast = parse_rate_law(rate_law_text)
+        except ValueError as err:
+            raise ValueError(f"Reaction {rxn}: {err}") from None
+
+        parameters = {kind: [] for kind in PARAMETER_KINDS}
+        species = []
+        for node in _walk(ast):
+            if isinstance(node, Parameter) and node.name not in parameters[node.kind]:
+                parameters[node.kind].append(node.name)
+            elif isinstance(node, Concentration) and node.species not in species:
+                species.append(node.species)
+
+        if m_model is not None:
+            if rxn not in m_model.reactions:
+                raise ValueError(f"Rate law given for reaction {rxn}, which is not in the model")
+            missing = [s for s in species if s not in m_model.metabolites]
+            if missing:
+                raise ValueError(f"Rate law of reaction {rxn} uses metabolite(s) not in the model: {missing}")
+
+        rate_laws[rxn] = CustomRateLaw(rxn, rate_law_text, ast,
+                                       MappingProxyType({k: tuple(v) for k, v in parameters.items()}),
+                                       tuple(species))
+    return MappingProxyType(rate_laws)
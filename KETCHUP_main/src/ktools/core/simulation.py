@@ -0,0 +1,335 @@
+"""
+Forward simulation
+
+Evaluates the custom rate laws of a KETCHUP model on NumPy arrays as a vectorized right-hand side, so that
+a parameterization can be simulated with scipy.integrate.solve_ivp and many parameter sets can be
+evaluated in a single batched call.
+"""
+import operator
+from types import MappingProxyType
+
+import numpy as np
+import scipy.integrate
+import scipy.sparse
+
+from .rate_law import Parameter, PARAMETER_KINDS, evaluate_rate_law
+
+# keys of the kinetic parameters in KETCHUP models (kinetic_parameters) and result files ('kp')
+KINETIC_PARAMETER_KEYS = {'KCAT': 'kcat', 'KM': 'Km', 'KI': 'Ki', 'KCONS': 'Kconsts'}
+
+
+class _ArrayFunction:
+    """
+    Function of the (concentration, parameter, enzyme) arrays built by evaluate_rate_law. The arithmetic
+    operators compose the functions, so that a rate law is lowered once into closures over the array
+    columns of its values and is only evaluated on the arrays of each call.
+    """
+    __slots__ = ('f',)
+
+    def __init__(self, f):
+        self.f = f
+
+    @staticmethod
+    def lift(value):
+        """ Function of a lowered value, which is either an _ArrayFunction or a constant """
+        if isinstance(value, _ArrayFunction):
+            return value.f
+        return lambda *arrays: value
+
+    def _binary(self, other, op, flag_reverse=False):
+        f, g = self.f, _ArrayFunction.lift(other)
+        if flag_reverse:
+            f, g = g, f
+        return _ArrayFunction(lambda *arrays: op(f(*arrays), g(*arrays)))
+
+    def __add__(self, other):
+        return self._binary(other, operator.add)
+
+    def __radd__(self, other):
+        return self._binary(other, operator.add, True)
+
+    def __sub__(self, other):
+        return self._binary(other, operator.sub)
+
+    def __rsub__(self, other):
+        return self._binary(other, operator.sub, True)
+
+    def __mul__(self, other):
+        return self._binary(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self._binary(other, operator.mul, True)
+
+    def __truediv__(self, other):
+        return self._binary(other, operator.truediv)
+
+    def __rtruediv__(self, other):
+        return self._binary(other, operator.truediv, True)
+
+    def __pow__(self, other):
+        return self._binary(other, operator.pow)
+
+    def __rpow__(self, other):
+        return self._binary(other, operator.pow, True)
+
+    def __neg__(self):
+        f = self.f
+        return _ArrayFunction(lambda *arrays: -f(*arrays))
+
+    def __pos__(self):
+        return self
+
+
+def _column(array: int, index: int) -> _ArrayFunction:
+    """ Function returning column index of the array at position array of (concentration, parameter, enzyme) """
+    return _ArrayFunction(lambda *arrays: arrays[array][..., index])
+
+
+class RateLawSimulator:
+    """
+    Vectorized evaluator of custom rate laws and mass balances.
+
+    Arrays broadcast over leading dimensions: concentrations have shape (..., n_species), parameters
+    (..., n_parameters) and enzyme concentrations (..., n_reactions) or a scalar, so that a single
+    state, a time course, or thousands of parameter sets can be evaluated in one call.
+    Reactions without a rate law have a rate of zero.
+
+    Parameters
+    ----------
+    rate_laws : MappingProxyType
+        Compiled custom rate laws by reaction ID (see compile_custom_rate_laws).
+    s_matrix : StoichiometricMatrix
+        Stoichiometric matrix of the reaction network (see create_stoichiometric_matrix).
+    """
+
+    def __init__(self, rate_laws: MappingProxyType, s_matrix):
+        self.rate_laws = rate_laws
+        self.s_matrix = s_matrix
+        self.species = s_matrix.species
+        self.reactions = s_matrix.reactions
+        self._S_T = s_matrix.S.T.tocsr()
+
+        # parameters in the order of the model variables: by kind, then by reaction
+        parameter_ids = []
+        parameter_index = {}
+        for kind in PARAMETER_KINDS:
+            for rxn, rate_law in rate_laws.items():
+                for name in rate_law.parameters[kind]:
+                    parameter_index[(rxn, Parameter(kind, name))] = len(parameter_ids)
+                    parameter_ids.append((kind, rate_law.parameter_id(name)))
+        self.parameter_ids = tuple(parameter_ids)
+
+        # each rate law lowered once into a function of the arrays, over the columns of its values
+        species_index = s_matrix.species_index
+        self._rate_functions = []
+        for j, rxn in enumerate(self.reactions):
+            if rxn in rate_laws:
+                rxn_parameters = {(p.kind, p.name): i for (r, p), i in parameter_index.items() if r == rxn}
+                rate = evaluate_rate_law(rate_laws[rxn].ast,
+                                         lambda kind, name, columns=rxn_parameters: _column(1, columns[(kind, name)]),
+                                         lambda species: _column(0, species_index[species]),
+                                         _column(2, j))
+                self._rate_functions.append((j, _ArrayFunction.lift(rate)))
+
+        # dependence of each mass balance on the concentrations, used as sparsity of the Jacobian
+        uses = scipy.sparse.lil_matrix((len(self.reactions), len(self.species)))
+        for rxn, rate_law in rate_laws.items():
+            for s in rate_law.species:
+                uses[s_matrix.reaction_index[rxn], s_matrix.species_index[s]] = 1
+        self.jac_sparsity = ((abs(s_matrix.S) @ uses.tocsr()) != 0).astype(float).tocsr()
+
+    @classmethod
+    def from_model(cls, ketchup_model):
+        """ Creates the simulator from a KETCHUP Pyomo model built with custom rate laws """
+        return cls(ketchup_model.custom_rate_laws, ketchup_model.s_matrix)
+
+    def parameter_vector(self, kinetic_parameters: dict) -> np.ndarray:
+        """
+        Arranges kinetic parameter values in the order of parameter_ids.
+
+        Parameters
+        ----------
+        kinetic_parameters : dict
+            Either the 'kp' item of a result file, the kinetic_parameters dictionary of a KETCHUP
+            model, or a dictionary keyed by 'KCAT', 'KM', 'KI' and 'KCONS'. Each item maps parameter ID
+            (e.g. 'FDH+f') to a value or Pyomo variable.
+
+        Returns
+        -------
+        np.ndarray
+            Parameter vector.
+        """
+        out = np.empty(len(self.parameter_ids))
+        for i, (kind, pid) in enumerate(self.parameter_ids):
+            values = kinetic_parameters.get(kind, kinetic_parameters.get(KINETIC_PARAMETER_KEYS[kind]))
+            value = values[pid]
+            out[i] = value.value if hasattr(value, 'value') else value
+        return out
+
+    def concentration_vector(self, concentrations: dict, default: float = 0.0) -> np.ndarray:
+        """ Arranges concentrations by species ID in the order of species, using default for missing species """
+        return np.array([concentrations.get(s, default) for s in self.species], dtype=float)
+
+    def enzyme_vector(self, enzymes: dict, m_model=None, default: float = 1.0) -> np.ndarray:
+        """
+        Arranges enzyme concentrations in the order of reactions. Keys can be reaction IDs or, if the
+        COBRApy model is given, enzyme IDs of the gene reaction rules (as in the t0 data of experiments).
+        """
+        out = np.full(len(self.reactions), default, dtype=float)
+        for j, rxn in enumerate(self.reactions):
+            if rxn in enzymes:
+                out[j] = enzymes[rxn]
+            elif m_model is not None:
+                pr = str(m_model.reactions.get_by_id(rxn).gene_reaction_rule)
+                if pr in enzymes:
+                    out[j] = enzymes[pr]
+        return out
+
+    def _rates(self, C: np.ndarray, P: np.ndarray, E: np.ndarray) -> np.ndarray:
+        """ Rates of all reactions from their lowered rate laws """
+        terms = [0.0] * len(self.reactions)
+        for j, rate_function in self._rate_functions:
+            terms[j] = rate_function(C, P, E)
+        return np.stack(np.broadcast_arrays(*terms), axis=-1)
+
+    def rates(self, c: np.ndarray, p: np.ndarray, e: np.ndarray | float = 1.0) -> np.ndarray:
+        """ Reaction rates with shape (..., n_reactions) """
+        c = np.asarray(c, dtype=float)
+        p = np.asarray(p, dtype=float)
+        e = np.asarray(e, dtype=float)
+        if e.ndim == 0:
+            e = np.broadcast_to(e, (len(self.reactions),))
+        return self._rates(c, p, e)
+
+    def dcdt(self, c: np.ndarray, p: np.ndarray, e: np.ndarray | float = 1.0) -> np.ndarray:
+        """ Time derivatives of the concentrations with shape (..., n_species) """
+        r = self.rates(c, p, e)
+        return np.asarray(r.reshape(-1, r.shape[-1]) @ self._S_T).reshape(r.shape[:-1] + (len(self.species),))
+
+    def simulate_sensitivities(self, c0: np.ndarray, p: np.ndarray, t_eval, e: np.ndarray | float = 1.0,
+                               method: str = 'BDF', **kwargs):
+        """
+        Integrates the mass balances together with their forward sensitivities. The Jacobians of the mass
+        balances are exact to rounding, from complex-step differentiation of the rate laws.
+
+        Parameters
+        ----------
+        c0 : np.ndarray
+            Initial concentrations with shape (n_species,) or (n_sets, n_species).
+        p : np.ndarray
+            Parameters with shape (n_parameters,), shared by all sets.
+        t_eval : array_like
+            Times at which to store the solution. The integration runs from 0 to max(t_eval).
+        e : np.ndarray or float, optional
+            Enzyme concentrations with shape (n_reactions,) or (n_sets, n_reactions). Defaults to 1.
+        method : str, optional
+            Integration method of solve_ivp. Defaults to 'BDF'.
+        **kwargs
+            Further arguments to solve_ivp, e.g. rtol and atol.
+
+        Returns
+        -------
+        scipy.integrate.OdeResult
+            Result of solve_ivp with the concentrations in y, with shape ([n_sets,] n_species, n_times), and
+            their sensitivities to the parameters in y_p, with shape ([n_sets,] n_species, n_parameters, n_times),
+            and to the initial concentrations in y_c0, with shape ([n_sets,] n_species, n_species, n_times).
+        """
+        h = 1e-30
+        p = np.asarray(p, dtype=float)
+        c0 = np.asarray(c0, dtype=float)
+        batch_shape = np.shape(c0)[:-1]
+        n_sets = int(np.prod(batch_shape))
+        n_species, n_parameters = len(self.species), len(p)
+        n_columns = 1 + n_parameters + n_species
+        e = np.broadcast_to(np.asarray(e, dtype=float), (n_sets, len(self.reactions)))[:, None, :]
+        S_T = self._S_T.toarray()
+
+        # complex steps of the concentrations and parameters, evaluated together with the rates
+        step_c = np.zeros((1 + n_species + n_parameters, n_species), dtype=complex)
+        step_c[1:1 + n_species] = 1j*h*np.eye(n_species)
+        step_p = np.zeros((1 + n_species + n_parameters, n_parameters), dtype=complex)
+        step_p[1 + n_species:] = 1j*h*np.eye(n_parameters)
+
+        def derivatives(c):
+            """ Time derivatives and transposed Jacobians with respect to c and p, for each set """
+            r = self._rates(c[:, None, :] + step_c, p + step_p, e) @ S_T
+            return r[:, 0].real, r[:, 1:1 + n_species].imag / h, r[:, 1 + n_species:].imag / h
+
+        # state by set: concentrations, then one column per parameter and initial concentration
+        y0 = np.zeros((n_sets, n_columns, n_species))
+        y0[:, 0] = c0.reshape(n_sets, n_species)
+        y0[:, 1 + n_parameters:] = np.eye(n_species)
+
+        def rhs(t, y):
+            y = y.reshape(n_sets, n_columns, n_species)
+            f, jac_c_T, jac_p_T = derivatives(y[:, 0])
+            dy = y @ jac_c_T
+            dy[:, 0] = f
+            dy[:, 1:1 + n_parameters] += jac_p_T
+            return dy.ravel()
+
+        def jac(t, y):
+            # Newton iterations use the Jacobian of the mass balances for every column
+            _, jac_c_T, _ = derivatives(y.reshape(n_sets, n_columns, n_species)[:, 0])
+            identity = scipy.sparse.identity(n_columns)
+            return scipy.sparse.block_diag([scipy.sparse.kron(identity, jac_c_T[i].T) for i in range(n_sets)],
+                                           format='csr')
+
+        if method in ('BDF', 'Radau', 'LSODA') and 'jac' not in kwargs:
+            kwargs['jac'] = jac
+        t_eval = np.asarray(t_eval, dtype=float)
+        result = scipy.integrate.solve_ivp(rhs, (0.0, float(t_eval.max())), y0.ravel(), method=method,
+                                           t_eval=t_eval, **kwargs)
+        y = result.y.reshape(batch_shape + (n_columns, n_species, -1))
+        result.y = y[..., 0, :, :]
+        result.y_p = np.moveaxis(y[..., 1:1 + n_parameters, :, :], -3, -2)
+        result.y_c0 = np.moveaxis(y[..., 1 + n_parameters:, :, :], -3, -2)
+        return result
+
+    def simulate(self, c0: np.ndarray, p: np.ndarray, t_eval, e: np.ndarray | float = 1.0,
+                 method: str = 'BDF', **kwargs):
+        """
+        Integrates the mass balances with scipy.integrate.solve_ivp.
+
+        Parameters
+        ----------
+        c0 : np.ndarray
+            Initial concentrations with shape (n_species,) or (n_sets, n_species).
+        p : np.ndarray
+            Parameters with shape (n_parameters,) or (n_sets, n_parameters). Parameter sets are
+            integrated together as one block-diagonal system.
+        t_eval : array_like
+            Times at which to store the solution. The integration runs from 0 to max(t_eval).
+        e : np.ndarray or float, optional
+            Enzyme concentrations with shape (n_reactions,) or (n_sets, n_reactions). Defaults to 1.
+        method : str, optional
+            Integration method of solve_ivp. Defaults to 'BDF'.
+        **kwargs
+            Further arguments to solve_ivp, e.g. rtol and atol.
+
+        Returns
+        -------
+        scipy.integrate.OdeResult
+            Result of solve_ivp, with the concentrations in y reshaped to (n_species, n_times) or
+            (n_sets, n_species, n_times).
+        """
+        p = np.asarray(p, dtype=float)
+        batch_shape = np.broadcast_shapes(np.shape(c0)[:-1], p.shape[:-1], np.shape(e)[:-1])
+        n_sets = int(np.prod(batch_shape))
+        n_species = len(self.species)
+        c0 = np.broadcast_to(np.asarray(c0, dtype=float), batch_shape + (n_species,))
+        p = np.broadcast_to(p, batch_shape + p.shape[-1:])
+        e = np.asarray(e, dtype=float)
+        if e.ndim > 0:
+            e = np.broadcast_to(e, batch_shape + (len(self.reactions),))
+
+        def rhs(t, y):
+            return self.dcdt(y.reshape(batch_shape + (n_species,)), p, e).ravel()
+
+        if method in ('BDF', 'Radau') and 'jac_sparsity' not in kwargs:
+            kwargs['jac_sparsity'] = scipy.sparse.block_diag([self.jac_sparsity] * n_sets, format='csr')
+        t_eval = np.asarray(t_eval, dtype=float)
+        result = scipy.integrate.solve_ivp(rhs, (0.0, float(t_eval.max())), c0.ravel(), method=method,
+                                           t_eval=t_eval, **kwargs)
+        result.y = result.y.reshape(batch_shape + (n_species, -1))
+        return result
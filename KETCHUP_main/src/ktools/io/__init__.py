@@ -4,11 +4,13 @@ from .kfit_ss import read_kfit_spreadsheets_xlsx
 from .kfit_ss import read_kfit_model_xlsx
 from .kfit_ss import read_kfit_data_xlsx
 from .strainer_dy import read_strainer_data_xlsx
+from .workbook import iter_xlsx_sheets, read_xlsx_sheets
 from .dataframes import parse_kfit_model_df
 from .dataframes import parse_kfit_mech_df
 from .dataframes import parse_kfit_ss_data_df
 from .dataframes import parse_strainer_dy_data_df
 from .flat_data import read_flat_data
 from .options import read_options_file
-from .outputs import result_dump
+from .outputs import result_dump, result_load, result_values, result_initialize
+from .cache import input_cache_key, read_cache, write_cache, default_cache_directory
 from .sbml import create_sbml_kinetic_model
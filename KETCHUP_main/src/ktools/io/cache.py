@@ -0,0 +1,128 @@
+"""
+Input cache
+
+Stores parsed inputs (e.g., the COBRApy model and expanded mechanism DataFrame) in a directory as
+pickle files keyed by a hash of the source file contents and the parsing options, so that repeated
+runs skip spreadsheet parsing. A changed source file or option gives a new key.
+
+"""
+import hashlib
+import os
+import pickle
+import warnings
+
+# increase when the parsed representation changes, so that existing cache entries are not used
+CACHE_VERSION = 2
+
+
+def default_cache_directory() -> str:
+    """
+    Returns the per-user cache directory of KETCHUP, so that cache files are neither written next to the
+    input files nor read from directories shared with other users.
+
+    Returns
+    -------
+    str
+        'ketchup' in %LOCALAPPDATA% on Windows, or in $XDG_CACHE_HOME (default ~/.cache) elsewhere.
+    """
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        base = os.environ['LOCALAPPDATA']
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ketchup')
+
+
+def input_cache_key(filenames: list[str], **options) -> str:
+    """
+    Computes the cache key of inputs parsed from files.
+
+    Parameters
+    ----------
+    filenames : list[str]
+        Source files. Their contents, not names or modification times, enter the key.
+    **options
+        Parsing options (e.g., mech_type) that change the parsed result.
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest.
+    """
+    import cobra
+    import pandas as pd
+
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_VERSION} {cobra.__version__} {pd.__version__}".encode())
+    for fn in filenames:
+        with open(fn, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    for key in sorted(options):
+        digest.update(f"{key}={options[key]!r}".encode())
+    return digest.hexdigest()
+
+
+def read_cache(directory: str, key: str, debug: bool = False):
+    """
+    Reads a cache entry.
+
+    Parameters
+    ----------
+    directory : str
+        Cache directory.
+    key : str
+        Cache key from input_cache_key.
+    debug : bool, optional
+        If True, prints debugging messages. Defaults to False.
+
+    Returns
+    -------
+    object
+        The cached object, or None if there is no valid entry.
+    """
+    fn = os.path.join(directory, f"{key}.pkl")
+    if not os.path.exists(fn):
+        return None
+    try:
+        with open(fn, 'rb') as f:
+            obj = pickle.load(f)
+    except Exception as err:
+        warnings.warn(f"Warning: ignoring unreadable cache file {fn} ({type(err).__name__}).")
+        return None
+    if debug:
+        print(f"Read cached inputs from {fn}")
+    return obj
+
+
+def write_cache(directory: str, key: str, obj, debug: bool = False) -> None:
+    """
+    Writes a cache entry. The entry is written to a temporary file and then renamed, so that
+    concurrent runs never read a partially written entry.
+
+    Parameters
+    ----------
+    directory : str
+        Cache directory. Created if it does not exist.
+    key : str
+        Cache key from input_cache_key.
+    obj : object
+        Object to cache.
+    debug : bool, optional
+        If True, prints debugging messages. Defaults to False.
+
+    Returns
+    -------
+    None
+    """
+    fn = os.path.join(directory, f"{key}.pkl")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fn_tmp = f"{fn}.{os.getpid()}.tmp"
+        with open(fn_tmp, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fn_tmp, fn)
+    except OSError as err:
+        warnings.warn(f"Warning: could not write cache file {fn} ({err}).")
+        return None
+    if debug:
+        print(f"Wrote cached inputs to {fn}")
+    return None
@@ -5,14 +5,82 @@ Parsing of K-FIT derived dataframes of model and mechanism data.
 Parsing of Strainer derived dataframes of data.
 
 """
+import re
+
 import cobra
 import pandas as pd
 
 
+# reaction formula syntax of COBRApy (see cobra.Reaction.build_reaction_from_string), compiled once
+_REVERSIBLE_ARROW = re.compile(r"<(-+|=+)>")
+_FORWARD_ARROW = re.compile(r"(-+|=+)>")
+_REVERSE_ARROW = re.compile(r"<(-+|=+)")
+_COMPARTMENT = re.compile(r"^\s*\[([A-Za-z])\]\s*:*")
+
+
+def _parse_reaction_formula(formula: str) -> tuple[list[tuple[str, int | float]], tuple, str | None]:
+    """
+    Parses a reaction formula the same way as COBRApy, without requiring the reaction to be in a model.
+
+    Parameters
+    ----------
+    formula : str
+        Reaction formula, e.g. '2 A + B <=> C'.
+
+    Returns
+    -------
+    tuple[list[tuple[str, int | float]], tuple, str | None]
+        Metabolite ids with their coefficients in order of appearance, the bounds implied by the arrow
+        and the compartment given as prefix of the formula, if any.
+
+    Raises
+    ------
+    ValueError
+        If the formula has no reaction arrow.
+    """
+    config = cobra.Configuration()
+    found_compartments = _COMPARTMENT.findall(formula)
+    if len(found_compartments) == 1:
+        compartment = found_compartments[0]
+        formula = _COMPARTMENT.sub("", formula)
+    else:
+        compartment = None
+
+    arrow_match = _REVERSIBLE_ARROW.search(formula)
+    if arrow_match is not None:
+        bounds = (config.lower_bound, config.upper_bound)
+    elif (arrow_match := _FORWARD_ARROW.search(formula)) is not None:
+        bounds = (0, config.upper_bound)
+    elif (arrow_match := _REVERSE_ARROW.search(formula)) is not None:
+        bounds = (config.lower_bound, 0)
+    else:
+        raise ValueError(f"no suitable arrow found in '{formula}'")
+
+    terms = []
+    for substr, factor in ((formula[:arrow_match.start()].strip(), -1), (formula[arrow_match.end():].strip(), 1)):
+        if len(substr) == 0:
+            continue
+        for term in substr.split("+"):
+            term = term.strip()
+            if term.lower() == "nothing":
+                continue
+            if " " in term:
+                num_str, met_id = term.split()
+                num = float(num_str.lstrip("(").rstrip(")")) * factor
+            else:
+                met_id = term
+                num = factor
+            if compartment is not None:
+                met_id += f"[{compartment}]"
+            terms.append((met_id, num))
+    return terms, bounds, compartment
+
+
 def parse_kfit_model_df(df_metabolite: pd.DataFrame, df_reaction: pd.DataFrame,
                         model_name: str = 'model', debug: bool = False) -> cobra.core.model.Model:
     """
     Parse the DataFrames of the K-FIT model inputs and convert them into a COBRApy model.
+    All metabolites and reactions are created first and then added to the model in a single call each.
 
     Parameters
     ----------
@@ -33,16 +101,15 @@ def parse_kfit_model_df(df_metabolite: pd.DataFrame, df_reaction: pd.DataFrame,
 
     m = cobra.Model(model_name)
 
-    # serialize the metabolites, using (temporary) names that we know will be acceptable python variable names
-    tmp_counter = 1
-    for idx, row in df_metabolite.iterrows():
+    # create the metabolites
+    metabolites = {}
+    for row in df_metabolite.to_dict('records'):
         item = row['ID']
-        if item not in m.metabolites:
-            met_var = f"M_{tmp_counter}"
+        if item not in metabolites:
             # note: K-FIT spreadsheets do not track charges
-            vars()[met_var] = cobra.Metabolite(item,formula=row['Formula'],name=row['Name'])
+            met = cobra.Metabolite(item,formula=row['Formula'],name=row['Name'])
             if row['Name'] is None:
-                vars()[met_var].name = row['ID']
+                met.name = row['ID']
             # compartment hack for simple systems
             # TODO: make general for more complex systems
             if '_e' in item[-2:] or '[e]' in item [-3:]:
@@ -51,38 +118,47 @@ def parse_kfit_model_df(df_metabolite: pd.DataFrame, df_reaction: pd.DataFrame,
                 comp='m'
             else:
                 comp='c'
-            vars()[met_var].compartment=comp
+            met.compartment=comp
             # TODO: set sbo for exchange metabolites
-            vars()[met_var].annotation={'sbo':'SBO:0000247'}
-            m.add_metabolites([vars()[met_var]])
-            tmp_counter += 1
+            met.annotation={'sbo':'SBO:0000247'}
+            metabolites[item] = met
+    n_listed = len(metabolites)
 
-    #display(model)
     #print (df_reaction)
-    # serialize the reactions, using (temporary) names that we know will be acceptable python variable names
-    tmp_counter = 1
-    for idx, row in df_reaction.iterrows():
+    # create the reactions, with metabolites missing from the metabolite list created as COBRApy does
+    reactions = {}
+    for row in df_reaction.to_dict('records'):
         item = str(row['Rxn ID'])
-        if item not in m.reactions:
-            rxn_var = f"R_{tmp_counter}"
-            vars()[rxn_var] = cobra.Reaction(item, name=row['Rxn name'])
-            m.add_reactions([vars()[rxn_var]])
-            vars()[rxn_var].reaction = (str(row['Rxn Formula']))
+        if item not in reactions:
+            rxn = cobra.Reaction(item, name=row['Rxn name'])
+            terms, bounds, compartment = _parse_reaction_formula(str(row['Rxn Formula']))
+            rxn.bounds = bounds
+            for met_id, num in terms:
+                if met_id not in metabolites:
+                    print(f"unknown metabolite '{met_id}' created")
+                    metabolites[met_id] = cobra.Metabolite(met_id, compartment=compartment)
+                rxn.add_metabolites({metabolites[met_id]: num})
             #set upper and lower bounds. done after parsing the formula as the arrows there will affect 
             #  the bounds and K-FIT input files are not consistent on arrow types
-            vars()[rxn_var].lower_bound=row['Lower bound']
-            vars()[rxn_var].upper_bound=row['Upper bound']
+            rxn.lower_bound=row['Lower bound']
+            rxn.upper_bound=row['Upper bound']
             try:
                 if row['Enzyme ID']:
                     #print (row['Enzyme ID'])
-                    vars()[rxn_var].gene_reaction_rule=row['Enzyme ID']
+                    rxn.gene_reaction_rule=row['Enzyme ID']
             except:
                 pass
             # TODO: add sbo to reactions
-            tmp_counter += 1
+            reactions[item] = rxn
+
+    # add everything at once, so that the solver problem is only updated once
+    m.add_metabolites(list(metabolites.values()))
+    m.add_reactions(list(reactions.values()))
 
     if debug:
         print(f'COBRA model with name {model_name} created')
+        if len(metabolites) > n_listed:
+            print(f'{len(metabolites) - n_listed} metabolites created from reaction formulas')
 
     return m
 
@@ -133,16 +209,8 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
     else:
         rxn_id_list = df_mechanism['ID'].squeeze().tolist()
         
-    def df_join_reactions(df=pd.DataFrame(), data=None):
-        """ Add items to the dataframe or initialize the data frame if empty
-        
-        """
-        chart_index = ['rxn ID','step ID','reactant','product','mechanism','type']
-        if df.empty and data == None:
-            df = pd.DataFrame(columns = chart_index)
-        else:
-            df = pd.DataFrame(data, columns = chart_index)
-        return df
+    # columns of the expanded reactions, which are accumulated as row tuples and materialized once
+    chart_index = ['rxn ID','step ID','reactant','product','mechanism','type']
 
     def enzyme_complex_name(name, cmp):
         """ Convert list based bindings into readable enzyme complexes. Enables 
@@ -156,20 +224,18 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
         return output
     
     def generate_elemental_reactions(rxn_df, base_enzyme_name=None):
-        mechanism = rxn_df.mechanism
-        base_rxn_name = rxn_df.ID
+        mechanism = rxn_df['mechanism']
+        base_rxn_name = rxn_df['ID']
         
         if not base_enzyme_name:
             # note that this step assumes that enzymes are independent for each reaction.
             # if some are the same, constraints will need to be added elsewhere
-            base_enzyme_name = f"{rxn_df.ID}_ENZ"
+            base_enzyme_name = f"{rxn_df['ID']}_ENZ"
 
         # TODO: validate all metabolites included
 
         rxn_list = []
 
-        df_new_reactions = df_join_reactions()
-        
         # substrate binding order
         sbo = rxn_df['SBO']
         if sbo:
@@ -209,9 +275,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     current_rxn_name = str(count)
                     
                     # add new data frame row
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'binding'])
+                                     'elemental', 'binding'))
                     #print (current_rxn_name, current_react_list, current_prod_list)
             # catalytic
             count = len(sbo)
@@ -221,9 +287,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
             current_rxn_name = str(count)
             
             # add new data frame row
-            rxn_list.append([rxn_df.ID, current_rxn_name,
+            rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'catalytic'])
+                                     'elemental', 'catalytic'))
             #print (current_rxn_name, current_react_list, current_prod_list)
 
             # product release
@@ -238,9 +304,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     current_rxn_name = str(count+count_start)
                     
                     # add new data frame row
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'release'])
+                                     'elemental', 'release'))
                     #print (current_rxn_name, current_react_list, current_prod_list)
         
         elif mechanism.lower() == 'ppg':
@@ -271,9 +337,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     current_prod_list  = [enz]
                     current_rxn_name = str(3*count)
                     # add new data frame row
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'binding'])
+                                     'elemental', 'binding'))
                     if debug:
                         print (current_rxn_name, current_react_list, current_prod_list)
 
@@ -283,9 +349,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     current_prod_list = [enz]
                     current_rxn_name = str(3*count+1)
                     # add new data frame row
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'catalytic'])
+                                     'elemental', 'catalytic'))
                     if debug:
                         print (current_rxn_name, current_react_list, current_prod_list)
 
@@ -300,9 +366,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     # unless it is the final one
                     current_prod_list = [enz,pro[count]]
                     current_rxn_name = str(3*count+2)
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'release'])
+                                     'elemental', 'release'))
                     if debug:
                         print (current_rxn_name, current_react_list, current_prod_list)
                     
@@ -375,9 +441,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                 current_prod_list  = [enz]
                 current_rxn_name = f"i{reg_cumulative_count}"
                 
-                rxn_list.append([rxn_df.ID, current_rxn_name,
+                rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'competitive'])
+                                     'elemental', 'competitive'))
                 reg_cumulative_count += 1
         
         imechanism = rxn_df['UCI']
@@ -400,9 +466,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                 current_prod_list  = [enz]
                 current_rxn_name = f"i{reg_cumulative_count}"
                 
-                rxn_list.append([rxn_df.ID, current_rxn_name,
+                rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'uncompetitive'])
+                                     'elemental', 'uncompetitive'))
                 reg_cumulative_count += 1
                 
         imechanism = rxn_df['NCI']
@@ -421,9 +487,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                 current_prod_list  = [enz]
                 current_rxn_name = "i"+str(reg_cumulative_count)
                 
-                rxn_list.append([rxn_df.ID, current_rxn_name,
+                rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'noncompetitive'])
+                                     'elemental', 'noncompetitive'))
                 reg_cumulative_count += 1
                 
                 item_i = f"{item}_ui"
@@ -433,9 +499,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                 current_prod_list  = [enz]
                 current_rxn_name = f"i{reg_cumulative_count}"
                 
-                rxn_list.append([rxn_df.ID, current_rxn_name,
+                rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'elemental', 'noncompetitive'])
+                                     'elemental', 'noncompetitive'))
                 reg_cumulative_count += 1
             
         # activation steps
@@ -455,21 +521,16 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
             imechanism = imechanism.split(';')
         # TODO : finish
         
-        # generate dataframe
-        df_new_reactions = df_join_reactions(pd.DataFrame(), rxn_list)
-        
-        return df_new_reactions
+        return rxn_list
 
     def generate_mm_reactions(rxn_df, base_enzyme_name=None):
-        mechanism = rxn_df.mechanism
-        base_rxn_name = rxn_df.ID
+        mechanism = rxn_df['mechanism']
+        base_rxn_name = rxn_df['ID']
         
         # TODO: validate all metabolites included
 
         rxn_list = []
 
-        df_new_reactions = df_join_reactions()
-  
         # substrates
         sbo = rxn_df['SBO']
         if sbo:
@@ -491,9 +552,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     current_rxn_name = str(count)
                     
                     # add new data frame row
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'michaelis-menten', 'reactant'])
+                                     'michaelis-menten', 'reactant'))
                     #print (current_rxn_name, current_react_list, current_prod_list)
 
             # product release
@@ -507,9 +568,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     current_rxn_name = str(count+count_start)
                     
                     # add new data frame row
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'michaelis-menten', 'product'])
+                                     'michaelis-menten', 'product'))
         
         # inhibition steps
         reg_cumulative_count = 0
@@ -527,9 +588,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                 current_rxn_name = f"i{reg_cumulative_count}"
                    
                 # add new data frame row
-                rxn_list.append([rxn_df.ID, current_rxn_name,
+                rxn_list.append((rxn_df['ID'], current_rxn_name,
                                 current_react_list, current_prod_list,
-                                'michaelis-menten', 'competitive'])
+                                'michaelis-menten', 'competitive'))
                 reg_cumulative_count += 1
 
         imechanism = rxn_df['UCI']
@@ -545,9 +606,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                 current_rxn_name = f"i{reg_cumulative_count}"
                    
                 # add new data frame row
-                rxn_list.append([rxn_df.ID, current_rxn_name,
+                rxn_list.append((rxn_df['ID'], current_rxn_name,
                                 current_react_list, current_prod_list,
-                                'michaelis-menten', 'umcompetitive'])
+                                'michaelis-menten', 'umcompetitive'))
                 reg_cumulative_count += 1
 
 
@@ -564,9 +625,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                 current_rxn_name = "i"+str(reg_cumulative_count)
                    
                 # add new data frame row
-                rxn_list.append([rxn_df.ID, current_rxn_name,
+                rxn_list.append((rxn_df['ID'], current_rxn_name,
                                 current_react_list, current_prod_list,
-                                'michaelis-menten', 'noncompetitive'])
+                                'michaelis-menten', 'noncompetitive'))
                 reg_cumulative_count += 1
 
         imechanism = rxn_df['act']
@@ -582,22 +643,18 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                 current_rxn_name = f"i{reg_cumulative_count}"
                    
                 # add new data frame row
-                rxn_list.append([rxn_df.ID, current_rxn_name,
+                rxn_list.append((rxn_df['ID'], current_rxn_name,
                                 current_react_list, current_prod_list,
-                                'michaelis-menten', 'activator'])
+                                'michaelis-menten', 'activator'))
                 reg_cumulative_count += 1
 
-        # generate dataframe
-        df_new_reactions = df_join_reactions(pd.DataFrame(), rxn_list)
-        
-        return df_new_reactions
+        return rxn_list
 
     def generate_custom_reactions(rxn_df):
-        mechanism = rxn_df.mechanism
-        base_rxn_name = rxn_df.ID
+        mechanism = rxn_df['mechanism']
+        base_rxn_name = rxn_df['ID']
 
         rxn_list = []
-        df_new_reactions = df_join_reactions()
         # substrates
         sbo = rxn_df['SBO']
         if sbo:
@@ -618,9 +675,9 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     current_rxn_name = str(count)
 
                     # add new data frame row
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'custom', 'reactant'])
+                                     'custom', 'reactant'))
                     # print (current_rxn_name, current_react_list, current_prod_list)
 
             # product release
@@ -634,42 +691,39 @@ def parse_kfit_mech_df(df_mechanism: pd.DataFrame, m_model: cobra.core.model.Mod
                     current_rxn_name = str(count + count_start)
 
                     # add new data frame row
-                    rxn_list.append([rxn_df.ID, current_rxn_name,
+                    rxn_list.append((rxn_df['ID'], current_rxn_name,
                                      current_react_list, current_prod_list,
-                                     'custom', 'product'])
+                                     'custom', 'product'))
         # rate law defined in 'type' column
         rate_law = rxn_df['rate law']
-        rxn_list.append([rxn_df.ID, current_rxn_name,
+        rxn_list.append((rxn_df['ID'], current_rxn_name,
                          None, None,
-                         'custom', rate_law])
+                         'custom', rate_law))
 
-        # generate dataframe
-        df_new_reactions = df_join_reactions(pd.DataFrame(), rxn_list)
+        return rxn_list
 
-        return df_new_reactions
+    rxn_rows = []
 
-    df_expanded_reactions = df_join_reactions()
-    df_reactions = pd.DataFrame()
-
-    # main loop of function that loops over the reactions
+    # main loop of function that loops over the reactions, using plain dictionaries for the rows
     if testing_flag:
-        df_reactions = generate_elemental_reactions(df_mechanism.loc[50])
+        rxn_rows += generate_elemental_reactions(df_mechanism.loc[50].to_dict())
     else:
-        for rxn in df_mechanism.index:
+        for rxn_df in df_mechanism.to_dict('records'):
             if debug:
-                print (df_mechanism.loc[rxn].tolist())
+                print (list(rxn_df.values()))
             if mech_type.lower() == 'elemental':
-                _tmp_er = generate_elemental_reactions(df_mechanism.loc[rxn])
-                #print(ww)
+                rxn_rows += generate_elemental_reactions(rxn_df)
             elif mech_type.lower() in ("mm", 'michaelis-menten'):
-                _tmp_er = generate_mm_reactions(df_mechanism.loc[rxn])
+                rxn_rows += generate_mm_reactions(rxn_df)
             elif mech_type.lower() == 'custom':
-                _tmp_er = generate_custom_reactions(df_mechanism.loc[rxn])
+                rxn_rows += generate_custom_reactions(rxn_df)
             else:
                 print (f"Unknown mechanism type {mech_type}")
 
-            df_reactions = pd.concat([df_reactions, _tmp_er],ignore_index=True)
-    
+    df_reactions = pd.DataFrame(rxn_rows, columns=chart_index)
+    df_reactions['mechanism'] = df_reactions['mechanism'].astype('category')
+    df_reactions['type'] = df_reactions['type'].astype('category')
+
     return df_reactions
 
 
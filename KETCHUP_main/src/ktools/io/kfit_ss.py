@@ -7,12 +7,13 @@ Importation of K-FIT spreadsheets for model and mechanism data.
 
 import cobra
 import pandas as pd
-import openpyxl
 import os
 from os.path import join
 from .dataframes import parse_kfit_model_df
 from .dataframes import parse_kfit_mech_df
 from .dataframes import parse_kfit_ss_data_df
+from .cache import input_cache_key, read_cache, write_cache
+from .workbook import read_xlsx_sheets, _xlsx_to_df
 import cobra.core.model
 
 def read_kfit_spreadsheets_xlsx(filename_model: str, filename_mechanism: str,
@@ -51,10 +52,12 @@ def read_kfit_spreadsheets_xlsx(filename_model: str, filename_mechanism: str,
     """
 
     from warnings import warn
-    
-    df_metabolite = _xlsx_to_df(filename_model,'Metabolites', debug=debug)
-    df_reaction = _xlsx_to_df(filename_model,'Reactions', debug=debug)
-    df_mechanism = _xlsx_to_df(filename_mechanism, debug=debug) # K-FIT defaults to first sheet for mechanism file
+
+    # both model sheets are read from a single opening of the workbook
+    sheets_model = read_xlsx_sheets(filename_model, [met_sheet, rxn_sheet], debug=debug)
+    df_metabolite = sheets_model[met_sheet]
+    df_reaction = sheets_model[rxn_sheet]
+    df_mechanism = _xlsx_to_df(filename_mechanism, mech_sheet, debug=debug) # K-FIT defaults to first sheet for mechanism file
     
     if debug:
         print('All K-FIT input files processed')
@@ -64,7 +67,7 @@ def read_kfit_spreadsheets_xlsx(filename_model: str, filename_mechanism: str,
 def read_kfit_model_xlsx(filename_model, filename_mechanism,
                          met_sheet='Metabolites', rxn_sheet='Reactions',
                          mech_sheet: str = None, mech_type: str = 'elemental',
-                         debug: bool = False) -> tuple[cobra.core.model.Model, pd.DataFrame]:
+                         debug: bool = False, cache_dir: str = None) -> tuple[cobra.core.model.Model, pd.DataFrame]:
     """
     Read in the model K-FIT spreadsheets and create the model representations.
 
@@ -89,6 +92,10 @@ def read_kfit_model_xlsx(filename_model, filename_mechanism,
     debug : bool, optional
         If True, prints debugging messages.
         Defaults to False.
+    cache_dir : str, optional
+        Directory of the input cache. If given, the parsed model and mechanisms are read from the
+        cache when the file contents and options are unchanged, and stored there otherwise.
+        Defaults to None (no cache).
 
     Returns
     -------
@@ -98,13 +105,29 @@ def read_kfit_model_xlsx(filename_model, filename_mechanism,
             - pandas DataFrame containing processed mechanisms.
     """
 
-    (ss_df_met,ss_df_rxn,ss_df_mech) = read_kfit_spreadsheets_xlsx(
-                                           filename_model, filename_mechanism,
-                                           met_sheet, rxn_sheet, mech_sheet, debug)
-
-    m_model = parse_kfit_model_df(ss_df_met, ss_df_rxn, debug=debug)
-    mech_df = parse_kfit_mech_df(ss_df_mech, m_model, mech_type=mech_type,
-                                 debug=debug)
+    from ktools.util import phase
+
+    if cache_dir:
+        with phase('read_cache'):
+            key = input_cache_key([filename_model, filename_mechanism], met_sheet=met_sheet, rxn_sheet=rxn_sheet,
+                                  mech_sheet=mech_sheet, mech_type=mech_type)
+            cached = read_cache(cache_dir, key, debug=debug)
+        if cached is not None:
+            return cached
+
+    with phase('read_model_files'):
+        (ss_df_met,ss_df_rxn,ss_df_mech) = read_kfit_spreadsheets_xlsx(
+                                               filename_model, filename_mechanism,
+                                               met_sheet, rxn_sheet, mech_sheet, debug)
+
+    with phase('build_cobra_model'):
+        m_model = parse_kfit_model_df(ss_df_met, ss_df_rxn, debug=debug)
+    with phase('expand_mechanism'):
+        mech_df = parse_kfit_mech_df(ss_df_mech, m_model, mech_type=mech_type,
+                                     debug=debug)
+    if cache_dir:
+        with phase('write_cache'):
+            write_cache(cache_dir, key, (m_model, mech_df), debug=debug)
     return m_model, mech_df
 
 
@@ -137,34 +160,3 @@ def read_kfit_data_xlsx(filename_data: str, data_sheet: str = None,
     df_data = parse_kfit_ss_data_df(df_ss_dat, debug=debug)
 
     return df_data
-
-
-def _xlsx_to_df(filename_workbook, sheet_name=None, debug=False):
-    
-    try:
-        df = pd.DataFrame()
-        if debug:
-            print(f"Beginning to read file {filename_workbook}")
-        # Note that 'data_only=True' reads the results for formulae
-        #   instead of the formulae (default)
-        workbook = openpyxl.load_workbook(filename=filename_workbook, data_only=True)
-        if sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-        elif sheet_name == None:
-            sheet = workbook[workbook.sheetnames[0]]
-        if debug:
-            print(f"Spreadsheet name: {filename_workbook}")
-            print(f"Worksheet names: {workbook.sheetnames}")
-            print(f"The title of the current Worksheet is: {sheet.title}")
-            print(f"Cells that contain data: {sheet.calculate_dimension()}")
-        data = sheet.values
-        cols = next(data)[:]
-        data = list(data)
-        df = pd.DataFrame(data, columns=cols)
-        return df
-    except Exception:
-        if sheet_name:
-            print(f"Error reading {filename_workbook}, {sheet_name}")
-        else:
-            print(f"Error reading {filename_workbook}")
-        return None
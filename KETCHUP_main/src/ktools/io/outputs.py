@@ -1,7 +1,7 @@
 """
 outputs function
 
-collects basic functions that output results
+collects basic functions that output results and read them back
 
 """
 from pyomo.contrib.pynumero.interfaces.pyomo_nlp import PyomoNLP
@@ -14,7 +14,8 @@ def result_dump(name: str, solnum: int, model, time_solved: float, status: str,
                 data_type_category: str = 'static',
                 mechanism_type_category: str = 'elemental') -> None:
     """
-    Writes solution results to a text file in JSON format.
+    Writes solution results to a text file in JSON format. Experiments whose blocks are deactivated
+    (see select_experiments) are not written.
 
     Parameters
     ----------
@@ -41,6 +42,43 @@ def result_dump(name: str, solnum: int, model, time_solved: float, status: str,
     import json
     
     fn = f"{name}_{str(solnum)}.txt"
+    res = result_values(model, data_type_category, mechanism_type_category)
+    res['time'] = time_solved
+
+    with open(fn, 'w') as json_file:
+        # json.dump(res, json_file)
+        json.dump(res, json_file, sort_keys=True, indent='\t')
+        print(f"Successful export of data into {fn}")
+
+    if status == 'optimal':
+        with open('optimal_solutions.txt', 'a+') as f:
+            f.write(f"iteration {solnum} - SSR {round(float(res['SSR']),3)} - obj value - {round(float(model.obj()),3)} time - {time_solved}\n")
+
+    with open ('total_runs.txt','a+') as f:
+        f.write(f"iteration:{solnum} - status:{status} - time:{time_solved}\n")   
+    return None
+
+
+def result_values(model, data_type_category: str = 'static', mechanism_type_category: str = 'elemental') -> dict:
+    """
+    Collects the values of a model in the result format of result_dump (without the solution time).
+
+    Parameters
+    ----------
+    model : pyomo.core.base.PyomoModel.ConcreteModel
+        The KETCHUP model.
+    data_type_category : str
+        Category of data ('static' or 'dynamic').
+    mechanism_type_category : str
+        Category of rate law mechanism.
+
+    Returns
+    -------
+    dict
+        Kinetic parameters and, by experiment key, block values, errors and the sum of the errors ('SSR').
+    """
+    from pyomo.environ import value
+
     res = {} # results
 
     if mechanism_type_category == 'elemental':
@@ -61,27 +99,34 @@ def result_dump(name: str, solnum: int, model, time_solved: float, status: str,
                 _tmp_kp.update({k:model.kinetic_parameters[item][k].value})
             res_kp.update({item:_tmp_kp})
         res['kp'] = res_kp # k_p
+    elif mechanism_type_category == 'michaelis-menten':
+        res_kp = {}
+        for var in (model.KM_reactants, model.KM_products, model.KM_inhibitors, model.Kcat_f, model.Kcat_r):
+            res_kp[var.local_name] = {k: var[k].value for k in var}
+        res['kp'] = res_kp # k_p
     
-    exp_keys = list(model.data.keys())
+    exp_keys = list(model.EXPERIMENTS)
     
     res_c = {} # compounds (metabolites)
     res_e = {} # enzymes
     res_rate = {} # kinetic rates
     res_SSR = {} # sum of square residuals
     res_time = {} # time
+    res_aux = {'vf': {}, 'vr': {}, 'dcdt': {}} # elemental step rates and derivatives, where present
+    res_error = {} # error of each experiment
     total_error = 0
 
     # loop over experiment blocks
-    for count, key in enumerate(exp_keys):
+    for key in exp_keys:
         #try:
         _tmp_c = {}
         _tmp_e = {}
         _tmp_rate = {}
 
-        if count == 0:
-            cur_exp = model.experiment0
-        else:
-            cur_exp = eval(f"model.experiment{str(count)}")
+        cur_exp = model.experiment[key]
+        if not cur_exp.active:
+            # experiment deselected with select_experiments
+            continue
 
         if data_type_category == 'static':
             for item in cur_exp.c:
@@ -110,22 +155,188 @@ def result_dump(name: str, solnum: int, model, time_solved: float, status: str,
         res_c[key] = _tmp_c
         res_e[key] = _tmp_e
         res_rate[key] = _tmp_rate
+        for name in res_aux:
+            var = cur_exp.component(name)
+            if var is not None:
+                res_aux[name][key] = {str(item): value(var[item], exception=False) for item in var}
+        res_error[key] = cur_exp.error.value
     res['c'] = res_c
     res['e'] = res_e
     res['rate'] = res_rate
+    for name in res_aux:
+        if res_aux[name]:
+            res[name] = res_aux[name]
+    res['error'] = res_error
     res['SSR'] = total_error 
-    res['time'] = time_solved
+    return res
 
-    with open(fn, 'w') as json_file:
-        # json.dump(res, json_file)
-        json.dump(res, json_file, sort_keys=True, indent='\t')
-        print(f"Successful export of data into {fn}")
 
-    if status == 'optimal':
-        with open('optimal_solutions.txt', 'a+') as f:
-            f.write(f"iteration {solnum} - SSR {round(float(total_error),3)} - obj value - {round(float(model.obj()),3)} time - {time_solved}\n")
 
-    with open ('total_runs.txt','a+') as f:
-        f.write(f"iteration:{solnum} - status:{status} - time:{time_solved}\n")   
-    return None
+def _parse_result_index(item: str):
+    """ Converts a stringified variable index of a result file back into its index """
+    import ast
+    try:
+        return ast.literal_eval(item)
+    except (ValueError, SyntaxError):
+        return item
+
+
+def _load_indexed_values(var, values: dict) -> int:
+    """
+    Sets the values of an indexed variable from a result item and returns the number of values set.
+    Indices of time-dependent variables ((time, id) tuples) missing from the result are interpolated
+    linearly in time, so that a result can initialize a model with a different discretization.
+    """
+    stored = {}
+    series = {}
+    for item, value in values.items():
+        if value is None:
+            continue
+        index = _parse_result_index(item)
+        stored[index] = value
+        if isinstance(index, tuple) and len(index) == 2 and isinstance(index[0], (int, float)):
+            series.setdefault(index[1], []).append((index[0], value))
+    series = {k: np.array(sorted(v)) for k, v in series.items()}
+
+    count = 0
+    for index in var:
+        if var[index].fixed:
+            continue
+        if index in stored:
+            value = stored[index]
+        elif isinstance(index, tuple) and len(index) == 2 and index[1] in series:
+            value = float(np.interp(index[0], series[index[1]][:, 0], series[index[1]][:, 1]))
+        else:
+            continue
+        var[index].set_value(value, skip_validation=True)
+        count += 1
+    return count
+
+
+def _calculate_from_constraint(var, constraint) -> None:
+    """ Computes a variable from its defining constraint if all other variables of the constraint have values """
+    from pyomo.core.expr.visitor import identify_variables
+    from pyomo.util.calc_var_value import calculate_variable_from_constraint
+
+    if all(v.value is not None for v in identify_variables(constraint.body) if v is not var):
+        calculate_variable_from_constraint(var, constraint)
+
+
+def result_load(filename: str, model, missing_experiment: str = None) -> dict:
+    """
+    Initializes a KETCHUP model with the values of a result file written by result_dump, so that a refit
+    (e.g., after adding an experiment or changing solver tolerances) starts from a previous solution.
+
+    Kinetic parameters are set by ID and experiment block variables (c, e, rate and, if stored, vf, vr and
+    dcdt) by experiment key. Fixed variables are not changed. Values at time points missing from the file
+    are interpolated in time. Step rates and errors that are not stored are computed from the loaded values.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the result file ('<model_name>_<status>_results_<seed>.txt').
+    model : pyomo.core.base.PyomoModel.ConcreteModel
+        The KETCHUP model to initialize, as created by ketchup_generate_model.
+    missing_experiment : str, optional
+        Key of an experiment in the file whose values initialize experiments of the model that are not in
+        the file. Defaults to None (such experiments keep their initial values).
+
+    Returns
+    -------
+    dict
+        Number of values set for each variable name.
+
+    Raises
+    ------
+    ValueError
+        If the file does not contain results of the mechanism type of the model, or if missing_experiment
+        is not in the file.
+    """
+    import json
+
+    with open(filename) as json_file:
+        res = json.load(json_file)
+
+    counts = result_initialize(res, model, missing_experiment, source=f"result file {filename}")
+
+    print(f"Model initialized from {filename}")
+    return counts
+
+
+def result_initialize(res: dict, model, missing_experiment: str = None, source: str = 'result') -> dict:
+    """
+    Initializes a KETCHUP model with the values of a result dictionary (see result_load and result_values).
+
+    Parameters
+    ----------
+    res : dict
+        Results in the format written by result_dump.
+    model : pyomo.core.base.PyomoModel.ConcreteModel
+        The KETCHUP model to initialize.
+    missing_experiment : str, optional
+        Key of an experiment in the results whose values initialize experiments of the model that are not in
+        the results. Defaults to None (such experiments keep their initial values).
+    source : str, optional
+        Description of the results used in messages. Defaults to 'result'.
+
+    Returns
+    -------
+    dict
+        Number of values set for each variable name.
+
+    Raises
+    ------
+    ValueError
+        If the results are not of the mechanism type of the model, or if missing_experiment is not in them.
+    """
+    from pyomo.environ import Var
+
+    counts = {}
+
+    # kinetic parameters
+    if model.mech_type == 'elemental':
+        if 'kf' not in res:
+            raise ValueError(f"The {source} does not contain elemental rate constants (kf and kr).")
+        kinetic_vars = {'kf': (model.kf, res['kf']), 'kr': (model.kr, res['kr'])}
+    else:
+        if 'kp' not in res:
+            raise ValueError(f"The {source} does not contain kinetic parameters (kp).")
+        kinetic_vars = {}
+        for group, values in res['kp'].items():
+            if model.mech_type == 'custom':
+                var = model.kinetic_parameters.get(group)
+            else:
+                var = model.component(group)
+            if var is None:
+                raise ValueError(f"The {source} contains kinetic parameters '{group}', "
+                                 f"which are not in the {model.mech_type} model.")
+            kinetic_vars[group] = (var, values)
+    for name, (var, values) in kinetic_vars.items():
+        counts[name] = _load_indexed_values(var, values)
+
+    # experiment blocks
+    if missing_experiment is not None and missing_experiment not in res['c']:
+        raise ValueError(f"Experiment {missing_experiment} is not in the {source}.")
+    for key, block in model.experiment.items():
+        result_key = key if key in res['c'] else missing_experiment
+        if result_key is None:
+            print(f"Experiment {key} is not in the {source} and keeps its initial values")
+            continue
+        for name in ('c', 'e', 'rate', 'vf', 'vr', 'dcdt'):
+            var = block.component(name)
+            # elemental rates of the reduced formulation are expressions, not variables
+            if var is None or var.ctype is not Var or name not in res or result_key not in res[name]:
+                continue
+            counts[name] = counts.get(name, 0) + _load_indexed_values(var, res[name][result_key])
+
+        # quantities that are not stored follow from the loaded values
+        if model.mech_type == 'elemental' and 'vf' not in res and model.component('vf_rate') is not None:
+            for es in model.ELEMENTALSTEP_F:
+                _calculate_from_constraint(block.vf[es], model.vf_rate[key, es])
+                _calculate_from_constraint(block.vr[es], model.vr_rate[key, es])
+        if result_key == key and key in res.get('error', {}):
+            block.error.set_value(res['error'][key], skip_validation=True)
+        else:
+            _calculate_from_constraint(block.error, block.compute_error)
 
+    return counts
@@ -91,7 +91,8 @@ def make_valid_sid(sid: str) -> str:
 def v_rate_to_sbml(rate: str, block_id: str) -> str:
     """Returns rate law converted into valid SBML ID attributes for the variables
     """
-    rate = rate[rate.find('  ==  ')+6:] # slice off left side
+    if '  ==  ' in rate:
+        rate = rate[rate.find('  ==  ')+6:] # slice off left side
     rate = rate.replace(block_id+'.','') # remove block id
     
     # assume that each term is multipled with k being the first
@@ -115,7 +116,7 @@ def v_rate_to_sbml(rate: str, block_id: str) -> str:
 def create_sbml_kinetic_model(pyomo_model: pyomo.core.base.PyomoModel.ConcreteModel,
                               block_id: int = 1) -> str:
     """Returns complete SBML Level 3 model of the kinetic parameterization
-    at the solution.
+    at the solution, with the state of experiment number block_id (1 is the first).
     """
     # First create empty SBMLDocument object
  
@@ -160,7 +161,8 @@ def create_sbml_kinetic_model(pyomo_model: pyomo.core.base.PyomoModel.ConcreteMo
     # Output WT solution
     # TODO: extend to other blocks
     
-    cur_exp = pyomo_model.block_list.at(1) # pyomo_model.experiment0
+    exp_key = pyomo_model.EXPERIMENTS.at(block_id)
+    cur_exp = pyomo_model.experiment[exp_key]
     
     # Create species inside the model
     
@@ -284,11 +286,19 @@ def create_sbml_kinetic_model(pyomo_model: pyomo.core.base.PyomoModel.ConcreteMo
             # Set the reaction rate expression (the SBML "kinetic law")
             rxn_id = f"{row['rxn ID']}_{row['step ID']}"
             
-            output_vf = v_rate_to_sbml(str(pyomo_model.vf_rate[cur_exp,rxn_id].expr), cur_exp.name)
+            if pyomo_model.component('vf_rate') is not None:
+                _vf_expr = pyomo_model.vf_rate[exp_key,rxn_id].expr
+                _vr_expr = pyomo_model.vr_rate[exp_key,rxn_id].expr
+            else:
+                # reduced elemental formulation, rates are block expressions
+                _vf_expr = cur_exp.vf[rxn_id].expr
+                _vr_expr = cur_exp.vr[rxn_id].expr
+
+            output_vf = v_rate_to_sbml(str(_vf_expr), cur_exp.name)
             if output_vf == '':
                 output_vf = '0'
         
-            output_vr = v_rate_to_sbml(str(pyomo_model.vr_rate[cur_exp,rxn_id].expr), cur_exp.name)
+            output_vr = v_rate_to_sbml(str(_vr_expr), cur_exp.name)
             if output_vr == '':
                 output_vr = '0'
         
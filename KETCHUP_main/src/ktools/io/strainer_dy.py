@@ -7,8 +7,8 @@ Currently only supports experimental data import.
 """
 
 import pandas as pd
-import openpyxl
 from .dataframes import parse_strainer_dy_data_df
+from .workbook import iter_xlsx_sheets
 
 def read_strainer_data_xlsx(filename_data: str, data_headers: str or dict = None,
                             data_type: str = 'dynamic', debug: bool = False) -> pd.DataFrame:
@@ -45,12 +45,10 @@ def read_strainer_data_xlsx(filename_data: str, data_headers: str or dict = None
             warnings.warn("Warning: strainer requires externally supplied headers of dynamic data in json format.")
             return
         else:
-            import openpyxl
-            workbook = openpyxl.load_workbook(filename=filename_data, data_only=True)
             flag_first_sheet = True
-            for sheetname in workbook.sheetnames:
+            # all sheets are streamed from a single opening of the workbook
+            for sheetname, dy_df_dat in iter_xlsx_sheets(filename_data, debug=debug):
                 #print(sheetname)
-                dy_df_dat = _xlsx_to_df(filename_data, sheetname, debug=debug)
 
                 if debug: print(sheetname, dy_df_dat)
 
@@ -119,33 +117,3 @@ def read_strainer_data_xlsx(filename_data: str, data_headers: str or dict = None
     df_data = parse_strainer_dy_data_df(df_composite, debug=debug)
 
     return df_data
-
-# TODO: following is same as the one in kfit_ss.py, so consider creating a unified function in utils
-def _xlsx_to_df(filename_workbook, sheet_name=None, debug=False):
-    try:
-        df = pd.DataFrame()
-        if debug:
-            print(f"Beginning to read file {filename_workbook}")
-        # Note that 'data_only=True' reads the results for formulae
-        #   instead of the formulae (default)
-        workbook = openpyxl.load_workbook(filename=filename_workbook, data_only=True)
-        if sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-        elif sheet_name == None:
-            sheet = workbook[workbook.sheetnames[0]]
-        if debug:
-            print(f"Spreadsheet name: {filename_workbook}")
-            print(f"Worksheet names: {workbook.sheetnames}")
-            print(f"The title of the current Worksheet is: {sheet.title}")
-            print(f"Cells that contain data: {sheet.calculate_dimension()}")
-        data = sheet.values
-        cols = next(data)[:]
-        data = list(data)
-        df = pd.DataFrame(data, columns=cols)
-        return df
-    except Exception:
-        if sheet_name:
-            print(f"Error reading {filename_workbook}, {sheet_name}")
-        else:
-            print(f"Error reading {filename_workbook}")
-        return None
@@ -0,0 +1,100 @@
+"""
+Workbook import.
+
+Shared reader of xlsx workbooks used by the spreadsheet importers. Each workbook is opened once in
+read-only (streaming) mode, and its sheets are read into pandas DataFrames.
+
+"""
+from typing import Iterator
+
+import openpyxl
+import pandas as pd
+
+
+def iter_xlsx_sheets(filename_workbook: str, sheet_names: list[str] = None,
+                     debug: bool = False) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Opens a workbook once and yields its sheets as DataFrames, using the first row of each sheet as the header.
+
+    Parameters
+    ----------
+    filename_workbook : str
+        The filename of the xlsx workbook.
+    sheet_names : list[str], optional
+        Names of the sheets to read, in the order to yield them. Defaults to None (all sheets, in workbook order).
+    debug : bool, optional
+        If True, prints debugging messages. Defaults to False.
+
+    Yields
+    ------
+    tuple[str, pd.DataFrame]
+        The sheet name and a DataFrame with the sheet contents.
+
+    Raises
+    ------
+    KeyError
+        If a requested sheet is not in the workbook.
+    """
+    if debug:
+        print(f"Beginning to read file {filename_workbook}")
+    # Note that 'data_only=True' reads the results for formulae
+    #   instead of the formulae (default)
+    workbook = openpyxl.load_workbook(filename=filename_workbook, read_only=True, data_only=True)
+    try:
+        if debug:
+            print(f"Spreadsheet name: {filename_workbook}")
+            print(f"Worksheet names: {workbook.sheetnames}")
+        for sheet_name in (workbook.sheetnames if sheet_names is None else sheet_names):
+            sheet = workbook[sheet_name]
+            if sheet.max_row is None:
+                # dimensions not stored in the file, so they are found by reading the sheet
+                sheet.reset_dimensions()
+                sheet.calculate_dimension(force=True)
+            if debug:
+                print(f"The title of the current Worksheet is: {sheet.title}")
+                print(f"Cells that contain data: {sheet.calculate_dimension()}")
+            rows = sheet.values
+            cols = next(rows, ())
+            yield sheet_name, pd.DataFrame(list(rows), columns=cols)
+    finally:
+        workbook.close()
+
+
+def read_xlsx_sheets(filename_workbook: str, sheet_names: list[str] = None,
+                     debug: bool = False) -> dict[str, pd.DataFrame]:
+    """
+    Opens a workbook once and reads its sheets into DataFrames.
+
+    Parameters
+    ----------
+    filename_workbook : str
+        The filename of the xlsx workbook.
+    sheet_names : list[str], optional
+        Names of the sheets to read. Defaults to None (all sheets).
+    debug : bool, optional
+        If True, prints debugging messages. Defaults to False.
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        DataFrames by sheet name, in the order of sheet_names or of the workbook.
+    """
+    return dict(iter_xlsx_sheets(filename_workbook, sheet_names, debug=debug))
+
+
+def _xlsx_to_df(filename_workbook, sheet_name=None, debug=False):
+    """ Reads one sheet (the first if sheet_name is None) into a DataFrame, or returns None on error """
+    try:
+        if sheet_name is None:
+            sheets = iter_xlsx_sheets(filename_workbook, debug=debug)
+            try:
+                return next(sheets)[1]
+            finally:
+                sheets.close()
+        return read_xlsx_sheets(filename_workbook, [sheet_name], debug=debug)[sheet_name]
+    except Exception:
+        if sheet_name:
+            print(f"Error reading {filename_workbook}, {sheet_name}")
+        else:
+            print(f"Error reading {filename_workbook}")
+        return None
@@ -2,10 +2,18 @@
 models.
 """
 
+from .ketchup import ketchup_read_inputs
 from .ketchup import ketchup_generate_model
 from .ketchup import solve_ketchup_model
+from .ketchup import solve_ketchup_model_adaptive
 from .ketchup import ketchup_output_write
 from .ketchup import ketchup_argument_parser
+from .ketchup import ketchup_phase_timer
+from .multistart import ketchup_multistart
+from .shooting import solve_ketchup_model_shooting
+from .decomposition import solve_ketchup_model_decomposed
+from .decomposition import kinetic_parameter_components
+from .persistent import PersistentIpopt
 from .analysis import evaluate_stability
 from .analysis import infeasible_constraints
 
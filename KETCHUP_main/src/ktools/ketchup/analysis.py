@@ -82,8 +82,17 @@ def evaluate_stability(mech_df: pd.DataFrame, experiments: list, solnum: int,
     Returns
     -------
     None
+
+    Raises
+    ------
+    ValueError
+        If the model uses the reduced elemental formulation, which has no elemental rate constraints.
     """
 
+    if pyomo_model.component('vf_rate') is None:
+        raise ValueError("Stability evaluation requires the full elemental formulation "
+                         "(option 'elemental_formulation' set to 'full').")
+
     nlp = PyomoNLP(pyomo_model)
     m = nlp.evaluate_jacobian().toarray() 
     #h = nlp.evaluate_hessian_lag().todense()
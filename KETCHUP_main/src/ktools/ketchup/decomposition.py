@@ -0,0 +1,301 @@
+"""
+KETCHUP decomposition
+
+solves KETCHUP problems by consensus ADMM on the kinetic parameters, the only variables shared by the
+experiment blocks. Each experiment is solved by IPOPT in a worker process, on a model built for that experiment
+only, and the copies are coordinated through the average of their kinetic parameters.
+
+"""
+import numpy as np
+import pyomo.environ
+import pyomo.opt
+
+# models of the worker process by experiment, set once by the process initializer
+_worker_models = {}
+_worker_options = None
+
+
+def kinetic_parameter_components(ketchup_model: pyomo.environ.ConcreteModel) -> list:
+    """
+    Returns the kinetic parameter variables of a KETCHUP model, which are shared by all experiment blocks.
+
+    Parameters
+    ----------
+    ketchup_model : pyomo.environ.ConcreteModel
+        A KETCHUP Pyomo model.
+
+    Returns
+    -------
+    list
+        The indexed variables of the kinetic parameters (kf and kr, the KM and Kcat variables, or the custom
+        rate law constants).
+    """
+    if ketchup_model.mech_type == 'elemental':
+        return [ketchup_model.kf, ketchup_model.kr]
+    elif ketchup_model.mech_type == 'michaelis-menten':
+        return [ketchup_model.KM_reactants, ketchup_model.KM_products, ketchup_model.KM_inhibitors,
+                ketchup_model.Kcat_f, ketchup_model.Kcat_r]
+    return list(ketchup_model.kinetic_parameters.values())
+
+
+def _shared_parameters(ketchup_model) -> list:
+    """ Unfixed kinetic parameter variables of a model, in a fixed order """
+    return [var[index] for var in kinetic_parameter_components(ketchup_model) for index in var
+            if not var[index].fixed]
+
+
+def _block_variables(block) -> list:
+    """ Variables of an experiment block, in a fixed order """
+    return list(block.component_data_objects(pyomo.environ.Var, sort=True))
+
+
+def _init_worker(ketchup_options: dict, ketchup_inputs: dict, keys: list, reference_id) -> None:
+    """
+    Builds the models of the worker process, one per experiment of keys with only the block of that experiment,
+    and adds the penalty parameters of the subproblems. Only the model of the reference experiment keeps the
+    basis constraints, as in the full model.
+    """
+    import io
+    import contextlib
+    from pyomo.environ import Param, RangeSet
+    from ktools.ketchup import ketchup_generate_model
+
+    global _worker_options
+    _worker_options = ketchup_options
+    for key in keys:
+        inputs = dict(ketchup_inputs, data_dict={key: ketchup_inputs['data_dict'][key]})
+        if ketchup_inputs.get('time_delay') is not None:
+            inputs['time_delay'] = {key: ketchup_inputs['time_delay'][key]}
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = ketchup_generate_model(dict(ketchup_options, basis_id=key), inputs)
+        if key != reference_id and model.component('ref_conc_constraint') is not None:
+            model.ref_conc_constraint.deactivate()
+            for rxn in inputs['data_dict'][key]:
+                model.experiment[key].rate[rxn].unfix()
+        n_parameters = len(_shared_parameters(model))
+        model.CONSENSUS = RangeSet(0, n_parameters - 1)
+        model.consensus_target = Param(model.CONSENSUS, mutable=True, initialize=0.0)
+        model.consensus_scale = Param(model.CONSENSUS, mutable=True, initialize=1.0)
+        model.consensus_rho = Param(mutable=True, initialize=0.0)
+        _worker_models[key] = model
+
+
+def _solve_experiment(key, parameters: list, block_values: list, target: list | None, scale: list, rho: float,
+                      warm_start: bool) -> dict:
+    """
+    Solves the subproblem of experiment key in the worker. With a target, the subproblem minimizes the error
+    of the experiment plus the penalty rho/2 * sum((p/scale - target)**2) on the kinetic parameters p.
+    Without a target, the kinetic parameters are fixed at the given values and only the block is solved.
+    """
+    model = _worker_models[key]
+    block = model.experiment[key]
+
+    shared = _shared_parameters(model)
+    for var, value in zip(shared, parameters):
+        var.set_value(value, skip_validation=True)
+    for var, value in zip(_block_variables(block), block_values):
+        if not var.fixed:
+            var.set_value(value, skip_validation=True)
+
+    if target is None:
+        for var in shared:
+            var.fix()
+    else:
+        for i, var in enumerate(shared):
+            var.unfix()
+            model.consensus_target[i] = target[i]
+            model.consensus_scale[i] = scale[i]
+        model.consensus_rho = rho
+        model.obj.expr = block.error + model.consensus_rho / 2 * sum(
+            (var / model.consensus_scale[i] - model.consensus_target[i])**2 for i, var in enumerate(shared))
+
+    solver = pyomo.opt.SolverFactory('ipopt')
+    solver.options.option_file_name = _worker_options['filename_solver_opt']
+    if warm_start:
+        # keep the previous solution close to its values; the solver options file takes precedence
+        solver.options['bound_push'] = 1e-8
+        solver.options['bound_frac'] = 1e-8
+    try:
+        results = solver.solve(model, tee=False, load_solutions=False)
+        status = str(results.solver.termination_condition)
+        if len(results.solution) > 0:
+            model.solutions.load_from(results)
+    except (ValueError, RuntimeError) as err:
+        status = f"error: {err}"
+    finally:
+        for var in shared:
+            var.unfix()
+
+    return {'key': key, 'status': status,
+            'parameters': [var.value for var in shared],
+            'block_values': [var.value for var in _block_variables(block)],
+            'error': block.error.value}
+
+
+def solve_ketchup_model_decomposed(ketchup_model: pyomo.environ.ConcreteModel,
+                                   ketchup_options: dict[str, str | bool | int | None],
+                                   ketchup_inputs: dict = None) -> pyomo.opt.results.results_.SolverResults:
+    """
+    Solves a KETCHUP model by consensus ADMM over its experiments. Each active experiment block is solved
+    with its own copy of the kinetic parameters, in parallel by worker processes, with a quadratic penalty
+    that pulls the copies towards their average (the consensus). The kinetic parameters are scaled in the
+    penalty by the magnitude of their consensus, starting from their initial values, and the penalty
+    parameter, starting from 'decomposition_rho', is halved or doubled when the primal or dual residual
+    exceeds the other by a factor of 10. When the copies agree within 'decomposition_tolerance' (in scaled
+    units), or after 'decomposition_max_iterations' iterations, the experiment blocks are solved once more with the
+    kinetic parameters fixed at the consensus, and the solution is set in the model.
+
+    The experiments are divided among at most 'processes' worker processes. Each worker builds, with
+    ketchup_generate_model from ketchup_options and ketchup_inputs, one model per experiment of its share that
+    holds only the block of that experiment, so that all experiments are built once over all workers. The
+    options and inputs must therefore be those of ketchup_model. The workers start from the values of
+    ketchup_model.
+
+    Parameters
+    ----------
+    ketchup_model : pyomo.environ.ConcreteModel
+        The Pyomo ConcreteModel representing the kinetic model, as created by ketchup_generate_model.
+    ketchup_options : dict[str, str | bool | int | None]
+        A valid KETCHUP option dictionary. Uses the items 'decomposition_rho', 'decomposition_tolerance',
+        'decomposition_max_iterations' and 'processes', and the solver option file.
+    ketchup_inputs : dict, optional
+        Parsed inputs from ketchup_read_inputs. If None, the inputs ketchup_model was created from are used.
+        Defaults to None.
+
+    Returns
+    -------
+    pyomo.opt.results.results_.SolverResults
+        Results with solver status and termination condition: 'optimal' if the consensus was reached and the
+        final solves of all experiments are optimal, 'maxIterations' if the consensus was not reached, or
+        the termination condition of a final solve that is not optimal.
+
+    Raises
+    ------
+    ValueError
+        If the models of the workers do not have the structure of ketchup_model.
+    """
+    import os
+    import contextlib
+    from concurrent.futures import ProcessPoolExecutor
+    if ketchup_inputs is None:
+        # the inputs the model was created from; only dynamic models have time delays by experiment
+        time_delay = getattr(ketchup_model, 'tde', None)
+        ketchup_inputs = {'m_model': ketchup_model.m_model, 'mech_df': ketchup_model.mech_df,
+                          'data_dict': ketchup_model.data,
+                          'time_delay': time_delay if isinstance(time_delay, dict) else None}
+    processes = ketchup_options.get('processes') or os.cpu_count()
+    rho = float(ketchup_options.get('decomposition_rho', 1.0))
+    tol = float(ketchup_options.get('decomposition_tolerance', 1e-4))
+    max_iterations = max(int(ketchup_options.get('decomposition_max_iterations', 100)), 1)
+
+    # the workers take their values from the model and do not load a warm start file again
+    options = dict(ketchup_options, filename_warm_start=None)
+    if options.get('filename_solver_opt'):
+        options['filename_solver_opt'] = os.path.abspath(options['filename_solver_opt'])
+
+    shared = _shared_parameters(ketchup_model)
+    keys = [key for key, b in ketchup_model.experiment.items() if b.active]
+    scale = np.array([max(abs(pyomo.environ.value(var, exception=False) or 0.0), 1e-3) for var in shared])
+    theta = {key: np.array([pyomo.environ.value(var, exception=False) or 0.0 for var in shared]) for key in keys}
+    block_values = {key: [var.value for var in _block_variables(ketchup_model.experiment[key])] for key in keys}
+    z = theta[keys[0]] / scale
+    u = {key: np.zeros(len(shared)) for key in keys}
+    n_block_values = {key: len(values) for key, values in block_values.items()}
+
+    def update(record):
+        """ Stores the values of a subproblem solution """
+        if len(record['parameters']) != len(shared) or len(record['block_values']) != n_block_values[record['key']]:
+            raise ValueError(f"The worker model of experiment {record['key']} does not have the structure of "
+                             f"the model.")
+        theta[record['key']] = np.array([np.nan if v is None else v for v in record['parameters']], dtype=float)
+        block_values[record['key']] = record['block_values']
+
+    # each worker keeps the models of its experiments, so every experiment is always solved by the same worker
+    n_workers = min(processes, len(keys))
+    groups = [keys[i::n_workers] for i in range(n_workers)]
+    reference_id = getattr(ketchup_model, 'reference_id', ketchup_model.EXPERIMENTS.first())
+
+    flag_consensus = False
+    with contextlib.ExitStack() as stack:
+        executor = {}
+        for group in groups:
+            group_inputs = dict(ketchup_inputs, data_dict={key: ketchup_inputs['data_dict'][key] for key in group})
+            worker = stack.enter_context(ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                                                             initargs=(options, group_inputs, group, reference_id)))
+            executor.update({key: worker for key in group})
+
+        for iteration in range(max_iterations):
+            futures = [executor[key].submit(_solve_experiment, key, list(theta[key]), block_values[key],
+                                            list(z - u[key]), list(scale), rho, iteration > 0) for key in keys]
+            records = [future.result() for future in futures]
+            for record in records:
+                update(record)
+
+            # consensus of the scaled parameters, within their bounds
+            z_previous = z
+            x = {key: np.nan_to_num(theta[key] / scale, nan=z_previous) for key in keys}
+            z = np.mean([x[key] + u[key] for key in keys], axis=0)
+            z = np.clip(z, [-np.inf if var.lb is None else var.lb / s for var, s in zip(shared, scale)],
+                        [np.inf if var.ub is None else var.ub / s for var, s in zip(shared, scale)])
+            for key in keys:
+                u[key] += x[key] - z
+            primal = np.sqrt(sum(np.sum((x[key] - z)**2) for key in keys))
+            dual = rho * np.sqrt(len(keys)) * np.linalg.norm(z - z_previous)
+            error = sum(record['error'] or 0.0 for record in records)
+            print(f"ADMM iteration {iteration + 1}: error {error:.6g}, primal residual {primal:.3g}, "
+                  f"dual residual {dual:.3g}, statuses {sorted({r['status'] for r in records})}", flush=True)
+            if primal <= tol * np.sqrt(len(keys) * len(shared)) and dual <= tol * np.sqrt(len(keys) * len(shared)):
+                flag_consensus = True
+                break
+
+            # balance the residuals by adapting the penalty, keeping the multipliers rho * u
+            if primal > 10 * dual or dual > 10 * primal:
+                rho_factor = 2.0 if primal > dual else 0.5
+                rho *= rho_factor
+                for key in keys:
+                    u[key] = u[key] / rho_factor
+
+            # rescale the parameters whose consensus moved away from their scale by more than a factor of 2,
+            # keeping the multipliers rho * u / scale of the unscaled parameters
+            scale_new = np.maximum(np.abs(z * scale), 1e-3)
+            factor = np.where((scale_new > 2 * scale) | (scale_new < scale / 2), scale_new / scale, 1.0)
+            scale = scale * factor
+            z = z / factor
+            for key in keys:
+                u[key] = u[key] * factor
+
+        # the blocks are solved once more for the consensus parameters
+        parameters = list(z * scale)
+        futures = [executor[key].submit(_solve_experiment, key, parameters, block_values[key], None, list(scale),
+                                        rho, True) for key in keys]
+        records = [future.result() for future in futures]
+        for record in records:
+            update(record)
+
+    # set the solution in the model
+    for var, value in zip(shared, parameters):
+        var.set_value(float(value), skip_validation=True)
+    for key in keys:
+        for var, value in zip(_block_variables(ketchup_model.experiment[key]), block_values[key]):
+            if not var.fixed and value is not None:
+                var.set_value(value, skip_validation=True)
+
+    results = pyomo.opt.SolverResults()
+    statuses = [record['status'] for record in records]
+    failed = [status for status in statuses if status != 'optimal']
+    if failed:
+        results.solver.status = pyomo.opt.SolverStatus.warning
+        try:
+            results.solver.termination_condition = pyomo.opt.TerminationCondition(failed[0])
+        except ValueError:
+            results.solver.termination_condition = pyomo.opt.TerminationCondition.error
+    elif not flag_consensus:
+        results.solver.status = pyomo.opt.SolverStatus.warning
+        results.solver.termination_condition = pyomo.opt.TerminationCondition.maxIterations
+    else:
+        results.solver.status = pyomo.opt.SolverStatus.ok
+        results.solver.termination_condition = pyomo.opt.TerminationCondition.optimal
+    results.solver.message = (f"ADMM {'converged' if flag_consensus else 'stopped'} after {iteration + 1} "
+                              f"iterations over {len(keys)} experiments")
+    print(f"Decomposition: {results.solver.message}. Objective {pyomo.environ.value(ketchup_model.obj):.6g}")
+    return results
@@ -7,6 +7,7 @@ collects primary functions for working with KETCHUP-specific models
 import pyomo.core.base
 from argparse import Namespace
 import os
+from ktools.util import timed
 
 
 def ketchup_argument_parser() -> Namespace:
@@ -31,6 +32,17 @@ def ketchup_argument_parser() -> Namespace:
                         default=None, required=False)
     parser.add_argument("-tde", "--time-delay", help="Value of time delay in simulations. Units follow data",
                         default=None, required=False)
+    parser.add_argument("-ms", "--multistart", help="Number of starts (consecutive seeds beginning at the seed value) "
+                                                    "to solve in parallel",
+                        default=None, required=False)
+    parser.add_argument("-np", "--processes", help="Number of worker processes for multistart runs",
+                        default=None, required=False)
+    parser.add_argument("-ws", "--warm-start", help="Filename of a KETCHUP result file to initialize the model with",
+                        default=None, required=False)
+    parser.add_argument("-t", "--timing", help="Write the times of the phases of the run to a JSON file",
+                        action='store_true', required=False)
+    parser.add_argument("-pr", "--profile", help="Also profile the run with cProfile",
+                        action='store_true', required=False)
 
     args = parser.parse_args()
 
@@ -55,7 +67,7 @@ def ketchup_process_model_options(data: dict) -> dict:
     # preprocess model options
     for key, value in data.items():
         # expand current directory if absolute path not used
-        if key in ('directory_model', 'directory_data', 'directory_output'):
+        if key in ('directory_model', 'directory_data', 'directory_output', 'directory_cache'):
             try:
                 if (value == ".") or (value.startswith("./")):
                     value = os.path.join(os.getcwd(), value[2:])
@@ -105,13 +117,41 @@ def ketchup_model_options(user_options: dict[str, str | bool | int | None] = Non
         'directory_output': os.getcwd(),  # location of output files
         'model_name': "k-model",  # used in output
         'mechanism_type': "elemental",  # rate law to follow
+        'elemental_formulation': "full",  # full (elemental rate variables) or reduced (rate expressions)
         # secondary items  (model solution)
         'debug': False,  # flag to print additional runtime output
         'flag_output_sbml': False,  # flag to output results to SBML file
+        'flag_cache_inputs': False,  # flag to cache parsed model and mechanism files
+        'flag_block_template': True,  # flag to build static experiment blocks from a shared template
+        'directory_cache': None,  # location of the input cache. None uses the per-user cache directory
         'seedvalue': 0, # integer or "time" to use clock time
         'distribution': "uniform",  # distribution for initialization
+        'initial_scale': None,  # upper value of initial rate constants. None uses the mechanism default
+        'start_design': "random",  # design of multistart initializations: random, lhs or sobol
         'filename_solver_opt': None,  # file for solver options
         'time_delay': 0, # time-delay of beginning of simulations; can be int, float, dict or list
+        'discretization_method': "finite_difference", # time discretization of dynamic models: finite_difference or collocation
+        'discretization_scheme': None, # None uses BACKWARD (finite_difference) or LAGRANGE-RADAU (collocation)
+        'discretization_nfe': None, # finite elements per experiment. None uses two per data point
+        'discretization_ncp': 3, # collocation points per finite element
+        'discretization_adaptive': False, # flag to refine finite elements by estimated error after solving
+        'discretization_tolerance': 1e-3, # estimated relative error of a finite element above which it is refined
+        'discretization_max_refinements': 3, # number of refinements of an adaptive solve
+        'estimation_method': "simultaneous", # simultaneous (one IPOPT solve), decomposition (by experiment) or shooting (dynamic data)
+        'shooting_integrator': "BDF", # integration method of scipy.integrate.solve_ivp for shooting
+        'shooting_rtol': 1e-6, # relative tolerance of the shooting integration
+        'shooting_atol': 1e-9, # absolute tolerance of the shooting integration
+        'shooting_max_nfev': None, # maximum number of shooting function evaluations. None uses the scipy default
+        'solver_interface': "executable", # executable (IPOPT process with NL files) or in_process (cyipopt, NLP kept between solves)
+        'flag_symbolic_labels': None, # flag to write NL files with the names of the model components. None follows 'debug'
+        'decomposition_rho': 1.0, # initial penalty parameter of the consensus on the scaled kinetic parameters
+        'decomposition_tolerance': 1e-4, # consensus residual (scaled kinetic parameters) for convergence
+        'decomposition_max_iterations': 100, # maximum number of consensus iterations
+        'multistart': 1, # number of starts (seeds) to solve; more than 1 runs them in a process pool
+        'processes': None, # number of worker processes for multistart runs. None uses the number of CPUs
+        'filename_warm_start': None, # result file of a previous fit used to initialize the model
+        'flag_timing': False, # flag to write the times of the phases of the run and the model size to a JSON file
+        'flag_profile': False, # flag to also profile the run with cProfile
     }
 
         # update items based on passed dictionary
@@ -213,12 +253,40 @@ def ketchup_model_options(user_options: dict[str, str | bool | int | None] = Non
     except AttributeError:
         pass
 
+    # warm-start result file from argument
+    try:
+        if cmd_args.warm_start:
+            model_options['filename_warm_start'] = str(cmd_args.warm_start)
+    except AttributeError:
+        pass
+
+    # multistart items from arguments
+    try:
+        if cmd_args.multistart:
+            model_options['multistart'] = int(cmd_args.multistart)
+        if cmd_args.processes:
+            model_options['processes'] = int(cmd_args.processes)
+    except AttributeError:
+        pass
+
+    # timing and profiling from arguments
+    try:
+        if cmd_args.timing:
+            model_options['flag_timing'] = True
+        if cmd_args.profile:
+            model_options['flag_profile'] = True
+    except AttributeError:
+        pass
+
     return model_options
 
 
-def ketchup_generate_model(ketchup_options: dict[str, str | bool | int | None]) -> pyomo.core.base.PyomoModel.ConcreteModel:
+@timed('read_inputs')
+def ketchup_read_inputs(ketchup_options: dict[str, str | bool | int | None]) -> dict:
     """
-    Generates a Pyomo Concrete Model for subsequent computations and analysis by processing the contents of the program options.
+    Reads and parses the model, mechanism and data files named in the program options. The result can be
+    passed to ketchup_generate_model to build any number of models (e.g., one per seed) without
+    re-reading the files.
 
     Parameters
     ----------
@@ -227,51 +295,61 @@ def ketchup_generate_model(ketchup_options: dict[str, str | bool | int | None])
 
     Returns
     -------
-    pyomo.core.base.PyomoModel.ConcreteModel
-        A KETCHUP Pyomo ConcreteModel object.
+    dict
+        Dictionary with the COBRApy model ('m_model'), mechanism DataFrame ('mech_df'), data dictionary
+        ('data_dict') and, for dynamic data, time delays by experiment ('time_delay').
     """
 
-    import pyomo.environ
-    from pyomo.environ import Constraint, Block, Objective
-    import cobra.core
-    import ktools
-    from ktools.core import create_data_dict, create_dynamic_data_dict, parse_time_delay, create_initial_model
-    from ktools.io import read_kfit_model_xlsx
+    from ktools.core import create_data_dict, create_dynamic_data_dict, parse_time_delay
+    from ktools.io import read_kfit_model_xlsx, default_cache_directory
     from ktools.io import read_kfit_data_xlsx, read_flat_data, read_strainer_data_xlsx
+    from ktools.util import phase
     from os.path import join
 
-    # read model and mechanism files
+    dict_tde = None
+
+    # read model and mechanism files, or their parsed form from the cache
+    cache_dir = None
+    if ketchup_options.get('flag_cache_inputs'):
+        cache_dir = ketchup_options.get('directory_cache') or default_cache_directory()
     if ketchup_options['input_format'].lower() in ("kfit", "k-fit"):
         m_model, mech_df = read_kfit_model_xlsx(join(ketchup_options['directory_model'],
                                                      ketchup_options['filename_model']),
                                                 join(ketchup_options['directory_model'],
                                                      ketchup_options['filename_mechanism']),
                                                 mech_type=ketchup_options['mechanism_type'],
-                                                debug=ketchup_options['debug'])
+                                                debug=ketchup_options['debug'],
+                                                cache_dir=cache_dir)
     else:
         raise ValueError(f"Invalid input format. Currently only supports K-FIT style model files.")
 
     if ketchup_options['data_type'].lower() in ("static"):
         if ketchup_options['data_format'].lower() in ("kfit", "k-fit"):
-            data_df = read_kfit_data_xlsx(join(ketchup_options['directory_data'],
-                                               ketchup_options['filename_data']))
-            data_dict = create_data_dict(data_df)
+            with phase('read_data_files'):
+                data_df = read_kfit_data_xlsx(join(ketchup_options['directory_data'],
+                                                   ketchup_options['filename_data']))
+            with phase('create_data_dict'):
+                data_dict = create_data_dict(data_df, ketchup_options['data_selection'])
         elif ketchup_options['data_format'].lower() in ("custom"):
             raise ValueError(f"Currently static only supports K-FIT style.")
         else:
             raise ValueError(f"Invalid data format. Currently static only supports K-FIT style.")
     elif ketchup_options['data_type'].lower() in ("dynamic"):
         if ketchup_options['data_format'].lower() in ("flat"):
-            data_df = read_flat_data(join(ketchup_options['directory_data'],
-                                          ketchup_options['filename_data']), "dynamic")
-            data_dict = create_dynamic_data_dict(data_df, ketchup_options['data_selection'])
+            with phase('read_data_files'):
+                data_df = read_flat_data(join(ketchup_options['directory_data'],
+                                              ketchup_options['filename_data']), "dynamic")
+            with phase('create_data_dict'):
+                data_dict = create_dynamic_data_dict(data_df, ketchup_options['data_selection'])
         elif ketchup_options['data_format'].lower() in ("strainer"):
             if not ketchup_options['data_strainer_header']:
                 raise ValueError(f"Strainer requires definition of header dictionary.")
-            data_df = read_strainer_data_xlsx(join(ketchup_options['directory_data'],
-                                                   ketchup_options['filename_data']),
-                                              ketchup_options['data_strainer_header'])
-            data_dict = create_dynamic_data_dict(data_df, ketchup_options['data_selection'])
+            with phase('read_data_files'):
+                data_df = read_strainer_data_xlsx(join(ketchup_options['directory_data'],
+                                                       ketchup_options['filename_data']),
+                                                  ketchup_options['data_strainer_header'])
+            with phase('create_data_dict'):
+                data_dict = create_dynamic_data_dict(data_df, ketchup_options['data_selection'])
         elif ketchup_options['data_format'].lower() in ("custom"):
             raise ValueError(f"Custom not yet implemented.")
         elif ketchup_options['data_format'].lower() in ("kfit", "k-fit"):
@@ -280,116 +358,178 @@ def ketchup_generate_model(ketchup_options: dict[str, str | bool | int | None])
             raise ValueError(f"Unknown dynamic data format.")
         #print (data_dict)
 
-        # create time delay in format for use with the data stream
-        dict_tde = parse_time_delay(ketchup_options['time_delay'], data_dict.keys())
+        # create time delay in format for use with the data stream. A list gives the time delays of all
+        #   experiments in the data, of which those of the selected experiments are used
+        tde_keys = list(data_dict.keys())
+        if isinstance(ketchup_options['time_delay'], list):
+            tde_keys = data_df.loc[2:, 'experiment ID'].unique().tolist()
+        dict_tde = parse_time_delay(ketchup_options['time_delay'], tde_keys)
+        dict_tde = {k: dict_tde[k] for k in data_dict}
 
         print ("End of dynamic data parsing")
 
     else:
         raise ValueError(f'Invalid data type. Currently only supports "static" and "dynamic".')
 
+    return {'m_model': m_model, 'mech_df': mech_df, 'data_dict': data_dict, 'time_delay': dict_tde}
 
-    if ketchup_options['data_type'].lower() in ("static"):
-        ketchup_model = create_initial_model(m_model, mech_df, data_dict,
-                                             seedvalue=ketchup_options['seedvalue'],
-                                             distribution=ketchup_options['distribution'],
-                                             mech_type=ketchup_options['mechanism_type'])
-    elif ketchup_options['data_type'].lower() in ("dynamic"):
-        ketchup_model = create_initial_model(m_model, mech_df, data_dict,
-                                             seedvalue=ketchup_options['seedvalue'],
-                                             distribution=ketchup_options['distribution'],
-                                             tde=dict_tde,
-                                             mech_type=ketchup_options['mechanism_type'])
+
+@timed('generate_model')
+def ketchup_generate_model(ketchup_options: dict[str, str | bool | int | None],
+                           ketchup_inputs: dict = None) -> pyomo.core.base.PyomoModel.ConcreteModel:
+    """
+    Generates a Pyomo Concrete Model for subsequent computations and analysis by processing the contents of the program options.
+
+    Parameters
+    ----------
+    ketchup_options : dict[str, str | bool | int | None]
+        A valid KETCHUP option dictionary containing the processed KETCHUP options that define the problem to solve.
+    ketchup_inputs : dict, optional
+        Parsed inputs from ketchup_read_inputs. If None, the input files are read. Defaults to None.
+
+    Returns
+    -------
+    pyomo.core.base.PyomoModel.ConcreteModel
+        A KETCHUP Pyomo ConcreteModel object.
+    """
+
+    import pyomo.environ
+    from pyomo.environ import Constraint, Block, Objective, Expression
+    import cobra.core
+    import ktools
+    from ktools.core import create_initial_model
+    from ktools.util import phase
+
+    if ketchup_inputs is None:
+        ketchup_inputs = ketchup_read_inputs(ketchup_options)
+    m_model = ketchup_inputs['m_model']
+    mech_df = ketchup_inputs['mech_df']
+    data_dict = ketchup_inputs['data_dict']
+    dict_tde = ketchup_inputs['time_delay']
+
+    # initialization of the kinetic parameters; multistart runs set the sample of the start in its design
+    design_args = {'e_scale': ketchup_options.get('initial_scale'),
+                   'start_design': ketchup_options.get('start_design', 'random'),
+                   'n_starts': int(ketchup_options.get('multistart') or 1),
+                   'start_index': ketchup_options.get('start_index', 0),
+                   'design_seed': ketchup_options.get('design_seed'),
+                   'start_sample': ketchup_options.get('start_sample')}
+
+    with phase('create_initial_model'):
+        if ketchup_options['data_type'].lower() in ("static"):
+            ketchup_model = create_initial_model(m_model, mech_df, data_dict,
+                                                 seedvalue=ketchup_options['seedvalue'],
+                                                 distribution=ketchup_options['distribution'],
+                                                 mech_type=ketchup_options['mechanism_type'],
+                                                 **design_args)
+        elif ketchup_options['data_type'].lower() in ("dynamic"):
+            ketchup_model = create_initial_model(m_model, mech_df, data_dict,
+                                                 seedvalue=ketchup_options['seedvalue'],
+                                                 distribution=ketchup_options['distribution'],
+                                                 tde=dict_tde,
+                                                 mech_type=ketchup_options['mechanism_type'],
+                                                 **design_args)
     print ("Initial model created")
     try:
         ketchup_model.name = str(ketchup_options['model_name'])
     except NameError:
         ketchup_model.name = 'unknown'
+    ketchup_model.elemental_formulation = ketchup_options.get('elemental_formulation', 'full')
+    if ketchup_model.elemental_formulation not in ('full', 'reduced'):
+        raise ValueError(f"Invalid elemental formulation '{ketchup_model.elemental_formulation}'. "
+                         f"Use 'full' or 'reduced'.")
     
-    experiments = []
-    for i, d in enumerate(data_dict.keys()):
-        ketchup_model.key = d
-        if ketchup_options['data_type'].lower() in ("static"):
-            ketchup_model.add_component(f'experiment{i}', Block(rule=ktools.core.create_sMB))
-        elif ketchup_options['data_type'].lower() in ("dynamic"):
-            ketchup_model.add_component(f'experiment{i}', Block(rule=ktools.core.create_dMB))
-        experiments.append(eval(f"ketchup_model.experiment{i}"))
+    # one model block per experiment, indexed by experiment ID
+    ketchup_model.EXPERIMENTS = pyomo.environ.Set(initialize=list(data_dict.keys()))
+    if ketchup_options['data_type'].lower() in ("static"):
+        if ketchup_options.get('flag_block_template', True):
+            ketchup_model.static_block_template = ktools.core.create_static_block_template(ketchup_model)
+        with phase('construct_blocks'):
+            ketchup_model.experiment = Block(ketchup_model.EXPERIMENTS, rule=ktools.core.create_sMB)
+    elif ketchup_options['data_type'].lower() in ("dynamic"):
+        method = ketchup_options.get('discretization_method', 'finite_difference')
+        if method not in ('finite_difference', 'collocation'):
+            raise ValueError(f"Invalid discretization method '{method}'. Use 'finite_difference' or 'collocation'.")
+        ketchup_model.time_discretization = ktools.core.TimeDiscretization(
+            method=method,
+            scheme=ketchup_options.get('discretization_scheme'),
+            nfe=ketchup_options.get('discretization_nfe'),
+            ncp=ketchup_options.get('discretization_ncp', 3),
+            points=ketchup_options.get('discretization_points') or {})
+        with phase('construct_blocks'):
+            ketchup_model.experiment = Block(ketchup_model.EXPERIMENTS, rule=ktools.core.create_dMB)
+    for d in ketchup_model.EXPERIMENTS:
         print(f"dataset included: {d}")
 
     print("End of dataset inclusion")
-    ketchup_model.add_component('block_list', pyomo.environ.Set(initialize=experiments))
+    # the reference experiment holds the basis state: the basis experiment of static data (option
+    # 'basis_id', else WT if it is selected, else the first selected experiment), or the first experiment
+    reference_id = ketchup_model.EXPERIMENTS.first()
+    if ketchup_options['data_type'].lower() in ("static"):
+        basis_expt = ketchup_options.get('basis_id')
+        if basis_expt is None:
+            basis_expt = 'WT' if 'WT' in data_dict else next(iter(data_dict))
+        basis_expt = str(basis_expt)
+        if basis_expt not in data_dict:
+            raise ValueError(f"Basis experiment {basis_expt} is not in the selected data.")
+        reference_id = basis_expt
+    ketchup_model.reference_id = reference_id
+    reference = ketchup_model.experiment[reference_id]
 
     # currently only static analysis has basis constraints
     if ketchup_options['data_type'].lower() in ("static"):
-        ketchup_model.reaction_rate = Constraint(ketchup_model.block_list,
-                                                 ketchup_model.experiment0.REACTIONS,
+        ketchup_model.reaction_rate = Constraint(ketchup_model.EXPERIMENTS,
+                                                 reference.REACTIONS,
                                                  rule=ktools.core.net_reaction_rate)
 
-        try:
-            basis_expt = str(ketchup_options['basis_id'])
-        except KeyError:
-            basis_expt = 'WT' if 'WT' in data_dict else data_dict[0]
-
     # create objective function
     ketchup_model.obj = Objective(sense=pyomo.environ.minimize,
-                                  expr=sum(b.error for b in experiments)
+                                  expr=sum(b.error for b in ketchup_model.experiment.values())
                                   )
 
-    # ketchup_model.experiment0.vf.pprint()
     if ketchup_options['mechanism_type'] == 'elemental':
         def ref_conc_constraint(m, s):
-            return m.experiment0.c[s] == 1.0
+            return reference.c[s] == 1.0
 
         # fix wild-type fluxes
         for r in data_dict[basis_expt]:
-            ketchup_model.experiment0.rate[r].fix(data_dict[basis_expt][r][0])
+            reference.rate[r].fix(data_dict[basis_expt][r][0])
 
-        ketchup_model.ref_conc_constraint = Constraint(ketchup_model.experiment0.SPECIES,
+        ketchup_model.ref_conc_constraint = Constraint(reference.SPECIES,
                                                        rule=ref_conc_constraint)
-        ketchup_model.vf_rate = Constraint(ketchup_model.block_list,
-                                           ketchup_model.ELEMENTALSTEP_F,
-                                           rule=ktools.core.elemental_vf)
-        ketchup_model.vr_rate = Constraint(ketchup_model.block_list,
-                                           ketchup_model.ELEMENTALSTEP_R,
-                                           rule=ktools.core.elemental_vr)
-        ketchup_model.es_net  = Constraint(ketchup_model.block_list,
+        if ketchup_model.elemental_formulation == 'full':
+            ketchup_model.vf_rate = Constraint(ketchup_model.EXPERIMENTS,
+                                               ketchup_model.ELEMENTALSTEP_F,
+                                               rule=ktools.core.elemental_vf)
+            ketchup_model.vr_rate = Constraint(ketchup_model.EXPERIMENTS,
+                                               ketchup_model.ELEMENTALSTEP_R,
+                                               rule=ktools.core.elemental_vr)
+        else:
+            # reduced space: the elemental rates are substituted into the balances as expressions
+            for b in ketchup_model.experiment.values():
+                b.vf = Expression(b.ELEMENTALSTEP_F, rule=ktools.core.elemental_vf_expression)
+                b.vr = Expression(b.ELEMENTALSTEP_R, rule=ktools.core.elemental_vr_expression)
+        ketchup_model.es_net  = Constraint(ketchup_model.EXPERIMENTS,
                                            ketchup_model.ELEMENTALSTEP_F,
                                            rule=ktools.core.es_net_balance)
 
     if ketchup_options['data_type'].lower() in ("dynamic"):
         if ketchup_options['mechanism_type'] == 'michaelis-menten':
             # TODO: as part of line by line processing extension, allow michaelis-mente processing
-            for i, b in enumerate(ketchup_model.block_list):
-                b.add_component('reaction_rate', Constraint(b.time, ketchup_model.experiment0.REACTIONS,
+            for b in ketchup_model.experiment.values():
+                b.add_component('reaction_rate', Constraint(ktools.core.time_set(b), reference.REACTIONS,
                                  rule = ktools.core.d_net_reaction_rate)
                                 )
         # TODO: move into fork or wrap into another function to allow for use in static
         if ketchup_options['mechanism_type'] == 'custom':
-            import re
-            for i, b in enumerate(ketchup_model.block_list):
-                for rxn in list(ketchup_model.unique_consts['rxns'].keys()):
-                    rate_law = ketchup_model.unique_consts['rxns'][rxn]
-                    for k in list(ketchup_model.unique_consts.keys())[:-1]:
-                        for ss in ketchup_model.unique_consts[k]:
-                            rxn_check = ss.split('+')[0];
-                            s = ss.split('+')[1]
-                            if rxn_check == rxn: rate_law = rate_law.replace(f'{k}[{s}]',
-                                                                             f'b.model().{k}[\'{rxn}+{s}\']')
-                    # replace metabolite concentrations expressions
-                    for x in re.findall(r'([^~TIMS]\[.*?\])', rate_law):
-
-                        if '[E]' not in x: rate_law = rate_law.replace(f'{x[0]}[{x[2:-1]}]',
-                                                                       f'{x[0]}b.c[t,\'{x[2:-1]}\']')
-                    # replace enzyme expression
-                    rate_law = rate_law.replace('[E]', f'b.e[t,\'{rxn}_ENZ\']')
-
-                    def rate_law_func(b, t):
-                        return eval(f'b.rate[t,\'{rxn}\']') == eval(rate_law)
-
-                    b.add_component(f'rate_law_{i}_{rxn}', Constraint(b.time, rule=rate_law_func)
+            from functools import partial
+            for i, (key, b) in enumerate(ketchup_model.experiment.items()):
+                # rate laws were parsed once in create_initial_model and are lowered here for each block
+                for rxn in ketchup_model.custom_rate_laws:
+                    b.add_component(f'rate_law_{i}_{rxn}', Constraint(ktools.core.time_set(b),
+                                                                      rule=partial(ktools.core.custom_rate, r=rxn))
                                     )
                 # set initial conditions
-                key = b.key
                 data = b.data
                 #print (data[key])
                 c_list = [i[1] for i in b.c.keys() if i[0] == 0] # list of metabolites at time 0
@@ -400,13 +540,24 @@ def ketchup_generate_model(ketchup_options: dict[str, str | bool | int | None])
         else:
             raise ValueError(f"Dynamic currently requires michaelis-menten or custom mechanisms and rate laws.")
 
+    # initialize with the solution of a previous fit
+    if ketchup_options.get('filename_warm_start'):
+        from ktools.io import result_load
+        with phase('warm_start'):
+            result_load(ketchup_options['filename_warm_start'], ketchup_model)
+
     return ketchup_model
 
 
+@timed('solve')
 def solve_ketchup_model(ketchup_model: pyomo.environ.ConcreteModel,
                         ketchup_options: dict[str, str | bool | int | None]) -> pyomo.opt.results.results_.SolverResults:
     """
-    Solves Pyomo ConcreteModel using solver options file. Currently, uses `IPOPT` solver.
+    Solves Pyomo ConcreteModel using solver options file. Currently, uses `IPOPT` solver, as an executable or,
+    if the option 'solver_interface' is 'in_process', through cyipopt with an NLP that is kept with the model
+    for later solves (see PersistentIpopt). If the option 'estimation_method' is 'decomposition', the experiments
+    are solved in parallel and coordinated on the kinetic parameters (see solve_ketchup_model_decomposed), and
+    if it is 'shooting', the model is solved by single shooting (see solve_ketchup_model_shooting).
 
     Parameters
     ----------
@@ -424,22 +575,167 @@ def solve_ketchup_model(ketchup_model: pyomo.environ.ConcreteModel,
     Raises
     ------
     ValueError
-        Raised if the solver encounters an error during execution.
+        Raised if the solver encounters an error during execution, or if the estimation method or solver
+        interface is invalid.
     """
     
+    import tempfile
+    from ktools.util import active_timer, time_solver_phases, ipopt_log_counters
+
+    estimation_method = ketchup_options.get('estimation_method', 'simultaneous')
+    if estimation_method == 'shooting':
+        from ktools.ketchup.shooting import solve_ketchup_model_shooting
+        return solve_ketchup_model_shooting(ketchup_model, ketchup_options)
+    elif estimation_method == 'decomposition':
+        from ktools.ketchup.decomposition import solve_ketchup_model_decomposed
+        return solve_ketchup_model_decomposed(ketchup_model, ketchup_options)
+    elif estimation_method != 'simultaneous':
+        raise ValueError(f"Invalid estimation method '{estimation_method}'. "
+                         f"Use 'simultaneous', 'decomposition' or 'shooting'.")
+
+    solver_interface = ketchup_options.get('solver_interface', 'executable')
+    if solver_interface == 'in_process':
+        # the NLP is kept with the model and built again only if the model structure changed
+        from ktools.ketchup.persistent import PersistentIpopt
+        persistent_solver = getattr(ketchup_model, 'persistent_solver', None)
+        if persistent_solver is None or not persistent_solver.is_current():
+            persistent_solver = PersistentIpopt(ketchup_model, ketchup_options)
+            ketchup_model.persistent_solver = persistent_solver
+        return persistent_solver.solve(tee=True)
+    elif solver_interface != 'executable':
+        raise ValueError(f"Invalid solver interface '{solver_interface}'. Use 'executable' or 'in_process'.")
+
     solver = pyomo.opt.SolverFactory('ipopt')
     solver.options.option_file_name = ketchup_options['filename_solver_opt']
+    if ketchup_options.get('filename_warm_start'):
+        # keep the warm start close to its values; the solver options file takes precedence
+        solver.options['bound_push'] = 1e-8
+        solver.options['bound_frac'] = 1e-8
+    # component names in the NL file only help debugging and cost time and memory for large models
+    symbolic_labels = ketchup_options.get('flag_symbolic_labels')
+    if symbolic_labels is None:
+        symbolic_labels = bool(ketchup_options.get('debug'))
+
+    # with a timed run, the IPOPT output is also written to a log file for its iteration counters
+    timer = active_timer()
+    logfile = None
+    if timer is not None:
+        time_solver_phases(solver)
+        handle, logfile = tempfile.mkstemp(prefix='ketchup_ipopt_', suffix='.log')
+        os.close(handle)
 
     try:
-        results = solver.solve(ketchup_model, tee=True, symbolic_solver_labels=True)
+        results = solver.solve(ketchup_model, tee=True, symbolic_solver_labels=symbolic_labels, logfile=logfile)
+        if timer is not None:
+            with open(logfile) as log:
+                timer.record(**ipopt_log_counters(log.read()))
         #total_error = sum( b.error.value for exps in experiments for b in exps[:] )
         status = str(results.Solver[0]['Termination condition']) 
     except ValueError:
         status = 'Status Error'
+    finally:
+        if logfile is not None:
+            os.remove(logfile)
 
     return results
 
 
+def solve_ketchup_model_adaptive(ketchup_model: pyomo.environ.ConcreteModel,
+                                 ketchup_options: dict[str, str | bool | int | None],
+                                 ketchup_inputs: dict = None) -> tuple:
+    """
+    Solves a dynamic KETCHUP model and refines its time discretization until the estimated discretization
+    error (see ktools.core.estimate_discretization_error) of every finite element is below the option
+    'discretization_tolerance', or for at most 'discretization_max_refinements' refinements. Each refinement
+    splits the finite elements above the tolerance at their midpoints, builds a new model with the refined
+    elements, initializes it with the previous solution (interpolated in time) and solves it again.
+
+    Parameters
+    ----------
+    ketchup_model : pyomo.environ.ConcreteModel
+        The Pyomo ConcreteModel representing the dynamic kinetic model.
+    ketchup_options : dict[str, str | bool | int | None]
+        A valid KETCHUP option dictionary containing the processed KETCHUP options that define the problem to solve.
+    ketchup_inputs : dict, optional
+        Parsed inputs from ketchup_read_inputs used to build the refined models. If None, the input files are
+        read. Defaults to None.
+
+    Returns
+    -------
+    tuple
+        The result object of the last solve and the model it solved, which is ketchup_model if no refinement
+        was needed.
+    """
+    from ktools.core import refine_time_points, time_set
+    from ktools.io import result_values, result_initialize
+
+    if ketchup_inputs is None:
+        ketchup_inputs = ketchup_read_inputs(ketchup_options)
+    options = dict(ketchup_options, filename_warm_start=None)
+    tol = float(ketchup_options.get('discretization_tolerance', 1e-3))
+
+    results = solve_ketchup_model(ketchup_model, ketchup_options)
+    for refinement in range(int(ketchup_options.get('discretization_max_refinements', 3))):
+        status = str(results.Solver[0]['Termination condition'])
+        if status != 'optimal':
+            print(f"Time discretization not refined after solver status {status}")
+            break
+        points = {}
+        for key, b in ketchup_model.experiment.items():
+            refined = refine_time_points(b, tol) if b.active else None
+            if refined is not None:
+                points[key] = refined
+        if not points:
+            print(f"Time discretization within tolerance {tol} after {refinement} refinements")
+            break
+        n_split = sum(len(p) - len(time_set(ketchup_model.experiment[key]).get_finite_elements())
+                      for key, p in points.items())
+        print(f"Refinement {refinement + 1}: splitting {n_split} finite elements of {len(points)} experiments")
+        # experiments that are not refined keep their finite elements
+        for key, b in ketchup_model.experiment.items():
+            points.setdefault(key, tuple(time_set(b).get_finite_elements()))
+        options['discretization_points'] = points
+
+        refined_model = ketchup_generate_model(options, ketchup_inputs)
+        result_initialize(result_values(ketchup_model, 'dynamic', ketchup_model.mech_type), refined_model,
+                          source='previous discretization')
+        ketchup_model = refined_model
+        results = solve_ketchup_model(ketchup_model, ketchup_options)
+
+    return results, ketchup_model
+
+
+def ketchup_phase_timer(ketchup_options: dict[str, str | bool | int | None]):
+    """
+    Returns the timer of the phases of a run if the options 'flag_timing' or 'flag_profile' are set. Entered
+    around the generation, solution and output of a model, the times of its phases (reading inputs, building
+    the model, writing the NL file, running IPOPT, writing results) and the model size are written by
+    ketchup_output_write to '<model_name>_<status>_timing_<seed>.json'. With 'flag_profile', the run is also
+    profiled with cProfile into '<model_name>_profile_<seed>.prof'.
+
+    Parameters
+    ----------
+    ketchup_options : dict[str, str | bool | int | None]
+        A valid KETCHUP option dictionary containing the processed KETCHUP options.
+
+    Returns
+    -------
+    ktools.util.PhaseTimer or contextlib.nullcontext
+        The timer, or a context manager that does nothing if neither option is set.
+    """
+    import contextlib
+    from ktools.util import PhaseTimer
+
+    if not (ketchup_options.get('flag_timing') or ketchup_options.get('flag_profile')):
+        return contextlib.nullcontext()
+    profile_filename = None
+    if ketchup_options.get('flag_profile'):
+        profile_filename = os.path.join(ketchup_options['directory_output'],
+                                        f"{ketchup_options['model_name']}_profile_{ketchup_options['seedvalue']}.prof")
+    return PhaseTimer(profile_filename)
+
+
+@timed('write_output')
 def ketchup_output_write(results: pyomo.opt.results.results_.SolverResults,
                          ketchup_model: pyomo.environ.ConcreteModel,
                          ketchup_options: dict[str, str | bool | int | None],
@@ -462,6 +758,7 @@ def ketchup_output_write(results: pyomo.opt.results.results_.SolverResults,
     None
     """
     from ktools.io import result_dump, create_sbml_kinetic_model
+    from ktools.util import phase, active_timer, model_size
 
     seedvalue = ketchup_options['seedvalue']
     output_data_type_category = ketchup_options['data_type']
@@ -472,16 +769,29 @@ def ketchup_output_write(results: pyomo.opt.results.results_.SolverResults,
     except ValueError:
         status = 'Status Error'
 
-    result_dump(os.path.join(ketchup_options['directory_output'], f"{ketchup_options['model_name']}_{status}_results"),
-                seedvalue, ketchup_model, time_end - time_start, status, output_data_type_category,
-                mechanism_type_category)
+    with phase('write_results'):
+        result_dump(os.path.join(ketchup_options['directory_output'], f"{ketchup_options['model_name']}_{status}_results"),
+                    seedvalue, ketchup_model, time_end - time_start, status, output_data_type_category,
+                    mechanism_type_category)
 
     # create SBML for the model at the solution and output to file
     if ketchup_options['flag_output_sbml']:
-        kmodel_sbml = create_sbml_kinetic_model(ketchup_model)
-        with open(os.path.join(ketchup_options['directory_output'],
-                               f"{ketchup_options['model_name']}_{status}_results_{seedvalue}.xml"),
-                  'w') as output_file:
-            output_file.write(kmodel_sbml)
+        with phase('write_sbml'):
+            kmodel_sbml = create_sbml_kinetic_model(ketchup_model)
+            with open(os.path.join(ketchup_options['directory_output'],
+                                   f"{ketchup_options['model_name']}_{status}_results_{seedvalue}.xml"),
+                      'w') as output_file:
+                output_file.write(kmodel_sbml)
+
+    # times of the phases so far, with the model size, next to the results
+    timer = active_timer()
+    if timer is not None:
+        timer.record(experiments=sum(1 for b in ketchup_model.experiment.values() if b.active),
+                     **model_size(ketchup_model))
+        if timer.counters.get('ipopt_iterations'):
+            timer.record(time_per_iteration=timer.counters.get('ipopt_time', time_end - time_start)
+                                            / timer.counters['ipopt_iterations'])
+        timer.write(os.path.join(ketchup_options['directory_output'],
+                                 f"{ketchup_options['model_name']}_{status}_timing_{seedvalue}.json"))
 
     return
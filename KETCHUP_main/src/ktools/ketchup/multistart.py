@@ -0,0 +1,180 @@
+"""
+KETCHUP multistart
+
+runs many starts (seeds) of the same KETCHUP problem in a process pool. Inputs are parsed once and
+shared with the workers, and each start is built and solved in its own working directory.
+
+"""
+import os
+from timeit import default_timer as timer
+
+# parsed inputs of the worker process, set once by the pool initializer
+_worker_inputs = None
+# in-process solver of the worker, whose model is reused by the starts of the worker, and the initial
+# values of the unfixed variables of that model as built
+_worker_solver = None
+_worker_initial_values = None
+
+
+def _init_worker(ketchup_inputs: dict) -> None:
+    """ Stores the parsed inputs in the worker process """
+    global _worker_inputs
+    _worker_inputs = ketchup_inputs
+
+
+def _persistent_model(ketchup_options: dict):
+    """
+    Returns the model of the in-process solver of the worker, initialized for the start of ketchup_options.
+    The first start of the worker builds the model and its NLP. The other starts reset the variables to
+    their initial values as built and draw new initial values of the kinetic parameters only.
+    """
+    import pyomo.environ
+    from ktools.core import initialize_kinetic_parameters
+    from ktools.ketchup import ketchup_generate_model
+    from ktools.ketchup.persistent import PersistentIpopt
+    from ktools.util import phase
+
+    global _worker_solver, _worker_initial_values
+    if _worker_solver is None:
+        ketchup_model = ketchup_generate_model(ketchup_options, _worker_inputs)
+        _worker_solver = PersistentIpopt(ketchup_model, ketchup_options)
+        ketchup_model.persistent_solver = _worker_solver
+        _worker_initial_values = [(var, var.value) for var in ketchup_model.component_data_objects(pyomo.environ.Var)
+                                  if not var.fixed]
+        return ketchup_model
+
+    with phase('initialize_start'):
+        for var, value in _worker_initial_values:
+            var.set_value(value, skip_validation=True)
+        # a warm start sets the same kinetic parameters for all starts
+        if not ketchup_options.get('filename_warm_start'):
+            initialize_kinetic_parameters(_worker_solver.model, seedvalue=ketchup_options['seedvalue'],
+                                          distribution=ketchup_options['distribution'],
+                                          start_sample=ketchup_options.get('start_sample'))
+    return _worker_solver.model
+
+
+def _solve_start(ketchup_options: dict, seedvalue: int, start_sample=None) -> dict:
+    """ Builds, solves and outputs a single start, with its sample of the design, in its own working directory """
+    import contextlib
+    import pyomo.environ
+    from ktools.ketchup import (ketchup_generate_model, solve_ketchup_model, ketchup_output_write,
+                                solve_ketchup_model_adaptive, ketchup_phase_timer)
+
+    options = dict(ketchup_options)
+    options['seedvalue'] = seedvalue
+    options['start_sample'] = start_sample
+    directory_start = os.path.join(ketchup_options['directory_output'],
+                                   f"{ketchup_options['model_name']}_start_{seedvalue}")
+    os.makedirs(directory_start, exist_ok=True)
+    options['directory_output'] = directory_start
+
+    record = {'seed': seedvalue, 'status': None, 'objective': None, 'time_build': None, 'time_solve': None,
+              'directory': directory_start, 'message': None}
+    cwd = os.getcwd()
+    os.chdir(directory_start)
+    try:
+        with open('ketchup.log', 'w') as log, contextlib.redirect_stdout(log), ketchup_phase_timer(options):
+            time_start = timer()
+            if options.get('solver_interface') == 'in_process' and not options.get('discretization_adaptive'):
+                # the model and NLP of the first start of the worker are solved from the initial values of this start
+                ketchup_model = _persistent_model(options)
+            else:
+                ketchup_model = ketchup_generate_model(options, _worker_inputs)
+            time_built = timer()
+            record['time_build'] = time_built - time_start
+            if options.get('discretization_adaptive'):
+                results, ketchup_model = solve_ketchup_model_adaptive(ketchup_model, options, _worker_inputs)
+            else:
+                results = solve_ketchup_model(ketchup_model, options)
+            time_end = timer()
+            record['time_solve'] = time_end - time_built
+            ketchup_output_write(results, ketchup_model, options, time_built, time_end)
+        record['status'] = str(results.Solver[0]['Termination condition'])
+        record['objective'] = pyomo.environ.value(ketchup_model.obj, exception=False)
+    except Exception as err:
+        record['status'] = 'error'
+        record['message'] = f"{type(err).__name__}: {err}"
+    finally:
+        os.chdir(cwd)
+    return record
+
+
+def ketchup_multistart(ketchup_options: dict[str, str | bool | int | None], seeds: list = None,
+                       processes: int = None, ketchup_inputs: dict = None) -> list[dict]:
+    """
+    Solves a KETCHUP problem from many starts in parallel. The input files are read once, each seed is
+    built and solved with IPOPT by a worker of a process pool in its own subdirectory of the output
+    directory, and a summary of all starts is written to '<model_name>_multistart.json'. With the
+    'start_design' option 'lhs' or 'sobol', the starts take the samples of one space-filling design. With the
+    'solver_interface' option 'in_process', each worker builds the model and NLP of its first start once and
+    solves its other starts with them, from new initial values of the kinetic parameters.
+
+    Parameters
+    ----------
+    ketchup_options : dict[str, str | bool | int | None]
+        A valid KETCHUP option dictionary containing the processed KETCHUP options that define the problem to solve.
+    seeds : list, optional
+        Seed values of the starts. Defaults to 'multistart' consecutive seeds beginning at 'seedvalue'.
+    processes : int, optional
+        Number of worker processes. Defaults to the 'processes' option, or the number of CPUs if unset.
+    ketchup_inputs : dict, optional
+        Parsed inputs from ketchup_read_inputs. If None, the input files are read. Defaults to None.
+
+    Returns
+    -------
+    list[dict]
+        One record per start, in order of seeds, with the seed, solver termination condition ('status'),
+        objective value, build and solve times, working directory, and error message, if any.
+    """
+    import json
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from ktools.core import count_kinetic_parameters, create_start_design
+    from ktools.ketchup import ketchup_read_inputs
+
+    if seeds is None:
+        n_starts = int(ketchup_options.get('multistart') or 1)
+        seeds = [(ketchup_options['seedvalue'] + i) % (2 ** 32 - 1) for i in range(n_starts)]
+    if processes is None:
+        processes = ketchup_options.get('processes') or os.cpu_count()
+
+    start_design = ketchup_options.get('start_design', 'random')
+    if start_design == 'sobol' and len(seeds) & (len(seeds) - 1):
+        import warnings
+        warnings.warn(f"Warning: Sobol designs are balanced for a power of 2 starts, not {len(seeds)}.")
+
+    # workers change their working directory, so fix relative paths beforehand
+    options = dict(ketchup_options)
+    options['directory_output'] = os.path.abspath(options['directory_output'])
+    for key in ('filename_solver_opt', 'filename_warm_start'):
+        if options.get(key):
+            options[key] = os.path.abspath(options[key])
+
+    if ketchup_inputs is None:
+        ketchup_inputs = ketchup_read_inputs(options)
+
+    # all starts share one design, generated once here, of which each start takes its own sample
+    samples = [None] * len(seeds)
+    if start_design != 'random':
+        n_values = count_kinetic_parameters(ketchup_inputs['m_model'], ketchup_inputs['mech_df'],
+                                            options['mechanism_type'])
+        samples = create_start_design(start_design, len(seeds), n_values, seeds[0])
+
+    records = {}
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(ketchup_inputs,)) as executor:
+        futures = {executor.submit(_solve_start, options, seed, sample): seed
+                   for seed, sample in zip(seeds, samples)}
+        for future in as_completed(futures):
+            record = future.result()
+            records[record['seed']] = record
+            print(f"start {record['seed']}: {record['status']} - obj value - {record['objective']} "
+                  f"time - {record['time_solve']}", flush=True)
+
+    records = [records[seed] for seed in seeds]
+    fn = os.path.join(options['directory_output'], f"{options['model_name']}_multistart.json")
+    with open(fn, 'w') as json_file:
+        json.dump(records, json_file, indent='\t')
+        print(f"Successful export of multistart summary into {fn}")
+
+    return records
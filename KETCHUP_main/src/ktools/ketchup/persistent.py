@@ -0,0 +1,141 @@
+"""
+KETCHUP persistent solver
+
+solves KETCHUP models with IPOPT in process, through cyipopt and the PyNumero interface of Pyomo. The NLP
+is built once and solved again from new initial values, without writing an NL file, starting a solver
+process and reading its solution for each solve.
+
+"""
+import numpy as np
+import pyomo.environ
+import pyomo.opt
+
+# termination conditions by cyipopt return status
+_TERMINATION_CONDITIONS = {
+    0: pyomo.opt.TerminationCondition.optimal,  # Solve_Succeeded
+    1: pyomo.opt.TerminationCondition.optimal,  # Solved_To_Acceptable_Level, as for the IPOPT executable
+    2: pyomo.opt.TerminationCondition.infeasible,  # Infeasible_Problem_Detected
+    -1: pyomo.opt.TerminationCondition.maxIterations,  # Maximum_Iterations_Exceeded
+    -4: pyomo.opt.TerminationCondition.maxTimeLimit,  # Maximum_CpuTime_Exceeded
+    -5: pyomo.opt.TerminationCondition.maxTimeLimit,  # Maximum_WallTime_Exceeded
+}
+
+
+class PersistentIpopt:
+    """
+    IPOPT solver of a KETCHUP model that keeps the NLP of the model between solves. Each solve starts from the
+    current values of the model variables, so the model can be solved again after its initial values are
+    changed (e.g., by initialize_kinetic_parameters for another start of a multistart run). The NLP must be built
+    again if the structure of the model changes, e.g., if experiments are selected or variables fixed (see
+    is_current).
+
+    Parameters
+    ----------
+    ketchup_model : pyomo.environ.ConcreteModel
+        The Pyomo ConcreteModel representing the kinetic model.
+    ketchup_options : dict[str, str | bool | int | None]
+        A valid KETCHUP option dictionary, including the filename of the solver option file.
+
+    Raises
+    ------
+    ImportError
+        If cyipopt or the PyNumero ASL library is not available.
+    """
+
+    def __init__(self, ketchup_model: pyomo.environ.ConcreteModel,
+                 ketchup_options: dict[str, str | bool | int | None]):
+        from pyomo.contrib.pynumero.asl import AmplInterface
+        from pyomo.contrib.pynumero.interfaces.cyipopt_interface import cyipopt_available, CyIpoptNLP
+        from pyomo.contrib.pynumero.interfaces.pyomo_nlp import PyomoNLP
+        from ktools.util import phase
+
+        if not (cyipopt_available and AmplInterface.available()):
+            raise ImportError("The in-process solver requires cyipopt and the PyNumero ASL library "
+                              "(pyomo build-extensions).")
+
+        self.model = ketchup_model
+        with phase('build_nlp'):
+            self.nlp = PyomoNLP(ketchup_model)
+            self.problem = CyIpoptNLP(self.nlp)
+        if ketchup_options.get('filename_solver_opt'):
+            self.problem.add_option('option_file_name', ketchup_options['filename_solver_opt'])
+        if ketchup_options.get('filename_warm_start'):
+            # keep the warm start close to its values; the solver options file takes precedence
+            self.problem.add_option('bound_push', 1e-8)
+            self.problem.add_option('bound_frac', 1e-8)
+        self._structure = self._model_structure()
+
+    def _model_structure(self) -> tuple:
+        """ Active objective and numbers of active constraints and fixed variables of the NLP """
+        objective = next(self.model.component_data_objects(pyomo.environ.Objective, active=True))
+        n_constraints = sum(1 for _ in self.model.component_data_objects(pyomo.environ.Constraint, active=True))
+        n_fixed = sum(var.fixed for var in self.nlp.get_pyomo_variables())
+        return id(objective.expr), n_constraints, n_fixed
+
+    def is_current(self) -> bool:
+        """
+        Checks whether the NLP still has the structure of the model (active objective expression and numbers
+        of active constraints and fixed variables).
+
+        Returns
+        -------
+        bool
+            True if the model can be solved with the NLP.
+        """
+        return self._model_structure() == self._structure
+
+    def solve(self, tee: bool = True) -> pyomo.opt.results.results_.SolverResults:
+        """
+        Solves the model from the current values of its variables and loads the solution into the model.
+
+        Parameters
+        ----------
+        tee : bool, optional
+            Flag to show the solver output. Defaults to True.
+
+        Returns
+        -------
+        pyomo.opt.results.results_.SolverResults
+            The result object containing the solver's output. Includes solver status.
+
+        Raises
+        ------
+        ValueError
+            If the structure of the model changed since the NLP was built.
+        """
+        import sys
+        from timeit import default_timer as timer
+        from pyomo.common.tee import capture_output
+        from ktools.util import phase
+
+        if not self.is_current():
+            raise ValueError("The structure of the model changed since its NLP was built.")
+
+        # variables without values start from the initial values of the NLP
+        x0 = np.array([np.nan if var.value is None else var.value for var in self.nlp.get_pyomo_variables()],
+                      dtype=float)
+        x0 = np.where(np.isnan(x0), self.nlp.init_primals(), x0)
+
+        time_start = timer()
+        with phase('run_solver'), capture_output(sys.stdout if tee else None, capture_fd=True):
+            x, info = self.problem.solve(x0)
+        time_solve = timer() - time_start
+
+        self.nlp.set_primals(x)
+        self.nlp.set_duals(info['mult_g'])
+        self.nlp.load_state_into_pyomo(bound_multipliers=(info['mult_x_L'], info['mult_x_U']))
+
+        results = pyomo.opt.SolverResults()
+        results.problem.name = self.model.name
+        results.problem.upper_bound = info['obj_val']
+        results.problem.number_of_constraints = self.nlp.n_constraints()
+        results.problem.number_of_variables = self.nlp.n_primals()
+        results.solver.name = 'cyipopt'
+        results.solver.return_code = info['status']
+        results.solver.message = info['status_msg']
+        results.solver.wallclock_time = time_solve
+        results.solver.termination_condition = _TERMINATION_CONDITIONS.get(
+            info['status'], pyomo.opt.TerminationCondition.error)
+        results.solver.status = pyomo.opt.TerminationCondition.to_solver_status(
+            results.solver.termination_condition)
+        return results
@@ -0,0 +1,178 @@
+"""
+KETCHUP shooting
+
+estimates the kinetic parameters of dynamic KETCHUP models by single shooting: each experiment is integrated
+with scipy.integrate.solve_ivp together with its forward sensitivities, and only the kinetic parameters (and
+initial concentrations that are not fixed by data) are optimized with scipy.optimize.least_squares, instead of
+solving the full time discretization as one NLP.
+
+"""
+import numpy as np
+import pyomo.environ
+import pyomo.opt
+
+
+class _ShootingExperiment:
+    """ Data of an experiment block needed to integrate it and compute its residuals """
+
+    def __init__(self, block, simulator):
+        from pyomo.environ import value
+
+        self.block = block
+        self.species = simulator.species
+        self.c0 = np.array([value(block.c[0, s], exception=False) or 0.0 for s in self.species])
+        # initial concentrations without data are estimated with the parameters
+        self.free_c0 = [i for i, s in enumerate(self.species) if not block.c[0, s].fixed]
+        if block.e.dim() != 1:
+            raise ValueError(f"Shooting requires time-invariant enzymes, which block {block.name} does not have.")
+        self.e = np.array([value(block.e[f"{rxn}_ENZ"]) for rxn in simulator.reactions])
+
+        times, observations = zip(*block.error_data)
+        self.t_eval, self.t_index = np.unique(np.array(times, dtype=float), return_inverse=True)
+        self.observations = np.array(observations, dtype=float)
+        self.observed = simulator.s_matrix.species_index[block.error_key]
+        # residuals are weighted as in the error of the block (mean squared error)
+        self.weight = 1 / np.sqrt(len(self.observations))
+
+
+def _kinetic_parameter_vars(ketchup_model, simulator) -> list:
+    """ Kinetic parameter variables of a model in the order of the simulator parameters """
+    from ktools.core.simulation import KINETIC_PARAMETER_KEYS
+
+    kinetic_parameters = ketchup_model.kinetic_parameters
+    return [kinetic_parameters.get(kind, kinetic_parameters.get(KINETIC_PARAMETER_KEYS[kind]))[pid]
+            for kind, pid in simulator.parameter_ids]
+
+
+def solve_ketchup_model_shooting(ketchup_model: pyomo.environ.ConcreteModel,
+                                 ketchup_options: dict[str, str | bool | int | None]
+                                 ) -> pyomo.opt.results.results_.SolverResults:
+    """
+    Solves a dynamic KETCHUP model with custom rate laws by single shooting. The least-squares objective of the
+    model (sum over experiments of the mean squared error of the observed species) is minimized over the
+    kinetic parameters and the initial concentrations that are not fixed, within their bounds, by
+    scipy.optimize.least_squares. The residuals and their Jacobian come from the integration of the active
+    experiments, together, with their forward sensitivities.
+
+    At the solution, the kinetic parameters, initial concentrations and, at every time point of the model, the
+    concentrations, derivatives, rates and errors of the experiment blocks are set, so that the model can be
+    written with ketchup_output_write like a model solved by IPOPT.
+
+    Parameters
+    ----------
+    ketchup_model : pyomo.environ.ConcreteModel
+        The Pyomo ConcreteModel representing the dynamic kinetic model, as created by ketchup_generate_model.
+    ketchup_options : dict[str, str | bool | int | None]
+        A valid KETCHUP option dictionary. Uses the items 'shooting_integrator', 'shooting_rtol',
+        'shooting_atol' and 'shooting_max_nfev', and 'debug' for iteration output.
+
+    Returns
+    -------
+    pyomo.opt.results.results_.SolverResults
+        Results with solver status, termination condition ('optimal' on convergence, 'maxIterations' if the
+        maximum number of function evaluations was reached) and message.
+
+    Raises
+    ------
+    ValueError
+        If the model is not a dynamic model with custom rate laws.
+    """
+    import scipy.optimize
+    from ktools.core import RateLawSimulator, time_set
+
+    if ketchup_options['data_type'] != 'dynamic' or ketchup_model.mech_type != 'custom':
+        raise ValueError("Shooting requires dynamic data and custom rate laws.")
+
+    simulator = RateLawSimulator.from_model(ketchup_model)
+    integrator = {'method': ketchup_options.get('shooting_integrator', 'BDF'),
+                  'rtol': float(ketchup_options.get('shooting_rtol', 1e-6)),
+                  'atol': float(ketchup_options.get('shooting_atol', 1e-9))}
+
+    # estimated quantities: free kinetic parameters, then free initial concentrations by experiment
+    parameter_vars = _kinetic_parameter_vars(ketchup_model, simulator)
+    free_parameters = [i for i, var in enumerate(parameter_vars) if not var.fixed]
+    experiments = [_ShootingExperiment(b, simulator) for b in ketchup_model.experiment.values() if b.active]
+    estimated = [parameter_vars[i] for i in free_parameters]
+    for expt in experiments:
+        estimated += [expt.block.c[0, expt.species[i]] for i in expt.free_c0]
+    x0 = np.array([pyomo.environ.value(var, exception=False) or 0.0 for var in estimated])
+    lower = np.array([-np.inf if var.lb is None else var.lb for var in estimated])
+    upper = np.array([np.inf if var.ub is None else var.ub for var in estimated])
+    x0 = np.clip(x0, lower, upper)
+    p = np.array([pyomo.environ.value(var, exception=False) or 0.0 for var in parameter_vars])
+    n_residuals = sum(len(expt.observations) for expt in experiments)
+    e = np.array([expt.e for expt in experiments])
+    t_eval = np.unique(np.concatenate([expt.t_eval for expt in experiments]))
+    t_index = [np.searchsorted(t_eval, expt.t_eval)[expt.t_index] for expt in experiments]
+
+    cache = {}
+
+    def evaluate(x):
+        """ Residuals and Jacobian at x, computed together and cached for least_squares """
+        if cache.get('x') is not None and np.array_equal(cache['x'], x):
+            return cache['residuals'], cache['jacobian']
+        p[free_parameters] = x[:len(free_parameters)]
+        c0 = np.array([expt.c0 for expt in experiments])
+        column = len(free_parameters)
+        for i, expt in enumerate(experiments):
+            c0[i, expt.free_c0] = x[column:column + len(expt.free_c0)]
+            column += len(expt.free_c0)
+        # the experiments are integrated together, which saves most of the per-step overhead
+        sol = simulator.simulate_sensitivities(c0, p, t_eval, e, **integrator)
+        residuals = np.full(n_residuals, 1e6)
+        jacobian = np.zeros((n_residuals, len(x)))
+        if not sol.success:
+            # failed integrations are penalized so that the step is rejected
+            cache.update(x=x.copy(), residuals=residuals, jacobian=jacobian)
+            return residuals, jacobian
+        row, column = 0, len(free_parameters)
+        for i, expt in enumerate(experiments):
+            rows = slice(row, row + len(expt.observations))
+            index = t_index[i]
+            residuals[rows] = expt.weight * (sol.y[i, expt.observed, index] - expt.observations)
+            jacobian[rows, :len(free_parameters)] = \
+                expt.weight * sol.y_p[i, expt.observed][free_parameters][:, index].T
+            jacobian[rows, column:column + len(expt.free_c0)] = \
+                expt.weight * sol.y_c0[i, expt.observed][expt.free_c0][:, index].T
+            row += len(expt.observations)
+            column += len(expt.free_c0)
+        cache.update(x=x.copy(), residuals=residuals, jacobian=jacobian)
+        return residuals, jacobian
+
+    result = scipy.optimize.least_squares(lambda x: evaluate(x)[0], x0, jac=lambda x: evaluate(x)[1],
+                                          bounds=(lower, upper), method='trf', x_scale='jac',
+                                          max_nfev=ketchup_options.get('shooting_max_nfev'),
+                                          verbose=2 if ketchup_options.get('debug') else 1)
+
+    # set the solution in the model
+    for var, value in zip(estimated, result.x):
+        var.set_value(float(value), skip_validation=True)
+    p[free_parameters] = result.x[:len(free_parameters)]
+    for expt in experiments:
+        b = expt.block
+        times = list(time_set(b))
+        c0 = np.array([pyomo.environ.value(b.c[0, s]) for s in expt.species])
+        c = simulator.simulate(c0, p, times, expt.e, **integrator).y.T
+        dcdt = simulator.dcdt(c, p, expt.e)
+        rates = simulator.rates(c, p, expt.e)
+        for i, t in enumerate(times):
+            for k, s in enumerate(expt.species):
+                b.c[t, s].set_value(float(c[i, k]), skip_validation=True)
+                b.dcdt[t, s].set_value(float(dcdt[i, k]), skip_validation=True)
+            for j, rxn in enumerate(simulator.reactions):
+                b.rate[t, rxn].set_value(float(rates[i, j]), skip_validation=True)
+        b.error.set_value(float(np.mean([(b.c[t, b.error_key].value - y)**2 for t, y in b.error_data])))
+
+    results = pyomo.opt.SolverResults()
+    if result.status > 0:
+        results.solver.status = pyomo.opt.SolverStatus.ok
+        results.solver.termination_condition = pyomo.opt.TerminationCondition.optimal
+    elif result.status == 0:
+        results.solver.status = pyomo.opt.SolverStatus.warning
+        results.solver.termination_condition = pyomo.opt.TerminationCondition.maxIterations
+    else:
+        results.solver.status = pyomo.opt.SolverStatus.error
+        results.solver.termination_condition = pyomo.opt.TerminationCondition.error
+    results.solver.message = result.message
+    print(f"Shooting: {result.message} Objective {2 * result.cost:.6g} after {result.nfev} function evaluations")
+    return results
@@ -1,3 +1,5 @@
-"""Provide functions for utility items like string extraction."""
+"""Provide functions for utility items like string extraction and run profiling."""
 
 from .util import extract_from_brackets
+from .profiling import PhaseTimer, phase, timed, active_timer, model_size
+from .profiling import time_solver_phases, ipopt_log_counters
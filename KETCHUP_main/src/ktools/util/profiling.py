@@ -0,0 +1,225 @@
+"""
+profiling functions
+
+collects a lightweight timer of the phases of a KETCHUP run (reading inputs, building and solving the model,
+writing results) and counters of the model size and solver, with optional cProfile output
+
+"""
+import contextlib
+from timeit import default_timer as timer
+
+# timer of the current run, set while a PhaseTimer is entered
+_active_timer = None
+
+
+class PhaseTimer:
+    """
+    Records the wall time and number of calls of the phases of a run, marked with phase(), while it is
+    entered as a context manager, and counters set with record(). Phases inside other phases are recorded
+    by their path, e.g., 'read_inputs/read_model_files'. If a profile filename is given, the run is also
+    profiled with cProfile, and the statistics are written to that file when the timer is exited.
+
+    Parameters
+    ----------
+    profile_filename : str, optional
+        File of the cProfile statistics. Defaults to None (no profiling).
+    """
+
+    def __init__(self, profile_filename: str = None):
+        self.phases = {}
+        self.counters = {}
+        self.profile_filename = profile_filename
+        self._stack = []
+        self._profiler = None
+        self._time_start = None
+        self._time_end = None
+
+    def __enter__(self):
+        global _active_timer
+        self._previous = _active_timer
+        _active_timer = self
+        if self.profile_filename:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._time_start = timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_timer
+        self._time_end = timer()
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_filename)
+            self._profiler = None
+        _active_timer = self._previous
+        return False
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """ Times the enclosed code as phase name, inside the phases currently entered """
+        self._stack.append(name)
+        path = '/'.join(self._stack)
+        time_start = timer()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(path, {'time': 0.0, 'calls': 0})
+            entry['time'] += timer() - time_start
+            entry['calls'] += 1
+            self._stack.pop()
+
+    def record(self, **counters) -> None:
+        """ Sets counters (e.g., model size or solver iterations) """
+        self.counters.update(counters)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the recorded phases and counters.
+
+        Returns
+        -------
+        dict
+            Total wall time since the timer was entered ('time'), phases by path with their time and number of
+            calls ('phases'), and counters ('counters').
+        """
+        time_end = self._time_end if self._time_end is not None else timer()
+        return {'time': None if self._time_start is None else time_end - self._time_start,
+                'phases': dict(self.phases),
+                'counters': dict(self.counters)}
+
+    def write(self, filename: str) -> None:
+        """ Writes the recorded phases and counters to a JSON file """
+        import json
+
+        with open(filename, 'w') as json_file:
+            json.dump(self.to_dict(), json_file, indent='\t')
+        print(f"Successful export of timing into {filename}")
+
+
+def active_timer() -> PhaseTimer | None:
+    """
+    Returns the PhaseTimer of the current run, if any.
+
+    Returns
+    -------
+    PhaseTimer or None
+        The innermost entered PhaseTimer, or None if no timer is entered.
+    """
+    return _active_timer
+
+
+def phase(name: str):
+    """
+    Times the enclosed code as a phase of the current run. Does nothing if no PhaseTimer is entered.
+
+    Parameters
+    ----------
+    name : str
+        Name of the phase.
+
+    Returns
+    -------
+    contextlib.AbstractContextManager
+        Context manager of the phase.
+    """
+    if _active_timer is None:
+        return contextlib.nullcontext()
+    return _active_timer.phase(name)
+
+
+def timed(name: str):
+    """
+    Decorator that times each call of a function as a phase of the current run (see phase).
+
+    Parameters
+    ----------
+    name : str
+        Name of the phase.
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+    import functools
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def time_solver_phases(solver) -> None:
+    """
+    Times the phases of the solves of a Pyomo solver that runs an executable (e.g., SolverFactory('ipopt')),
+    in the current run: writing the problem (NL) file ('write_nl'), running the solver ('run_solver') and
+    reading its solution ('read_solution').
+
+    Parameters
+    ----------
+    solver : pyomo.opt.base.solvers.OptSolver
+        The solver, whose methods of the phases are wrapped.
+    """
+    for method, name in (('_presolve', 'write_nl'), ('_apply_solver', 'run_solver'), ('_postsolve', 'read_solution')):
+        if hasattr(solver, method):
+            setattr(solver, method, timed(name)(getattr(solver, method)))
+
+
+def ipopt_log_counters(log: str) -> dict:
+    """
+    Extracts the number of iterations and the solver time from an IPOPT log.
+
+    Parameters
+    ----------
+    log : str
+        Output of IPOPT.
+
+    Returns
+    -------
+    dict
+        Number of iterations ('ipopt_iterations') and total seconds in IPOPT ('ipopt_time'), where found.
+    """
+    import re
+
+    counters = {}
+    match = re.search(r"Number of Iterations\.*:\s*(\d+)", log)
+    if match:
+        counters['ipopt_iterations'] = int(match.group(1))
+    # the total of recent versions, or the times outside and in function evaluations of older ones
+    times = re.findall(r"Total (?:seconds|CPU secs) in[^=]*=\s*([0-9.eE+-]+)", log)
+    if times:
+        counters['ipopt_time'] = sum(float(t) for t in times)
+    return counters
+
+
+def model_size(model) -> dict:
+    """
+    Counts the active variables, active constraints and Jacobian nonzeros of a Pyomo model.
+
+    Parameters
+    ----------
+    model : pyomo.core.base.PyomoModel.ConcreteModel
+        The Pyomo model.
+
+    Returns
+    -------
+    dict
+        Numbers of unfixed variables in active constraints ('variables'), active constraints ('constraints')
+        and their nonzeros ('nonzeros').
+    """
+    from pyomo.environ import Constraint
+    from pyomo.core.expr.visitor import identify_variables
+
+    variables = set()
+    n_constraints = 0
+    n_nonzeros = 0
+    for constraint in model.component_data_objects(Constraint, active=True):
+        constraint_vars = {id(v) for v in identify_variables(constraint.body, include_fixed=False)}
+        variables.update(constraint_vars)
+        n_constraints += 1
+        n_nonzeros += len(constraint_vars)
+    return {'variables': len(variables), 'constraints': n_constraints, 'nonzeros': n_nonzeros}